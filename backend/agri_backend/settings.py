@@ -145,4 +145,33 @@ REST_FRAMEWORK = {
 }
 
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Disease detection pipeline tuning (see disease_detection/conf.py for all keys)
+DISEASE_DETECTION = {
+    'ENCODING_CACHE_SIZE': 2048,
+    'ENCODING_CACHE_TTL': 6 * 60 * 60,  # seconds
+    'TRANSLATION_CACHE_SIZE': 4096,
+    'TRANSLATION_CACHE_PATH': None,  # e.g. str(BASE_DIR / 'translation_cache.json')
+    'WARM_MODELS_ON_STARTUP': False,  # Set True in production to pre-warm web workers
+    'TRANSLATOR_MEMORY_BUDGET_MB': None,  # e.g. 350 on small instances: one MarianMT translator resident at a time
+    'CONVERSATION_STATE_TTL': 15 * 60,  # seconds a clarification follow-up stays valid
+    'ENCODER_BACKEND': 'torch',  # 'onnx' after running disease_detection/kb/export_onnx_encoder.py
+    'ONNX_ENCODER_QUANTIZED': False,
+    'MICRO_BATCHING': False,  # Enable for threaded/ASGI workers serving concurrent requests
+    'MICRO_BATCH_MAX_SIZE': 32,
+    'MICRO_BATCH_WAIT_MS': 2.0,
+    'VECTOR_INDEX': 'exact',  # 'ivf' for large KBs; check disease_detection/kb/benchmark_vector_index.py
+    'IVF_NPROBE': 8,
+    'LEXICAL_INDEX': True,  # BM25 shortcut for keyword inputs like "blast"
+    'LEXICAL_FUSION_WEIGHT': 0.0,  # e.g. 0.2 to blend BM25 into the dense score
+    'KB_HOT_RELOAD': True,  # Swap in KB/embedding edits without restarting workers
+    'KB_RELOAD_INTERVAL': 5.0,  # seconds between file checks
+    'SERVER_TIMING_HEADER': DEBUG,  # Per-stage Server-Timing header on detect_disease responses
+    'CROSS_CROP_DIAGNOSIS': True,  # Diagnose across all crops when the request has no crop
+    'RETRIEVAL_MODE': 'translate',  # 'multilingual' skips MarianMT; see disease_detection/kb/benchmark_multilingual.py
+    'CLAUSE_SPLITTING': True,  # Score "yellow leaves, brown spots on stem" clause by clause
+    # Production: run `manage.py run_inference_server` once and point workers at it
+    'INFERENCE_SERVER_URL': None,  # e.g. 'unix:///run/agri/inference.sock'
+    'INFERENCE_SERVER_FALLBACK': DEBUG,  # Load models in-process if the server is down
+}
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agri_backend.settings')
 
 application = get_wsgi_application()
+
+# Optionally load and warm the disease detection models before serving
+# (controlled by DISEASE_DETECTION['WARM_MODELS_ON_STARTUP'])
+from disease_detection.model_registry import warm_on_startup  # noqa: E402
+
+warm_on_startup()
@@ -0,0 +1,198 @@
+"""
+Dynamic micro-batching for concurrent model calls
+
+Under concurrent load every request thread would otherwise run the encoder
+or a translator on a single sentence. A MicroBatcher funnels those calls
+through one worker thread that collects up to `max_batch_size` items (waiting
+at most `max_wait_ms` for more), runs one batched forward pass and hands each
+caller its own result.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Queued by MicroBatcher.close() to stop the worker thread
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects single-item calls from many threads into batched calls
+
+    Args:
+        batch_fn: Function mapping a list of inputs to a list of outputs
+        max_batch_size: Largest batch handed to batch_fn
+        max_wait_ms: How long a batch may wait for more items once started
+        name: Label used in logs and metrics
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0, name: str = 'batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._worker = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._batch_sizes = {}
+
+    def submit(self, item: Any) -> Any:
+        """Queue one input and block until its batched result is ready"""
+        future = Future()
+        with self._start_lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put((item, future, time.perf_counter()))
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name=f'micro-batcher-{self.name}', daemon=True
+                    )
+                    self._worker.start()
+        if closed:
+            # Callers still holding a closed (evicted) model run unbatched
+            return self.batch_fn([item])[0]
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future.result()
+
+    def close(self):
+        """
+        Stop the worker thread once the queued items are done, releasing its
+        reference to batch_fn (and the model behind it); later submit() calls
+        run batch_fn directly
+        """
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._worker is not None:
+                self._queue.put(_STOP)
+
+    def _collect(self) -> List:
+        # Block for the first item, take whatever else is already queued, then
+        # wait up to max_wait for stragglers while the batch has room
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List):
+        started = time.perf_counter()
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.batch_fn(items)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._total_wait += sum(started - queued_at for _, _, queued_at in batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self) -> Dict:
+        """Queue depth and batch-size metrics"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'items': self._items,
+                'mean_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'mean_queue_wait_ms': round(self._total_wait / self._items * 1000, 3) if self._items else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+            }
+
+
+class BatchedEncoder:
+    """
+    SentenceTransformer-compatible encoder whose single-text calls are micro-batched
+
+    Multi-text calls (already batched, e.g. the batch endpoint) go straight
+    to the wrapped encoder.
+    """
+
+    def __init__(self, encoder, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.encoder = encoder
+        self.batcher = MicroBatcher(
+            lambda texts: list(np.asarray(encoder.encode(texts), dtype=np.float32)),
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name='encoder',
+        )
+
+    def close(self):
+        self.batcher.close()
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.batcher.submit(texts)
+        if len(texts) == 1:
+            return self.batcher.submit(texts[0])[None, :]
+        return self.encoder.encode(texts, **kwargs)
+
+
+class BatchedTranslator:
+    """
+    Translation pipeline wrapper whose single-text calls are micro-batched
+
+    Keeps the pipeline call signature: returns [{'translation_text': ...}].
+    """
+
+    def __init__(self, translator, name: str, max_batch_size: int = 16, max_wait_ms: float = 2.0):
+        self.translator = translator
+        self.batcher = MicroBatcher(
+            lambda texts: [r['translation_text'] for r in translator(texts)],
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name=name,
+        )
+
+    def close(self):
+        self.batcher.close()
+
+    def __call__(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return [{'translation_text': self.batcher.submit(texts)}]
+        return self.translator(texts, **kwargs)
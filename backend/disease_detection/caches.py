@@ -0,0 +1,283 @@
+"""
+In-process caches for the disease detection pipeline
+Repeated farmer phrases skip model work entirely on a cache hit
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical cache key for free text: trimmed, lower-cased, single-spaced"""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU cache with optional per-entry TTL
+
+    Counts hits, misses and evictions so cache effectiveness can be monitored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (refreshing its recency) or default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries when full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing and storing it on a miss
+
+        compute runs outside the lock, so concurrent misses for the same key
+        may both compute; the last result wins.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of live entries, least recently used first"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (expires_at, value) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        """Return size, capacity and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class EncodingCache:
+    """
+    Query embedding cache in front of a SentenceTransformer-style encoder
+
+    Keys are normalized texts; cached vectors are read-only so callers cannot
+    corrupt entries shared between requests.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def encode(self, encoder, text: str) -> np.ndarray:
+        """
+        Return the embedding of text, running encoder.encode only on a miss
+
+        Args:
+            encoder: Object with a SentenceTransformer-compatible encode()
+            text: Query text (already translated to the KB language)
+
+        Returns:
+            1-D embedding vector
+        """
+        def compute():
+            embedding = np.asarray(encoder.encode([text])[0], dtype=np.float32)
+            embedding.setflags(write=False)
+            return embedding
+
+        return self.cache.get_or_compute(normalize_text(text), compute)
+
+    def encode_many(self, encoder, texts: List[str]) -> np.ndarray:
+        """
+        Embed several texts with at most one batched encoder.encode call
+
+        Args:
+            encoder: Object with a SentenceTransformer-compatible encode()
+            texts: Query texts (already translated to the KB language)
+
+        Returns:
+            (len(texts), dim) array of embeddings
+        """
+        keys = [normalize_text(text) for text in texts]
+        found = {key: self.cache.get(key) for key in set(keys)}
+        missing = [key for key, value in found.items() if value is None]
+
+        if missing:
+            # Encode one representative original text per missing key
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            embeddings = np.asarray(encoder.encode([first_text[key] for key in missing]),
+                                    dtype=np.float32)
+            for key, embedding in zip(missing, embeddings):
+                embedding = embedding.copy()
+                embedding.setflags(write=False)
+                self.cache.set(key, embedding)
+                found[key] = embedding
+
+        return np.stack([found[key] for key in keys])
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+class TranslationCache:
+    """
+    Shared cache of translations to English keyed by (source language, text)
+
+    Both the in-process MarianMT path and the Colab translation endpoint
+    consult it before doing any model or network work. When `path` is set,
+    entries are written to a JSON file every `persist_every` new translations
+    (and at exit) and reloaded on startup, so hot entries survive restarts.
+    """
+
+    def __init__(self, maxsize: int = 4096, path: Optional[str] = None,
+                 persist_every: int = 50):
+        self.cache = LRUCache(maxsize=maxsize)
+        self.path = path
+        self.persist_every = persist_every
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def key(source_lang: str, text: str) -> Tuple[str, str]:
+        return (source_lang or 'auto', normalize_text(text))
+
+    def get(self, source_lang: str, text: str) -> Optional[str]:
+        return self.cache.get(self.key(source_lang, text))
+
+    def set(self, source_lang: str, text: str, translation: str):
+        self.cache.set(self.key(source_lang, text), translation)
+        if self.path:
+            # Concurrent requests add translations; count them under a lock so
+            # exactly one of them persists every persist_every entries
+            with self._pending_lock:
+                self._pending += 1
+                due = self._pending >= self.persist_every
+                if due:
+                    self._pending = 0
+            if due:
+                self.save()
+
+    def translate(self, source_lang: str, text: str, translate: Callable[[str], str]) -> str:
+        """
+        Return the cached translation of text, calling translate(text) on a miss
+
+        Args:
+            source_lang: ISO code of the input language ('hi', 'mr', ...)
+            text: Text to translate
+            translate: Function doing the actual model or network translation
+
+        Returns:
+            English translation
+        """
+        translation = self.get(source_lang, text)
+        if translation is None:
+            translation = translate(text)
+            self.set(source_lang, text, translation)
+        return translation
+
+    def translate_many(self, source_lang: str, texts: List[str],
+                       translate_batch: Callable[[List[str]], List[str]]) -> List[str]:
+        """
+        Translate several texts, sending only the uncached ones to the model at once
+
+        Args:
+            source_lang: ISO code shared by all texts
+            texts: Texts to translate
+            translate_batch: Function translating a list of texts in one call
+
+        Returns:
+            English translations in input order
+        """
+        found = {text: self.get(source_lang, text) for text in texts}
+        missing = [text for text, value in found.items() if value is None]
+        if missing:
+            for text, translation in zip(missing, translate_batch(missing)):
+                self.set(source_lang, text, translation)
+                found[text] = translation
+        return [found[text] for text in texts]
+
+    def load(self):
+        """Populate the cache from the persisted JSON file, if present"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for source_lang, text, translation in json.load(f):
+                    self.cache.set((source_lang, text), translation)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load translation cache from {self.path}: {e}")
+
+    def save(self):
+        """Write live entries to the JSON file (atomically replacing it)"""
+        if not self.path:
+            return
+        with self._pending_lock:
+            self._pending = 0
+        with self._save_lock:
+            entries = [[lang, text, value] for (lang, text), value in self.cache.items()]
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not persist translation cache to {self.path}: {e}")
+
+    def stats(self) -> Dict:
+        return dict(self.cache.stats(), path=self.path)
@@ -0,0 +1,47 @@
+"""
+Split multi-symptom messages into clauses
+
+"leaves yellow, stem has brown spots, smell of rot" describes three symptoms;
+encoded as one sentence its embedding is a blur of all three. The pipeline
+encodes the whole message and each clause in one batched call and fuses the
+clause-by-symptom similarities per disease (CropIndex.fuse_clauses).
+"""
+
+import re
+from typing import List
+
+from .lexical_index import tokenize
+
+# Sentence punctuation and connectives that usually start a new symptom
+_CLAUSE_BREAK = re.compile(
+    r'[.;,!?\n।]+|\s+(?:and|also|plus|but|then|while|along with)\s+',
+    re.IGNORECASE,
+)
+
+
+def split_clauses(text: str, max_clauses: int = 6, min_terms: int = 2) -> List[str]:
+    """
+    Symptom clauses of a (translated) message
+
+    Fragments with fewer than `min_terms` content words ("and", "also
+    yellow") are merged into the previous clause rather than encoded alone.
+
+    Args:
+        text: English symptom text
+        max_clauses: Keep at most this many clauses (the rest are dropped)
+        min_terms: Content words a fragment needs to stand as its own clause
+
+    Returns:
+        Clauses in order; a single-symptom message gives one clause (or none
+        if it is empty)
+    """
+    clauses = []
+    for fragment in _CLAUSE_BREAK.split(text):
+        fragment = fragment.strip()
+        if not fragment:
+            continue
+        if clauses and len(tokenize(fragment)) < min_terms:
+            clauses[-1] = f'{clauses[-1]} {fragment}'
+        else:
+            clauses.append(fragment)
+    return clauses[:max_clauses]
@@ -0,0 +1,111 @@
+"""
+Settings for the disease detection app
+
+Override any key through the DISEASE_DETECTION dict in Django settings, e.g.
+    DISEASE_DETECTION = {'ENCODING_CACHE_SIZE': 4096}
+"""
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Query embedding cache (entries, seconds; TTL of None never expires)
+    'ENCODING_CACHE_SIZE': 2048,
+    'ENCODING_CACHE_TTL': 6 * 60 * 60,
+    # Translation cache shared by DetectDiseaseView and TranslateTextView;
+    # set a file path to persist entries across restarts
+    'TRANSLATION_CACHE_SIZE': 4096,
+    'TRANSLATION_CACHE_PATH': None,
+    # Models pre-loaded by `manage.py warm_models` and, when enabled, by
+    # wsgi.py/asgi.py before a web worker starts serving
+    'WARM_MODELS': ['kb', 'encoder', 'translator_hi_en', 'translator_mr_en'],
+    'WARM_MODELS_ON_STARTUP': False,
+    # Memory the MarianMT translators may hold together (MB, about 300 each);
+    # beyond it the least recently used one is unloaded until needed again.
+    # None keeps every translator once loaded.
+    'TRANSLATOR_MEMORY_BUDGET_MB': None,
+    # Cached language detections for non-ASCII text (ASCII is always 'en')
+    'LANGUAGE_CACHE_SIZE': 4096,
+    # Devanagari inputs of at most LANGUAGE_SHORT_TEXT_WORDS words, or whose
+    # Hindi/Marathi n-gram margin is below LANGUAGE_MIN_MARGIN, are decided by
+    # words only one language uses; short ones without such words are taken
+    # to be in the user's preferred language (Hindi if it is neither)
+    'LANGUAGE_SHORT_TEXT_WORDS': 3,
+    'LANGUAGE_MIN_MARGIN': 20.0,
+    # Rewrite romanized Hindi/Marathi ("patte pe bhure daag") to English with
+    # the romanized_lexicon.json lexicon instead of treating it as English
+    'ROMANIZED_NORMALIZER': True,
+    # Clarification state for follow-ups (use a shared cache with several workers)
+    'CONVERSATION_CACHE_ALIAS': 'default',
+    'CONVERSATION_STATE_TTL': 15 * 60,
+    # Symptom encoder backend: 'torch' or 'onnx' (export with kb/export_onnx_encoder.py)
+    'ENCODER_BACKEND': 'torch',
+    'ONNX_ENCODER_DIR': None,  # Defaults to disease_detection/kb/onnx_encoder
+    'ONNX_ENCODER_QUANTIZED': False,
+    # Micro-batch concurrent single-sentence encoder/translator calls; useful
+    # with threaded or ASGI workers, pointless with one request per process
+    'MICRO_BATCHING': False,
+    'MICRO_BATCH_MAX_SIZE': 32,
+    'MICRO_BATCH_WAIT_MS': 2.0,
+    # Symptom vector index: 'exact', or 'ivf' for large KBs (IVF lists are
+    # built by `manage.py build_kb --ivf-min-rows`; crops without
+    # lists stay exact). Raise IVF_NPROBE for recall, lower it for speed.
+    'VECTOR_INDEX': 'exact',
+    'IVF_NPROBE': 8,
+    # BM25 lexical index over symptom texts and disease names (built at KB load).
+    # Short keyword inputs that name one disease ("blast") skip the encoder when
+    # it beats the runner-up by LEXICAL_SHORTCUT_MARGIN and the input contains
+    # LEXICAL_SHORTCUT_MIN_COVERAGE of its name; inputs naming only part of a
+    # disease ("wilt") just restrict dense scoring to it; crops with at least
+    # LEXICAL_PREFILTER_MIN_ROWS rows only dense-score the best lexical
+    # candidate diseases; LEXICAL_FUSION_WEIGHT > 0 blends BM25 into the score
+    'LEXICAL_INDEX': True,
+    'LEXICAL_SHORTCUT_MAX_TERMS': 3,
+    'LEXICAL_SHORTCUT_MARGIN': 2.0,
+    'LEXICAL_SHORTCUT_MIN_COVERAGE': 1.0,
+    'LEXICAL_PREFILTER_MIN_ROWS': 5000,
+    'LEXICAL_PREFILTER_DISEASES': 50,
+    'LEXICAL_FUSION_WEIGHT': 0.0,
+    # Pick up edits to crop_disease_kb.json and rebuilt embedding artifacts
+    # without a restart (files are checked at most every KB_RELOAD_INTERVAL s)
+    'KB_HOT_RELOAD': True,
+    'KB_RELOAD_INTERVAL': 5.0,
+    # Per-stage diagnosis latency: logged at INFO on 'disease_detection.timing',
+    # optionally sent as a Server-Timing header (visible in browser devtools),
+    # and aggregated over the last STAGE_TIMING_WINDOW requests for pipeline_stats
+    'SERVER_TIMING_HEADER': False,
+    'STAGE_TIMING_WINDOW': 1000,
+    # Shared inference server (`manage.py run_inference_server`) owning the
+    # encoder and translators: 'unix:///run/agri/inference.sock' or
+    # 'http://127.0.0.1:8765'. None loads models in every worker; with
+    # INFERENCE_SERVER_FALLBACK, an unreachable server does the same. Without
+    # it, workers retry an unreachable server every MODEL_LOAD_RETRY_SECONDS
+    # and answer 503 in between
+    'INFERENCE_SERVER_URL': None,
+    'INFERENCE_SERVER_TIMEOUT': 30.0,
+    'INFERENCE_SERVER_FALLBACK': True,
+    'MODEL_LOAD_RETRY_SECONDS': 10.0,
+    # 'translate': Hindi/Marathi/code-mixed input is translated to English
+    # (MarianMT) and encoded with MiniLM. 'multilingual': input in any
+    # language is encoded directly with the multilingual encoder against
+    # kb/artifact_multilingual (`manage.py build_kb --multilingual`); set
+    # WARM_MODELS to ['kb_multilingual', 'multilingual_encoder'] with it
+    'RETRIEVAL_MODE': 'translate',
+    # Split multi-symptom messages into at most CLAUSE_MAX clauses, encode them
+    # with the message in one batch and rank diseases by a blend of their best
+    # clause match and (CLAUSE_COVERAGE_WEIGHT) their mean match over clauses
+    'CLAUSE_SPLITTING': True,
+    'CLAUSE_MAX': 6,
+    'CLAUSE_COVERAGE_WEIGHT': 0.5,
+    # Requests without a crop are scored against every crop in one pass and
+    # return (crop, disease) candidates; False keeps the crop mandatory.
+    # Follow-up actions may omit the crop when the disease name identifies it
+    'CROSS_CROP_DIAGNOSIS': True,
+    # Largest number of symptom reports accepted by detect_disease/batch/
+    'BATCH_MAX_ITEMS': 500,
+}
+
+
+def get_setting(name: str):
+    """Return a DISEASE_DETECTION setting, falling back to the app default"""
+    overrides = getattr(settings, 'DISEASE_DETECTION', {})
+    return overrides.get(name, DEFAULTS[name])
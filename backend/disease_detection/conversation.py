@@ -0,0 +1,57 @@
+"""
+Short-lived server-side state for diagnosis follow-ups
+
+A clarification response stores the symptom options it showed, and the
+disease each option came from, under an opaque token. The follow-up request
+sends the token back and resolves the user's choice without re-running
+translation, encoding or scoring.
+
+State lives in a Django cache (CONVERSATION_CACHE_ALIAS). Use a shared
+backend such as Redis or the database cache when running several workers.
+"""
+
+import secrets
+from typing import Dict, List, Optional
+
+from django.core.cache import caches
+
+from .conf import get_setting
+
+KEY_PREFIX = 'disease_detection:followup:'
+
+
+def _cache():
+    return caches[get_setting('CONVERSATION_CACHE_ALIAS')]
+
+
+def save_clarification(crop: str, options: List[str], option_diseases: List[Dict],
+                       user_lang: str, translated: bool) -> str:
+    """
+    Store the options of a clarification response
+
+    Args:
+        crop: Crop the diagnosis is for
+        options: Symptom texts shown to the user, in display order
+        option_diseases: For each option, {'disease_id', 'disease_name', 'crop'} of its disease
+        user_lang: Detected input language
+        translated: Whether the input was translated
+
+    Returns:
+        Opaque token to return to the client
+    """
+    token = secrets.token_urlsafe(16)
+    _cache().set(KEY_PREFIX + token, {
+        'crop': crop,
+        'options': options,
+        'option_diseases': option_diseases,
+        'user_lang': user_lang,
+        'translated': translated,
+    }, timeout=get_setting('CONVERSATION_STATE_TTL'))
+    return token
+
+
+def load_clarification(token: str) -> Optional[Dict]:
+    """Return the stored clarification state, or None if unknown or expired"""
+    if not token:
+        return None
+    return _cache().get(KEY_PREFIX + str(token))
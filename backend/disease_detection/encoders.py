@@ -0,0 +1,93 @@
+"""
+Pluggable symptom encoder backends
+
+Every backend exposes a SentenceTransformer-compatible `encode(texts)` that
+returns a (len(texts), dim) float32 array, so callers do not care which one
+is active. Select it with DISEASE_DETECTION['ENCODER_BACKEND']:
+  - 'torch': PyTorch SentenceTransformer (default)
+  - 'onnx':  ONNX Runtime export from kb/export_onnx_encoder.py, optionally
+             dynamically int8-quantized; cuts CPU per diagnosis (needs the
+             optional onnxruntime package, commented out in requirements.txt)
+"""
+
+import os
+from typing import List, Union
+
+import numpy as np
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kb', 'onnx_encoder')
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_QUANTIZED_MODEL_FILE = 'model_int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+MAX_SEQ_LENGTH = 128  # Same limit as paraphrase-MiniLM-L6-v2 in sentence-transformers
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Average token embeddings over non-padding positions (MiniLM's pooling)"""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence encoder running an exported transformer with ONNX Runtime
+
+    Uses the fast `tokenizers` tokenizer saved next to the model, so neither
+    torch nor transformers is imported in the web process.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, num_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found; run disease_detection/kb/export_onnx_encoder.py"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.model_path = model_path
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Embed texts (SentenceTransformer.encode-compatible subset)
+
+        Args:
+            texts: A single text or a list of texts
+            batch_size: Texts per ONNX Runtime call
+
+        Returns:
+            (len(texts), dim) float32 array, or a 1-D vector for a single text
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.zeros_like(input_ids)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            batches.append(mean_pool(token_embeddings, attention_mask))
+
+        embeddings = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), np.float32)
+        return embeddings[0] if single else embeddings
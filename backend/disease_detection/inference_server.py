@@ -0,0 +1,251 @@
+"""
+Shared inference server for the symptom encoder and translators
+
+One daemon (`python manage.py run_inference_server`) owns the NLP models and
+micro-batches requests from every web worker; workers talk to it through the
+thin clients below and stay at Django's baseline memory. Point workers at it
+with DISEASE_DETECTION['INFERENCE_SERVER_URL']:
+    'unix:///run/agri/inference.sock'  or  'http://127.0.0.1:8765'
+Leave it unset to keep models in-process (development).
+
+Protocol (JSON over HTTP/1.1):
+    GET  /health                                   -> {"models": {...}}
+    POST /encode    {"texts": [...], "model": name} -> {"shape": [n, dim], "embeddings": base64 float32}
+    POST /translate {"model": name, "texts": [...]} -> {"translations": [...]}
+"""
+
+import base64
+import http.client
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Union
+from urllib.parse import urlparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServerError(Exception):
+    """The inference server could not be reached or rejected a request"""
+
+
+# ---------------------------------------------------------------- client
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class InferenceClient:
+    """
+    Keep-alive JSON client for the inference server (one connection per thread)
+
+    Args:
+        url: 'unix:///path/to.sock' or 'http://host:port'
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        parsed = urlparse(url)
+        if parsed.scheme == 'unix':
+            self._connect = lambda: _UnixHTTPConnection(parsed.path, timeout)
+        elif parsed.scheme == 'http':
+            self._connect = lambda: http.client.HTTPConnection(
+                parsed.hostname, parsed.port or 80, timeout=timeout
+            )
+        else:
+            raise ValueError(f"Unsupported inference server URL: {url}")
+        self._local = threading.local()
+
+    def _request(self, method: str, path: str, payload: Dict = None) -> Dict:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        # Retry once on a fresh connection: the server may have closed an idle one
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = self._connect()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = json.loads(response.read() or b'{}')
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise InferenceServerError(f"{self.url}{path}: {e}") from e
+                continue
+            if response.status != 200:
+                raise InferenceServerError(f"{self.url}{path}: {data.get('error', response.status)}")
+            return data
+
+    def health(self) -> Dict:
+        return self._request('GET', '/health')
+
+    def encode(self, texts: List[str], model: str = 'encoder') -> np.ndarray:
+        data = self._request('POST', '/encode', {'texts': texts, 'model': model})
+        return np.frombuffer(base64.b64decode(data['embeddings']), dtype=np.float32).reshape(data['shape'])
+
+    def translate(self, model: str, texts: List[str]) -> List[str]:
+        return self._request('POST', '/translate', {'model': model, 'texts': texts})['translations']
+
+
+class RemoteEncoder:
+    """SentenceTransformer-compatible encoder backed by the inference server"""
+
+    def __init__(self, client: InferenceClient, model: str = 'encoder'):
+        self.client = client
+        self.model = model
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.client.encode([texts], self.model)[0]
+        return self.client.encode(list(texts), self.model)
+
+
+class RemoteTranslator:
+    """Translation-pipeline-compatible callable backed by the inference server"""
+
+    def __init__(self, client: InferenceClient, model: str):
+        self.client = client
+        self.model = model
+
+    def __call__(self, texts: Union[str, List[str]], **kwargs) -> List[Dict[str, str]]:
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        return [{'translation_text': t} for t in self.client.translate(self.model, texts)]
+
+
+# ---------------------------------------------------------------- server
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so workers reuse connections
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._send(404, {'error': 'Not found'})
+        registry = self.server.registry
+        self._send(200, {'models': registry.stats(), 'model_pool': registry.pool.stats()})
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            texts = payload['texts']
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError('texts must be a list of strings')
+        except (KeyError, ValueError) as e:
+            return self._send(400, {'error': f'Bad request: {e}'})
+
+        try:
+            if self.path == '/encode':
+                self._send(200, self._encode(payload.get('model', 'encoder'), texts))
+            elif self.path == '/translate':
+                self._send(200, self._translate(payload.get('model'), texts))
+            else:
+                self._send(404, {'error': 'Not found'})
+        except LookupError as e:
+            self._send(404, {'error': str(e)})
+        except Exception as e:
+            logger.exception(f"Inference failed for {self.path}")
+            self._send(500, {'error': str(e)})
+
+    def _model(self, name):
+        model = self.server.registry.get(name)
+        if model is None:
+            raise LookupError(f'Model {name} failed to load')
+        return model
+
+    def _encode(self, model, texts):
+        from .model_registry import ENCODER_MODELS
+        if model not in ENCODER_MODELS:
+            raise LookupError(f'Unknown encoder {model}')
+        encoder = self._model(model)
+        # Single texts go through the micro-batcher, so concurrent workers share a forward pass
+        if len(texts) == 1:
+            embeddings = np.asarray(encoder.encode(texts[0]), dtype=np.float32)[None, :]
+        else:
+            embeddings = np.asarray(encoder.encode(texts), dtype=np.float32)
+        return {
+            'shape': list(embeddings.shape),
+            'embeddings': base64.b64encode(np.ascontiguousarray(embeddings).tobytes()).decode('ascii'),
+        }
+
+    def _translate(self, model, texts):
+        from .model_registry import TRANSLATION_MODELS
+        if model not in TRANSLATION_MODELS:
+            raise LookupError(f'Unknown translation model {model}')
+        translator = self._model(model)
+        if len(texts) == 1:
+            return {'translations': [translator(texts[0])[0]['translation_text']]}
+        return {'translations': [r['translation_text'] for r in translator(texts)]}
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+# Every web worker thread may connect at once; the default listen backlog is 5
+LISTEN_BACKLOG = 128
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def server_bind(self):
+        # Replace a socket file left behind by a previous run
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+        os.chmod(self.server_address, 0o660)
+
+
+class _ThreadingTCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+
+def make_server(url: str, registry):
+    """
+    Build (but do not start) the inference server
+
+    Args:
+        url: 'unix:///path/to.sock' or 'http://host:port' to listen on
+        registry: ModelRegistry owning the models (see model_registry.build_registry)
+
+    Returns:
+        A socketserver instance; call serve_forever()
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'unix':
+        server = _ThreadingUnixHTTPServer(parsed.path, _Handler)
+    elif parsed.scheme == 'http':
+        server = _ThreadingTCPHTTPServer((parsed.hostname, parsed.port or 80), _Handler)
+    else:
+        raise ValueError(f"Unsupported inference server URL: {url}")
+    server.registry = registry
+    return server
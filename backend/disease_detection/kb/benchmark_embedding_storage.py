@@ -0,0 +1,119 @@
+"""
+Script to compare reduced-precision / PCA-reduced embedding storage with the
+full-precision float32 matrix: disease top-1/top-3 agreement, score drift,
+size and latency. Run it before passing --dtype or --pca-dim to
+`manage.py build_kb`.
+
+Usage:
+    python benchmark_embedding_storage.py                         # crops of a float32 kb/artifact
+    python benchmark_embedding_storage.py --synthetic 200000      # simulated large crop
+    python benchmark_embedding_storage.py --dtypes int8 --pca-dims 96 128
+
+Queries are KB symptom embeddings with Gaussian noise added (no encoder is
+needed), so treat the numbers as a guide and re-check with real queries.
+top-1 is the share of queries whose best disease is unchanged; top-3 is the
+average overlap of the top-3 diseases. "drift" is the mean absolute change of
+the best disease score, which decides the 0.60 confidence threshold.
+Synthetic crops are generated in --intrinsic-dim dimensions and rotated into
+--dim, since real sentence embeddings are far from isotropic.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(BASE_DIR, 'artifact')
+
+# Allow `python benchmark_embedding_storage.py` from inside kb/
+sys.path.insert(0, os.path.dirname(os.path.dirname(BASE_DIR)))
+from disease_detection.kb_index import CropIndex, SymptomIndex, read_manifest
+from disease_detection.quantization import as_matrix, compress_embeddings
+from benchmark_vector_index import jitter, make_queries, synthetic_crop
+
+def embedded_synthetic_crop(args):
+    """Synthetic crop built in a low-dimensional subspace of the embedding space"""
+    low = synthetic_crop(args.synthetic, args.intrinsic_dim, args.symptoms_per_disease, args.seed)
+    rng = np.random.default_rng(args.seed)
+    basis, _ = np.linalg.qr(rng.standard_normal((args.dim, args.intrinsic_dim)))
+    embeddings = jitter(low.embeddings @ basis.T.astype(np.float32), 0.1, rng)
+    return CropIndex('synthetic', embeddings, low.disease_ids, low.symptom_texts, normalized=True)
+
+def rank_diseases(crop_index, queries):
+    """Ranked disease groups, best disease score and per-query latency (ms)"""
+    rankings = []
+    best_scores = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        scores = crop_index.aggregate(crop_index.score(query))
+        timings.append((time.perf_counter() - start) * 1000)
+        rankings.append(scores.ranking[:3].tolist())
+        best_scores.append(scores.max_scores[scores.ranking[0]])
+    return rankings, np.array(best_scores), np.array(timings)
+
+def report(name, size, timings, agreement=None):
+    line = (f"  {name:<18} {size / 2**20:8.2f} MB  p50 {np.percentile(timings, 50):7.3f} ms"
+            f"  p95 {np.percentile(timings, 95):7.3f} ms")
+    if agreement is not None:
+        top1, top3, drift = agreement
+        line += f"  top-1 {top1:6.2%}  top-3 {top3:6.2%}  drift {drift:.4f}"
+    print(line)
+
+def compressed_crop(crop_index, dtype, pca_dim):
+    codes, scales, projection, _ = compress_embeddings(crop_index.embeddings, dtype, pca_dim)
+    return CropIndex(
+        crop_index.crop, as_matrix(codes, scales), crop_index.disease_ids,
+        crop_index.symptom_texts, normalized=True, projection=projection,
+    ), codes.nbytes + (0 if scales is None else scales.nbytes)
+
+def benchmark_crop(crop_index, args):
+    queries = make_queries(crop_index, args.queries, args.noise, args.seed)
+    baseline, baseline_best, baseline_ms = rank_diseases(crop_index, queries)
+
+    print(f"\n{crop_index.crop}: {len(crop_index)} rows x {crop_index.embeddings.shape[1]}, "
+          f"{len(crop_index.group_starts)} diseases")
+    report('float32', crop_index.embeddings.nbytes, baseline_ms)
+
+    configs = [(dtype, None) for dtype in args.dtypes]
+    configs += [(dtype, pca_dim) for pca_dim in args.pca_dims for dtype in ['float32'] + args.dtypes]
+    for dtype, pca_dim in configs:
+        if pca_dim is not None and pca_dim >= crop_index.embeddings.shape[1]:
+            continue
+        reduced, size = compressed_crop(crop_index, dtype, pca_dim)
+        rankings, best, timings = rank_diseases(reduced, queries)
+        top1 = np.mean([r[0] == b[0] for r, b in zip(rankings, baseline)])
+        top3 = np.mean([len(set(r) & set(b)) / len(b) for r, b in zip(rankings, baseline)])
+        drift = float(np.mean(np.abs(best - baseline_best)))
+        name = dtype if pca_dim is None else f'{dtype} pca={pca_dim}'
+        report(name, size, timings, (top1, top3, drift))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artifact-dir', default=ARTIFACT_DIR)
+    parser.add_argument('--synthetic', type=int, default=None, help='Benchmark a simulated crop with this many rows')
+    parser.add_argument('--symptoms-per-disease', type=int, default=8)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--intrinsic-dim', type=int, default=64)
+    parser.add_argument('--dtypes', nargs='+', choices=['float16', 'int8'], default=['float16', 'int8'])
+    parser.add_argument('--pca-dims', type=int, nargs='+', default=[128])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.5, help='Query noise norm relative to a unit embedding')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        crops = [embedded_synthetic_crop(args)]
+    else:
+        manifest = read_manifest(args.artifact_dir)
+        if manifest.get('dtype', 'float32') != 'float32' or manifest.get('projection'):
+            sys.exit('❌ The artifact is already reduced; rebuild it at full precision to compare')
+        crops = list(SymptomIndex.from_artifact(args.artifact_dir).crops.values())
+
+    for crop_index in crops:
+        benchmark_crop(crop_index, args)
+
+if __name__ == '__main__':
+    main()
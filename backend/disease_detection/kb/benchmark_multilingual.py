@@ -0,0 +1,132 @@
+"""
+Script to compare the two retrieval modes on labeled Hindi/Marathi queries:
+  translate     MarianMT to English, then MiniLM against kb/artifact
+  multilingual  multilingual MiniLM directly against kb/artifact_multilingual
+Reports per-language disease top-1/top-3 accuracy and per-query latency
+(p50/p95, translation included) before switching
+DISEASE_DETECTION['RETRIEVAL_MODE'] to 'multilingual'.
+
+Build both artifacts first:
+    python manage.py build_kb
+    python manage.py build_kb --multilingual
+
+Usage:
+    python benchmark_multilingual.py                        # kb/multilingual_eval.json
+    python benchmark_multilingual.py --eval my_queries.json --cross-crop
+
+The eval file is a list of {"crop", "disease_name", "lang", "text"}.
+Latencies are measured without the query caches, one query at a time.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVAL_JSON = os.path.join(BASE_DIR, 'multilingual_eval.json')
+ARTIFACT_DIR = os.path.join(BASE_DIR, 'artifact')
+MULTILINGUAL_ARTIFACT_DIR = os.path.join(BASE_DIR, 'artifact_multilingual')
+ENCODER_MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+MULTILINGUAL_ENCODER_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+TRANSLATION_MODELS = {
+    'hi': 'Helsinki-NLP/opus-mt-hi-en',
+    'mr': 'Helsinki-NLP/opus-mt-mr-en',
+}
+
+# Allow `python benchmark_multilingual.py` from inside kb/
+sys.path.insert(0, os.path.dirname(os.path.dirname(BASE_DIR)))
+from disease_detection.kb_index import SymptomIndex, read_manifest
+
+def load_index(artifact_dir, model_name, build_command):
+    try:
+        manifest = read_manifest(artifact_dir)
+    except FileNotFoundError:
+        sys.exit(f"❌ {artifact_dir} not found; build it with `{build_command}`")
+    if manifest['model'] != model_name:
+        sys.exit(f"❌ {artifact_dir} was embedded with {manifest['model']}, expected {model_name}")
+    return SymptomIndex.from_artifact(artifact_dir)
+
+def top_diseases(symptom_index, crop_index, query_emb, k=3):
+    """Names of the k best diseases for one query embedding"""
+    scores = crop_index.aggregate(crop_index.score(query_emb))
+    return [symptom_index.disease(crop_index.group_disease_ids[group])['disease_name']
+            for group in scores.ranking[:k]]
+
+def run_mode(name, symptom_index, queries, prepare, encoder, cross_crop):
+    """Rank every query and collect (lang, top-1 hit, top-3 hit, ms) rows"""
+    rows = []
+    for query in queries:
+        crop_index = symptom_index.all_crops if cross_crop else symptom_index.get(query['crop'])
+        if crop_index is None:
+            print(f"  ⚠️ {name}: crop {query['crop']} not in the KB, skipped")
+            continue
+        start = time.perf_counter()
+        text = prepare(query)
+        query_emb = np.asarray(encoder.encode([text])[0], dtype=np.float32)
+        ranked = top_diseases(symptom_index, crop_index, query_emb)
+        elapsed = (time.perf_counter() - start) * 1000
+        rows.append((query['lang'], ranked[:1] == [query['disease_name']], query['disease_name'] in ranked, elapsed))
+    return rows
+
+def report(name, rows):
+    for lang in sorted({row[0] for row in rows}):
+        lang_rows = [row for row in rows if row[0] == lang]
+        top1 = np.mean([row[1] for row in lang_rows])
+        top3 = np.mean([row[2] for row in lang_rows])
+        timings = np.array([row[3] for row in lang_rows])
+        print(f"  {name:<13} {lang}  n={len(lang_rows):<4} top-1 {top1:6.1%}  top-3 {top3:6.1%}  "
+              f"p50 {np.percentile(timings, 50):7.1f} ms  p95 {np.percentile(timings, 95):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--eval', default=EVAL_JSON, help='Labeled queries JSON')
+    parser.add_argument('--artifact-dir', default=ARTIFACT_DIR)
+    parser.add_argument('--multilingual-artifact-dir', default=MULTILINGUAL_ARTIFACT_DIR)
+    parser.add_argument('--cross-crop', action='store_true', help='Rank against all crops instead of the labeled one')
+    args = parser.parse_args()
+
+    with open(args.eval, 'r', encoding='utf-8') as f:
+        queries = json.load(f)
+    queries = [query for query in queries if query['lang'] in TRANSLATION_MODELS]
+    print(f"Loaded {len(queries)} labeled queries")
+
+    english_index = load_index(args.artifact_dir, ENCODER_MODEL_NAME, 'python manage.py build_kb')
+    multilingual_index = load_index(args.multilingual_artifact_dir, MULTILINGUAL_ENCODER_MODEL_NAME,
+                                    'python manage.py build_kb --multilingual')
+
+    from sentence_transformers import SentenceTransformer
+    from transformers import pipeline
+    print("Loading models...")
+    encoder = SentenceTransformer(ENCODER_MODEL_NAME)
+    multilingual_encoder = SentenceTransformer(MULTILINGUAL_ENCODER_MODEL_NAME)
+    translators = {
+        lang: pipeline('translation', model=model_name)
+        for lang, model_name in TRANSLATION_MODELS.items()
+        if any(query['lang'] == lang for query in queries)
+    }
+
+    # One untimed pass per model so lazy initialization does not skew p95
+    for model in (encoder, multilingual_encoder):
+        model.encode(['leaves turning yellow'])
+    for translator in translators.values():
+        translator('पत्ते पीले हो रहे हैं')
+
+    def translate(query):
+        return translators[query['lang']](query['text'])[0]['translation_text']
+
+    results = {
+        'translate': run_mode('translate', english_index, queries, translate, encoder, args.cross_crop),
+        'multilingual': run_mode('multilingual', multilingual_index, queries, lambda query: query['text'],
+                                 multilingual_encoder, args.cross_crop),
+    }
+
+    print(f"\n{'cross-crop' if args.cross_crop else 'per-crop'} ranking:")
+    for name, rows in results.items():
+        report(name, rows)
+
+if __name__ == '__main__':
+    main()
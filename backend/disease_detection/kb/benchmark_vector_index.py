@@ -0,0 +1,113 @@
+"""
+Script to compare the exact and IVF symptom indexes: disease recall@k and latency.
+Run it before switching DISEASE_DETECTION['VECTOR_INDEX'] to 'ivf' and to pick
+IVF_NPROBE.
+
+Usage:
+    python benchmark_vector_index.py                        # crops of kb/artifact
+    python benchmark_vector_index.py --synthetic 200000     # simulated large crop
+    python benchmark_vector_index.py --nprobe 4 8 16 --k 3
+
+Queries are KB symptom embeddings with Gaussian noise added (no encoder is
+needed), so treat the numbers as a guide and re-check with real queries.
+recall@k is the share of the exact top-k diseases that the IVF index also
+ranks in its top-k, averaged over queries.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(BASE_DIR, 'artifact')
+
+# Allow `python benchmark_vector_index.py` from inside kb/
+sys.path.insert(0, os.path.dirname(os.path.dirname(BASE_DIR)))
+from disease_detection.kb_index import CropIndex, SymptomIndex, l2_normalize
+from disease_detection.vector_index import ExactIndex, IVFIndex
+
+def jitter(vectors, scale, rng):
+    """Add Gaussian noise whose expected norm is `scale`, then re-normalize"""
+    noise = rng.standard_normal(vectors.shape).astype(np.float32) * (scale / np.sqrt(vectors.shape[-1]))
+    return l2_normalize(vectors + noise)
+
+def synthetic_crop(n_rows, dim, symptoms_per_disease, seed):
+    """Crop whose diseases form families, like related blights or rusts"""
+    rng = np.random.default_rng(seed)
+    n_diseases = max(1, n_rows // symptoms_per_disease)
+    n_families = max(1, int(np.sqrt(n_diseases)))
+    families = l2_normalize(rng.standard_normal((n_families, dim)))
+    centres = jitter(families[rng.integers(0, n_families, n_diseases)], 0.8, rng)
+    disease_ids = np.sort(rng.integers(0, n_diseases, n_rows))
+    embeddings = jitter(centres[disease_ids], 0.6, rng)
+    return CropIndex('synthetic', embeddings, disease_ids, [''] * n_rows, normalized=True)
+
+def make_queries(crop_index, n_queries, noise, seed):
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(crop_index), n_queries)
+    return jitter(crop_index.embeddings[rows], noise, rng)
+
+def top_diseases(crop_index, queries, k):
+    """Top-k disease groups and per-query latency (ms) with the crop's current index"""
+    results = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        scores = crop_index.aggregate(crop_index.score(query))
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(set(scores.ranking[:k].tolist()))
+    return results, np.array(timings)
+
+def report(name, timings, recall=None):
+    line = f"  {name:<14} p50 {np.percentile(timings, 50):7.3f} ms  p95 {np.percentile(timings, 95):7.3f} ms"
+    if recall is not None:
+        line += f"  recall@k {recall:.2%}"
+    print(line)
+
+def benchmark_crop(crop_index, args):
+    queries = make_queries(crop_index, args.queries, args.noise, args.seed)
+
+    crop_index.vector_index = ExactIndex(crop_index.embeddings)
+    exact, exact_ms = top_diseases(crop_index, queries, args.k)
+
+    build_start = time.perf_counter()
+    ivf = IVFIndex.build(crop_index.embeddings, n_lists=args.lists, seed=args.seed)
+    build_seconds = time.perf_counter() - build_start
+
+    print(f"\n{crop_index.crop}: {len(crop_index)} rows, {len(crop_index.group_starts)} diseases, "
+          f"{len(ivf.centroids)} IVF lists (built in {build_seconds:.2f}s)")
+    report('exact', exact_ms)
+
+    for nprobe in sorted({min(n, len(ivf.centroids)) for n in args.nprobe}):
+        ivf.nprobe = nprobe
+        crop_index.vector_index = ivf
+        approx, ivf_ms = top_diseases(crop_index, queries, args.k)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+        report(f'ivf nprobe={ivf.nprobe}', ivf_ms, recall)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artifact-dir', default=ARTIFACT_DIR)
+    parser.add_argument('--synthetic', type=int, default=None, help='Benchmark a simulated crop with this many rows')
+    parser.add_argument('--symptoms-per-disease', type=int, default=8)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--lists', type=int, default=None, help='IVF lists (default: about sqrt(rows))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.5, help='Query noise norm relative to a unit embedding')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        crops = [synthetic_crop(args.synthetic, args.dim, args.symptoms_per_disease, args.seed)]
+    else:
+        crops = list(SymptomIndex.from_artifact(args.artifact_dir).crops.values())
+
+    for crop_index in crops:
+        benchmark_crop(crop_index, args)
+
+if __name__ == '__main__':
+    main()
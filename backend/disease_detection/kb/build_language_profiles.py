@@ -0,0 +1,50 @@
+"""
+Script to build the compact Hindi/Marathi character n-gram profiles used by
+disease_detection/language_id.py for Devanagari text.
+
+Keeps only the Devanagari 1-3 grams of langdetect's 'hi' and 'mr' profiles
+(Apache-2.0), so the web process never needs to load langdetect's 55 profiles
+for the common case.
+
+Usage:
+    python build_language_profiles.py                          # from the installed langdetect
+    python build_language_profiles.py --profiles-dir path/to/langdetect/profiles
+"""
+
+import os
+import json
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT = os.path.join(os.path.dirname(BASE_DIR), 'language_profiles.json')
+LANGUAGES = ['hi', 'mr']
+
+def is_devanagari_gram(gram):
+    return any('ऀ' <= ch <= 'ॿ' for ch in gram) and all(
+        ch == ' ' or 'ऀ' <= ch <= 'ॿ' for ch in gram
+    )
+
+def build(profiles_dir, output):
+    profiles = {}
+    for lang in LANGUAGES:
+        with open(os.path.join(profiles_dir, lang), 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        freq = {gram: count for gram, count in profile['freq'].items() if is_devanagari_gram(gram)}
+        profiles[lang] = {'n_words': profile['n_words'], 'freq': freq}
+        print(f"  ✓ {lang}: kept {len(freq)} of {len(profile['freq'])} n-grams")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    print(f"✅ Wrote {output} ({os.path.getsize(output) // 1024} KB)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles-dir', default=None)
+    parser.add_argument('--output', default=OUTPUT)
+    args = parser.parse_args()
+
+    profiles_dir = args.profiles_dir
+    if profiles_dir is None:
+        import langdetect
+        profiles_dir = os.path.join(os.path.dirname(langdetect.__file__), 'profiles')
+    build(profiles_dir, args.output)
@@ -0,0 +1,138 @@
+"""
+Script to export the symptom encoder to ONNX for the 'onnx' encoder backend.
+Run this once per encoder model (not per KB edit), then set
+DISEASE_DETECTION['ENCODER_BACKEND'] = 'onnx'. ONNX Runtime is optional and
+not installed by requirements.txt: `pip install "onnxruntime>=1.17.0,<2.0"`.
+
+Usage:
+    python export_onnx_encoder.py               # fp32 export + parity check
+    python export_onnx_encoder.py --quantize    # also dynamic int8 (model_int8.onnx)
+    python export_onnx_encoder.py --check-only  # re-run the parity check
+
+The parity check embeds every KB symptom with PyTorch and with ONNX Runtime
+and fails (exit code 1) if embeddings drift or nearest-symptom retrieval
+disagrees beyond the given thresholds.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KB_JSON = os.path.join(BASE_DIR, 'crop_disease_kb.json')
+ONNX_DIR = os.path.join(BASE_DIR, 'onnx_encoder')
+MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+
+# Allow `python export_onnx_encoder.py` from inside kb/
+sys.path.insert(0, os.path.dirname(os.path.dirname(BASE_DIR)))
+from disease_detection.encoders import (
+    OnnxSentenceEncoder, ONNX_MODEL_FILE, ONNX_QUANTIZED_MODEL_FILE,
+)
+from disease_detection.kb_index import l2_normalize
+
+def export(st_model, out_dir, quantize):
+    import torch
+
+    os.makedirs(out_dir, exist_ok=True)
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model[0].tokenizer
+
+    dummy = tokenizer(['leaves turning yellow'], return_tensors='pt')
+    input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    onnx_path = os.path.join(out_dir, ONNX_MODEL_FILE)
+    print(f"Exporting {MODEL_NAME} to {onnx_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy['input_ids'], dummy['attention_mask'], dummy['token_type_ids']),
+            onnx_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    # Writes tokenizer.json, which the runtime loads with the `tokenizers` library
+    tokenizer.save_pretrained(out_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(out_dir, ONNX_QUANTIZED_MODEL_FILE)
+        print(f"Quantizing weights to int8: {quantized_path}...")
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+
+def nearest_disease(embeddings, labels):
+    """Disease of the most similar *other* symptom for every symptom (leave-one-out)"""
+    normalized = l2_normalize(embeddings)
+    sims = normalized @ normalized.T
+    np.fill_diagonal(sims, -np.inf)
+    return labels[np.argmax(sims, axis=1)]
+
+def time_single_queries(encoder, texts, repeats=50):
+    start = time.perf_counter()
+    for i in range(repeats):
+        encoder.encode([texts[i % len(texts)]])
+    return (time.perf_counter() - start) / repeats * 1000
+
+def parity_check(st_model, out_dir, quantized, min_cosine, min_agreement):
+    with open(KB_JSON, 'r', encoding='utf-8') as f:
+        diseases = json.load(f)
+    symptoms = [s for d in diseases for s in d['symptoms']]
+    labels = np.array([f"{d['crop_name']}|{d['disease_name']}" for d in diseases for _ in d['symptoms']])
+
+    reference = np.asarray(st_model.encode(symptoms), dtype=np.float32)
+    reference_nearest = nearest_disease(reference, labels)
+    torch_ms = time_single_queries(st_model, symptoms)
+    print(f"\nPyTorch: {torch_ms:.2f} ms per single-sentence query")
+
+    variants = [False, True] if quantized else [False]
+    ok = True
+    for use_int8 in variants:
+        name = 'ONNX int8' if use_int8 else 'ONNX fp32'
+        encoder = OnnxSentenceEncoder(out_dir, quantized=use_int8)
+        embeddings = encoder.encode(symptoms)
+
+        cosine = np.sum(l2_normalize(reference) * l2_normalize(embeddings), axis=1)
+        agreement = float(np.mean(nearest_disease(embeddings, labels) == reference_nearest))
+        onnx_ms = time_single_queries(encoder, symptoms)
+
+        print(f"{name}: {onnx_ms:.2f} ms per query ({torch_ms / onnx_ms:.1f}x), "
+              f"cosine to PyTorch mean {cosine.mean():.4f} / min {cosine.min():.4f}, "
+              f"nearest-symptom disease agreement {agreement:.2%} over {len(symptoms)} symptoms")
+
+        if cosine.mean() < min_cosine or agreement < min_agreement:
+            print(f"  ✗ {name} below thresholds (cosine >= {min_cosine}, agreement >= {min_agreement})")
+            ok = False
+        else:
+            print(f"  ✓ {name} within thresholds")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out-dir', default=ONNX_DIR)
+    parser.add_argument('--quantize', action='store_true', help='Also write a dynamic int8 model')
+    parser.add_argument('--check-only', action='store_true', help='Skip export, only run the parity check')
+    parser.add_argument('--min-cosine', type=float, default=0.97)
+    parser.add_argument('--min-agreement', type=float, default=0.95)
+    args = parser.parse_args()
+
+    print("Loading embedding model...")
+    st_model = SentenceTransformer(MODEL_NAME)
+
+    if not args.check_only:
+        export(st_model, args.out_dir, args.quantize)
+
+    quantized = args.quantize or os.path.exists(os.path.join(args.out_dir, ONNX_QUANTIZED_MODEL_FILE))
+    if not parity_check(st_model, args.out_dir, quantized, args.min_cosine, args.min_agreement):
+        sys.exit(1)
+    print("\n✅ ONNX encoder ready")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Incremental KB artifact build (`python manage.py build_kb`)
+
+Symptom embeddings are cached on disk under a hash of (model name, symptom
+text), one cache file per model, so a rebuild only encodes new or edited
+symptoms, in large batches. Edits that do not touch symptom text
+(treatments, prevention, new metadata) rebuild the artifact without loading
+the encoder at all.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .kb_index import KB_DIR, disease_key, save_artifact
+
+
+def embedding_cache_path(model_name: str) -> str:
+    """Default embedding cache file of an encoder"""
+    return os.path.join(KB_DIR, f"embedding_cache.{model_name.replace('/', '--')}.npz")
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Cache key of a symptom text's embedding under a given model"""
+    return hashlib.sha1(f'{model_name}\0{text}'.encode('utf-8')).hexdigest()
+
+
+def load_embedding_cache(path: str) -> Dict[str, np.ndarray]:
+    """
+    Read cached embeddings written by save_embedding_cache
+
+    Returns:
+        {text_key: raw embedding}, empty if the file does not exist
+    """
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as data:
+        keys = data['keys'].astype(str)
+        embeddings = data['embeddings']
+    return dict(zip(keys, embeddings))
+
+
+def save_embedding_cache(path: str, cache: Dict[str, np.ndarray]):
+    """Write the embedding cache atomically"""
+    keys = sorted(cache)
+    tmp_path = path + '.tmp.npz'
+    np.savez(
+        tmp_path,
+        keys=np.array(keys, dtype='S40'),
+        embeddings=np.stack([cache[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32),
+    )
+    os.replace(tmp_path, path)
+
+
+def embed_texts(texts: List[str], model_name: str, load_encoder: Callable[[], object],
+                cache: Dict[str, np.ndarray], batch_size: int = 256,
+                progress: Optional[Callable[[int, int], None]] = None) -> Tuple[np.ndarray, int]:
+    """
+    Embed texts, encoding only those missing from the cache
+
+    Args:
+        texts: Symptom texts, in artifact order (duplicates are encoded once)
+        model_name: Encoder name, part of every cache key
+        load_encoder: Returns a SentenceTransformer-compatible encoder; only
+            called if something needs encoding
+        cache: {text_key: embedding}, updated in place
+        batch_size: Texts per encode call
+        progress: Called with (encoded, total to encode) after every batch
+
+    Returns:
+        ((len(texts), dim) float32 raw embeddings, number of texts encoded)
+    """
+    keys = [text_key(model_name, text) for text in texts]
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cache:
+            missing.setdefault(key, text)
+
+    if missing:
+        encoder = load_encoder()
+        pending = list(missing.items())
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            embeddings = np.asarray(
+                encoder.encode([text for _, text in batch], batch_size=batch_size),
+                dtype=np.float32,
+            )
+            for (key, _), embedding in zip(batch, embeddings):
+                cache[key] = embedding
+            if progress is not None:
+                progress(min(start + batch_size, len(pending)), len(pending))
+
+    if not keys:
+        return np.zeros((0, 0), dtype=np.float32), 0
+    return np.stack([cache[key] for key in keys]), len(missing)
+
+
+def load_phrasings(path: str, diseases: List[Dict]) -> Tuple[List[List[str]], List[str]]:
+    """
+    Read curated symptom phrasings for the multilingual artifact
+
+    The file is a list of {"crop_name", "disease_name", "<lang>": [texts]}
+    entries, e.g. {"crop_name": "Rice", "disease_name": "Rice Blast",
+    "hi": [...], "mr": [...]}.
+
+    Args:
+        path: Phrasings JSON file
+        diseases: KB records the phrasings attach to
+
+    Returns:
+        (phrasings per disease in KB order, "crop / disease" of entries
+        that match no KB disease)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    lookup = {disease_key(d['crop_name'], d['disease_name']): i for i, d in enumerate(diseases)}
+    phrasings = [[] for _ in diseases]
+    unmatched = []
+    for entry in entries:
+        disease_id = lookup.get(disease_key(entry['crop_name'], entry['disease_name']))
+        if disease_id is None:
+            unmatched.append(f"{entry['crop_name']} / {entry['disease_name']}")
+            continue
+        for lang, texts in entry.items():
+            if lang not in ('crop_name', 'disease_name'):
+                phrasings[disease_id].extend(text for text in texts if text.strip())
+    return phrasings, unmatched
+
+
+def build_kb(diseases: List[Dict], artifact_dir: str, model_name: str,
+             load_encoder: Callable[[], object], cache_path: Optional[str] = None,
+             full: bool = False, batch_size: int = 256,
+             progress: Optional[Callable[[int, int], None]] = None,
+             phrasings: Optional[List[List[str]]] = None, **artifact_options) -> Tuple[Dict, Dict]:
+    """
+    Embed every symptom of the KB (reusing cached embeddings) and write the artifact
+
+    Args:
+        diseases: KB records from crop_disease_kb.json
+        artifact_dir: Output directory for save_artifact
+        model_name: Encoder name recorded in the manifest and cache keys
+        load_encoder: Returns the encoder; not called when everything is cached
+        cache_path: Embedding cache file (defaults to embedding_cache_path(model_name))
+        full: Ignore the cache and re-encode every symptom
+        batch_size: Texts per encode call
+        progress: See embed_texts
+        phrasings: Extra texts per disease, embedded as rows of that disease
+            (see load_phrasings and save_artifact)
+        **artifact_options: Passed to save_artifact (ivf_min_rows, ivf_lists,
+            dtype, pca_dim)
+
+    Returns:
+        (manifest, stats) where stats counts embedded texts (symptoms plus
+        phrasings), phrasings, unique texts, texts encoded and reused, and
+        pruned cache entries
+    """
+    if phrasings is None:
+        phrasings = [[] for _ in diseases]
+    cache_path = cache_path or embedding_cache_path(model_name)
+    # Same row order as save_artifact: each disease's symptoms, then its phrasings
+    texts = [text for disease, extra in zip(diseases, phrasings) for text in disease['symptoms'] + list(extra)]
+    cache = {} if full else load_embedding_cache(cache_path)
+    embeddings, encoded = embed_texts(texts, model_name, load_encoder, cache, batch_size, progress)
+
+    manifest = save_artifact(
+        artifact_dir, diseases, embeddings, model_name, phrasings=phrasings, **artifact_options
+    )
+
+    # Keep only entries this KB uses, so deleted symptoms and old models do not pile up
+    used = {text_key(model_name, text) for text in texts}
+    pruned = len(cache) - len(used)
+    save_embedding_cache(cache_path, {key: cache[key] for key in used})
+
+    return manifest, {
+        'texts': len(texts),
+        'phrasings': sum(len(extra) for extra in phrasings),
+        'unique': len(used),
+        'encoded': encoded,
+        'reused': len(used) - encoded,
+        'pruned': pruned,
+    }
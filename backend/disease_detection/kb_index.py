@@ -0,0 +1,786 @@
+"""
+Crop-partitioned symptom embedding index for disease detection
+Built once when the KB is loaded so a diagnosis only needs a matrix-vector product
+"""
+
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .lexical_index import BM25Index, tokenize
+from .localization import Localizations, load_localizations
+from .model_registry import TransientLoadError
+from .quantization import QuantizedMatrix, as_matrix, compress_embeddings, project
+from .vector_index import ExactIndex, IVFIndex, UNSEARCHED_SCORE
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KB_DIR = os.path.join(BASE_DIR, 'kb')
+KB_JSON = os.path.join(KB_DIR, 'crop_disease_kb.json')
+EMBEDDINGS_PKL = os.path.join(KB_DIR, 'symptom_embeddings_new.pkl')  # Legacy fallback
+KB_ARTIFACT_DIR = os.path.join(KB_DIR, 'artifact')  # Built by `manage.py build_kb`
+# Multilingual encoder artifact (`manage.py build_kb --multilingual`) and the
+# optional curated Hindi/Marathi symptom phrasings it also embeds
+KB_MULTILINGUAL_ARTIFACT_DIR = os.path.join(KB_DIR, 'artifact_multilingual')
+PHRASINGS_JSON = os.path.join(KB_DIR, 'symptom_phrasings.json')
+KB_LOCALIZED_JSON = os.path.join(KB_DIR, 'crop_disease_kb_localized.json')  # `manage.py localize_kb`
+
+# On-disk KB artifact layout (bump ARTIFACT_VERSION when it changes)
+ARTIFACT_VERSION = 2
+SUPPORTED_ARTIFACT_VERSIONS = (1, 2)  # Version 1 is float32 without projection
+MANIFEST_FILE = 'manifest.json'
+EMBEDDINGS_FILE = 'embeddings.npy'
+ROW_DISEASE_FILE = 'row_disease.npy'
+DISEASES_FILE = 'diseases.json'
+IVF_FILE = 'ivf.npz'  # Optional; only crops listed under manifest['ivf'] have lists
+SCALES_FILE = 'scales.npy'  # Per-row scales of int8 embeddings
+PROJECTION_FILE = 'projection.npy'  # PCA projection applied to queries (manifest['projection'])
+
+# Crop name of the index spanning every crop (cross-crop diagnosis)
+ALL_CROPS = '*'
+
+
+def disease_key(crop: str, disease_name: str) -> Tuple[str, str]:
+    """Case-insensitive (crop, disease) lookup key"""
+    return crop.strip().lower(), disease_name.strip().lower()
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    Return a float32 copy of matrix with every row scaled to unit length
+
+    Args:
+        matrix: 1-D vector or 2-D array of row vectors
+
+    Returns:
+        Normalized float32 array (zero rows are left as zeros)
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LexicalMatch(NamedTuple):
+    """Disease named by a keyword query (see CropIndex.lexical_match)"""
+    group: int    # position of the disease within its CropIndex
+    row: int      # its symptom row with the best BM25 score
+    exact: bool   # the query names the whole disease, not just part of it
+
+
+class DiseaseScores(NamedTuple):
+    """
+    Per-disease view of a symptom similarity vector
+
+    All arrays are indexed by group (the position of a disease within its
+    CropIndex), except `ranking`, which lists groups from best to worst.
+    """
+    disease_ids: np.ndarray  # (G,) KB disease id of each group
+    max_scores: np.ndarray   # (G,) best symptom similarity
+    mean_scores: np.ndarray  # (G,) mean symptom similarity
+    top_rows: np.ndarray     # (G, k) best symptom rows, descending, padded with -1
+    ranking: np.ndarray      # groups sorted by max score, descending
+
+    @property
+    def best_rows(self) -> np.ndarray:
+        """Row of the best matching symptom for each group"""
+        return self.top_rows[:, 0]
+
+
+class CropIndex:
+    """
+    Symptom embeddings for a single crop
+
+    Rows of `embeddings`, `disease_ids` and `symptom_texts` are parallel:
+    row i is the embedding of symptom_texts[i], which belongs to the disease
+    stored at SymptomIndex.diseases[disease_ids[i]].
+
+    Rows are kept grouped by disease so each disease is one contiguous segment
+    (group); `group_ids`, `group_starts` and `group_sizes` describe those
+    segments for NumPy segment reductions.
+
+    Single-query scoring goes through `vector_index` (exact by default; see
+    vector_index.py), which may score only a subset of rows. `lexical` is a
+    BM25 index over the same rows (symptom text plus disease name), built by
+    SymptomIndex once disease names are known.
+
+    Artifacts may store `embeddings` as float16/int8 (a QuantizedMatrix) and
+    PCA-reduced; `projection` then maps encoder queries into the same space
+    (see quantization.py).
+    """
+
+    def __init__(self, crop: str, embeddings: np.ndarray, disease_ids: np.ndarray,
+                 symptom_texts: List[str], normalized: bool = False,
+                 projection: Optional[np.ndarray] = None):
+        self.crop = crop
+        self.projection = projection
+        disease_ids = np.asarray(disease_ids, dtype=np.int32)
+        symptom_texts = np.asarray(symptom_texts, dtype=object)
+        if not normalized:
+            embeddings = l2_normalize(embeddings)
+
+        # Artifacts are already grouped; only legacy rows may need reordering
+        is_start = np.diff(disease_ids, prepend=-1) != 0
+        if np.count_nonzero(is_start) != len(np.unique(disease_ids)):
+            order = np.argsort(disease_ids, kind='stable')
+            embeddings = np.asarray(embeddings)[order]
+            disease_ids = disease_ids[order]
+            symptom_texts = symptom_texts[order]
+            is_start = np.diff(disease_ids, prepend=-1) != 0
+
+        if not isinstance(embeddings, QuantizedMatrix):
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.embeddings = embeddings
+        self.disease_ids = disease_ids
+        self.symptom_texts = symptom_texts
+
+        group_starts = np.flatnonzero(is_start)
+        self.group_disease_ids = disease_ids[group_starts]
+        self.group_starts = group_starts.astype(np.intp)
+        self.group_ids = (np.cumsum(is_start) - 1).astype(np.intp)
+        self.group_sizes = np.diff(np.append(group_starts, len(disease_ids)))
+        self.vector_index = ExactIndex(self.embeddings)
+        self.lexical = None
+        self.group_name_terms = []
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def build_lexical(self, diseases: List[Dict]):
+        """Index every row's symptom text and disease name for BM25 lookups"""
+        names = [diseases[int(disease_id)]['disease_name'] for disease_id in self.group_disease_ids]
+        name_terms = [tokenize(name) for name in names]
+        self.lexical = BM25Index([
+            tokenize(text) + name_terms[group]
+            for text, group in zip(self.symptom_texts, self.group_ids)
+        ])
+        self.group_name_terms = [set(terms) for terms in name_terms]
+
+    def query_vector(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Normalize raw encoder output(s) and project them like the stored rows"""
+        query = l2_normalize(query_embedding)
+        return query if self.projection is None else project(query, self.projection)
+
+    def score(self, query_embedding: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine similarity of the query against every symptom of this crop
+
+        Args:
+            query_embedding: Raw (unnormalized) query vector from the encoder
+            rows: Only score these rows (e.g. lexical candidates) instead of
+                going through the vector index
+
+        Returns:
+            1-D float32 array of similarities, one per symptom row (rows that
+            were not searched score -1)
+        """
+        query = self.query_vector(query_embedding)
+        if rows is None:
+            return self.vector_index.scores(query)
+        sims = np.full(len(self), UNSEARCHED_SCORE, dtype=np.float32)
+        sims[rows] = self.embeddings[rows] @ query
+        return sims
+
+    def score_many(self, query_embeddings: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Exact cosine similarity of several queries against every symptom (one matmul)
+
+        Args:
+            query_embeddings: (m, dim) raw query vectors
+            rows: Only score these rows (other columns score -1)
+
+        Returns:
+            (m, rows) float32 similarity matrix
+        """
+        queries = self.query_vector(query_embeddings)
+        if rows is None:
+            return (self.embeddings @ queries.T).T
+        sims = np.full((len(queries), len(self)), UNSEARCHED_SCORE, dtype=np.float32)
+        sims[:, rows] = (self.embeddings[rows] @ queries.T).T
+        return sims
+
+    def max_by_disease(self, sims: np.ndarray) -> np.ndarray:
+        """Best symptom similarity per disease group for each row of a (m, rows) matrix"""
+        return np.maximum.reduceat(sims, self.group_starts, axis=1)
+
+    def fuse_clauses(self, clause_sims: np.ndarray, coverage_weight: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Combine the similarities of a message's clauses
+
+        Each disease scores a blend of its best single-clause match and its
+        mean best match over all clauses, so a disease that explains every
+        clause outranks one that only matches the loudest symptom.
+
+        Args:
+            clause_sims: (m, rows) output of score_many for the message and its clauses
+            coverage_weight: Share of the mean-over-clauses score (0 keeps
+                the best clause only)
+
+        Returns:
+            (row similarities, disease scores): each row's best clause
+            similarity and the fused score per group, for aggregate()
+        """
+        by_disease = self.max_by_disease(clause_sims)
+        group_scores = ((1 - coverage_weight) * by_disease.max(axis=0)
+                        + coverage_weight * by_disease.mean(axis=0))
+        return clause_sims.max(axis=0), group_scores
+
+    def best_row(self, sims: np.ndarray, group: int) -> int:
+        """Row of the best matching symptom of one group for a 1-D similarity vector"""
+        start = self.group_starts[group]
+        return int(start + np.argmax(sims[start:start + self.group_sizes[group]]))
+
+    def lexical_candidates(self, lexical_scores: np.ndarray, max_diseases: int) -> Optional[np.ndarray]:
+        """
+        All rows of the diseases with the best BM25 scores
+
+        Args:
+            lexical_scores: BM25 score per row
+            max_diseases: Number of diseases to keep
+
+        Returns:
+            Row indices, or None if no row matched lexically
+        """
+        group_scores = np.maximum.reduceat(lexical_scores, self.group_starts)
+        matched = np.flatnonzero(group_scores > 0)
+        if not len(matched):
+            return None
+        groups = matched[np.argsort(-group_scores[matched], kind='stable')[:max_diseases]]
+        return np.concatenate([
+            np.arange(self.group_starts[g], self.group_starts[g] + self.group_sizes[g]) for g in groups
+        ])
+
+    def lexical_match(self, terms: List[str], lexical_scores: np.ndarray, margin: float,
+                      min_coverage: float = 1.0) -> Optional[LexicalMatch]:
+        """
+        Disease a keyword query names, e.g. "blast" or "rice blast"
+
+        Every query term (apart from the crop name) must occur in the disease
+        name and the disease must beat the runner-up's BM25 score by `margin`.
+        A query that names only part of the disease ("early" for Early
+        Blight, "wilt" for Bacterial Wilt) is a match with `exact` False: it
+        narrows the candidates but does not identify the disease by itself.
+
+        Args:
+            terms: Tokenized query
+            lexical_scores: BM25 score per row for those terms
+            margin: Required ratio of best to second-best disease score
+            min_coverage: Share of the disease name's terms (apart from the
+                crop name) the query must contain to be an exact match
+
+        Returns:
+            LexicalMatch or None
+        """
+        crop_terms = set(tokenize(self.crop))
+        terms = set(terms) - crop_terms
+        if not terms or not len(self.group_starts):
+            return None
+
+        group_scores = np.maximum.reduceat(lexical_scores, self.group_starts)
+        ranking = np.argsort(-group_scores, kind='stable')
+        best = int(ranking[0])
+        best_score = float(group_scores[best])
+        runner_up = float(group_scores[ranking[1]]) if len(ranking) > 1 else 0.0
+        if best_score <= 0 or not terms <= self.group_name_terms[best]:
+            return None
+        if runner_up > 0 and best_score < margin * runner_up:
+            return None
+
+        name_terms = self.group_name_terms[best] - crop_terms
+        exact = len(terms) >= min_coverage * len(name_terms)
+        return LexicalMatch(best, self.best_row(lexical_scores, best), exact)
+
+    def aggregate(self, sims: np.ndarray, top_k: int = 2,
+                  group_scores: Optional[np.ndarray] = None) -> DiseaseScores:
+        """
+        Reduce symptom similarities to disease scores with segment operations
+
+        Args:
+            sims: Similarity of every row of this crop (output of score)
+            top_k: Number of best symptom rows to keep per disease
+            group_scores: Disease scores to report and rank by instead of
+                each disease's best row (e.g. from fuse_clauses)
+
+        Returns:
+            DiseaseScores with max/mean score, top symptom rows and ranking
+        """
+        n_rows = len(sims)
+        n_groups = len(self.group_starts)
+
+        if group_scores is None:
+            max_scores = np.maximum.reduceat(sims, self.group_starts)
+        else:
+            max_scores = np.asarray(group_scores, dtype=np.float32)
+        mean_scores = np.add.reduceat(sims, self.group_starts) / self.group_sizes
+
+        # Sort rows by (group, -score); each group keeps its original segment
+        order = np.lexsort((-sims, self.group_ids))
+        rank = np.arange(n_rows) - self.group_starts[self.group_ids]
+        keep = rank < top_k
+        top_rows = np.full((n_groups, top_k), -1, dtype=np.intp)
+        top_rows[self.group_ids[keep], rank[keep]] = order[keep]
+
+        return DiseaseScores(
+            disease_ids=self.group_disease_ids,
+            max_scores=max_scores,
+            mean_scores=mean_scores,
+            top_rows=top_rows,
+            ranking=np.argsort(-max_scores, kind='stable'),
+        )
+
+
+class SymptomIndex:
+    """
+    All crops of the KB, each with its own pre-normalized embedding matrix
+
+    Disease records are stored once in `diseases`; crop indexes refer to them
+    by integer id instead of carrying a copy of the record per symptom.
+    `lookup` maps disease_key(crop, disease) to that id.
+
+    `all_crops` is one CropIndex over every row of the KB (crop ALL_CROPS),
+    for diagnosing before the crop is known. Its groups are the diseases of
+    all crops, so one scan ranks (crop, disease) pairs.
+
+    `localizations` holds the offline Hindi/Marathi translations of the
+    records' answer fields (see localization.py).
+    """
+
+    def __init__(self, diseases: List[Dict], crops: Dict[str, CropIndex],
+                 all_crops: Optional[CropIndex] = None):
+        self.diseases = diseases
+        self.crops = crops
+        self.all_crops = all_crops
+        self.localizations = Localizations()
+        self.lookup = {
+            disease_key(d['crop_name'], d['disease_name']): i for i, d in enumerate(diseases)
+        }
+        for crop_index in crops.values():
+            crop_index.build_lexical(diseases)
+        if all_crops is not None:
+            all_crops.build_lexical(diseases)
+
+    def __len__(self) -> int:
+        return sum(len(crop_index) for crop_index in self.crops.values())
+
+    @property
+    def crop_names(self) -> List[str]:
+        return list(self.crops)
+
+    def get(self, crop: str) -> Optional[CropIndex]:
+        """Return the index for a crop (case-insensitive) or None if unknown"""
+        return self.crops.get(crop.lower())
+
+    def disease(self, disease_id: int) -> Dict:
+        """Return the full KB record for a disease id"""
+        return self.diseases[int(disease_id)]
+
+    def find(self, crop: str, disease_name: str) -> Optional[Dict]:
+        """Return the KB record for a crop's disease by name (case-insensitive)"""
+        disease_id = self.lookup.get(disease_key(crop, disease_name))
+        return None if disease_id is None else self.diseases[disease_id]
+
+    def crop_of(self, disease_name: str) -> Optional[str]:
+        """Crop of a disease named without one (None if no crop or several crops have it)"""
+        name = disease_key('', disease_name)[1]
+        crops = [crop for crop, disease in self.lookup if disease == name]
+        return crops[0] if len(crops) == 1 else None
+
+    def merge_records(self, records: List[Dict]) -> Dict[str, int]:
+        """
+        Serve the latest KB records without re-embedding
+
+        Records matching an indexed (crop, disease) replace it, so edits to
+        treatment or prevention text go live. New diseases are appended for
+        action lookups; they are not diagnosable until the embeddings are
+        rebuilt.
+
+        Args:
+            records: Disease records from crop_disease_kb.json
+
+        Returns:
+            Counts of updated, added and stale (symptoms changed) records
+        """
+        counts = {'updated': 0, 'added': 0, 'stale': 0}
+        for record in records:
+            key = disease_key(record['crop_name'], record['disease_name'])
+            disease_id = self.lookup.get(key)
+            if disease_id is None:
+                self.lookup[key] = len(self.diseases)
+                self.diseases.append(record)
+                counts['added'] += 1
+                continue
+            if record.get('symptoms') != self.diseases[disease_id].get('symptoms'):
+                counts['stale'] += 1
+            self.diseases[disease_id] = record
+            counts['updated'] += 1
+        return counts
+
+    @classmethod
+    def from_embeddings_data(cls, embeddings_data: List[Dict]) -> 'SymptomIndex':
+        """
+        Build the index from the legacy per-symptom list of dicts
+
+        Args:
+            embeddings_data: Rows with crop_name, disease_name, symptom_text,
+                embedding and full_data keys (symptom_embeddings_new.pkl)
+
+        Returns:
+            SymptomIndex with one matrix per crop
+        """
+        diseases = []
+        disease_lookup = {}
+        rows_by_crop = {}
+
+        for row in embeddings_data:
+            crop = row['crop_name'].lower()
+            key = (crop, row['disease_name'].lower())
+            if key not in disease_lookup:
+                disease_lookup[key] = len(diseases)
+                diseases.append(row['full_data'])
+            rows_by_crop.setdefault(crop, []).append((disease_lookup[key], row))
+
+        crops = {}
+        for crop, rows in rows_by_crop.items():
+            crops[crop] = CropIndex(
+                crop,
+                np.stack([row['embedding'] for _, row in rows]),
+                np.array([disease_id for disease_id, _ in rows]),
+                [row['symptom_text'] for _, row in rows],
+            )
+
+        all_crops = None
+        if crops:
+            all_crops = CropIndex(
+                ALL_CROPS,
+                np.concatenate([crop_index.embeddings for crop_index in crops.values()]),
+                np.concatenate([crop_index.disease_ids for crop_index in crops.values()]),
+                np.concatenate([crop_index.symptom_texts for crop_index in crops.values()]),
+                normalized=True,
+            )
+
+        return cls(diseases, crops, all_crops)
+
+    @classmethod
+    def from_artifact(cls, artifact_dir: str, vector_index: str = 'exact',
+                      nprobe: int = 8) -> 'SymptomIndex':
+        """
+        Open a KB artifact written by save_artifact
+
+        The embedding matrix is memory-mapped read-only, so worker processes
+        share its pages through the OS page cache instead of each holding a copy.
+        Crop indexes and the cross-crop index are views of the same mapping.
+        float16/int8 matrices stay in their stored dtype and are scanned in
+        float32 blocks; a PCA projection, if any, is applied to queries.
+
+        Args:
+            artifact_dir: Directory containing the manifest and artifact files
+            vector_index: 'exact', or 'ivf' to use the artifact's IVF lists for
+                crops that have them (other crops stay exact)
+            nprobe: IVF lists searched per query
+
+        Returns:
+            SymptomIndex whose crop matrices are views into the mapped file
+        """
+        manifest = read_manifest(artifact_dir)
+        if manifest.get('version') not in SUPPORTED_ARTIFACT_VERSIONS:
+            raise ValueError(
+                f"Unsupported KB artifact version {manifest.get('version')} "
+                f"(expected one of {SUPPORTED_ARTIFACT_VERSIONS})"
+            )
+
+        codes = np.load(os.path.join(artifact_dir, EMBEDDINGS_FILE), mmap_mode='r')
+        scales = None
+        if os.path.exists(os.path.join(artifact_dir, SCALES_FILE)):
+            scales = np.load(os.path.join(artifact_dir, SCALES_FILE))
+        embeddings = as_matrix(codes, scales)
+        projection = None
+        if manifest.get('projection'):
+            projection = np.load(os.path.join(artifact_dir, PROJECTION_FILE))
+        row_disease = np.load(os.path.join(artifact_dir, ROW_DISEASE_FILE))
+        with open(os.path.join(artifact_dir, DISEASES_FILE), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        symptom_texts = metadata['symptom_texts']
+        crops = {}
+        for crop, (start, end) in manifest['crops'].items():
+            crops[crop] = CropIndex(
+                crop,
+                embeddings[start:end],
+                row_disease[start:end],
+                symptom_texts[start:end],
+                normalized=True,
+                projection=projection,
+            )
+
+        # Each disease belongs to one crop, so its rows are contiguous in the full matrix too
+        all_crops = CropIndex(
+            ALL_CROPS, embeddings, row_disease, symptom_texts, normalized=True, projection=projection,
+        )
+
+        ivf_crops = manifest.get('ivf', {})
+        if vector_index == 'ivf' and ivf_crops:
+            with np.load(os.path.join(artifact_dir, IVF_FILE)) as ivf:
+                for crop, entry in ivf_crops.items():
+                    key = entry['key']
+                    crops[crop].vector_index = IVFIndex(
+                        crops[crop].embeddings,
+                        ivf[f'{key}_centroids'],
+                        ivf[f'{key}_list_offsets'],
+                        ivf[f'{key}_list_rows'],
+                        nprobe=nprobe,
+                    )
+
+        return cls(metadata['diseases'], crops, all_crops)
+
+
+def read_manifest(artifact_dir: str) -> Dict:
+    """Read the manifest of a KB artifact directory"""
+    with open(os.path.join(artifact_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def artifact_build_id(artifact_dir: str) -> Optional[str]:
+    """Build id from the manifest (None if there is no readable manifest)"""
+    try:
+        manifest = read_manifest(artifact_dir)
+    except (OSError, ValueError):
+        return None
+    # Artifacts written before build ids existed
+    return manifest.get('build_id', manifest.get('created_at'))
+
+
+def swap_dirs(artifact_dir: str) -> Tuple[str, str]:
+    """Sibling directories save_artifact writes the new artifact to and moves the old one to"""
+    base = artifact_dir.rstrip(os.sep)
+    return base + '.tmp', base + '.old'
+
+
+def wait_for_swap(artifact_dir: str, timeout: float = 2.0) -> bool:
+    """
+    Wait while save_artifact is swapping a new artifact in
+
+    Returns:
+        False if the swap is still unfinished after `timeout` seconds
+    """
+    _, old_dir = swap_dirs(artifact_dir)
+    manifest_path = os.path.join(artifact_dir, MANIFEST_FILE)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(manifest_path) and os.path.exists(old_dir):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def save_artifact(artifact_dir: str, diseases: List[Dict], embeddings: np.ndarray,
+                  model_name: str, ivf_min_rows: Optional[int] = None,
+                  ivf_lists: Optional[int] = None, dtype: str = 'float32',
+                  pca_dim: Optional[int] = None,
+                  phrasings: Optional[List[List[str]]] = None) -> Dict:
+    """
+    Write the compact, memory-mappable KB artifact
+
+    Rows are grouped by crop (then disease) so every crop is one contiguous
+    slice of the embedding matrix. Each disease record is stored once.
+
+    Args:
+        artifact_dir: Output directory (replaced atomically if it exists)
+        diseases: KB records, each with crop_name, disease_name and symptoms
+        embeddings: One embedding per symptom, in KB order (disease by disease,
+            each disease's symptoms followed by its phrasings)
+        model_name: SentenceTransformer model used to produce the embeddings
+        ivf_min_rows: Build IVF lists for crops with at least this many rows
+            (None disables IVF)
+        ivf_lists: Lists per crop (defaults to about sqrt(rows))
+        dtype: Stored embedding dtype: 'float32', 'float16' or 'int8'
+            (int8 adds per-row scales)
+        pca_dim: Store PCA projections of this many dimensions instead of
+            full embeddings (None keeps the encoder dimension)
+        phrasings: Extra texts per disease (e.g. curated Hindi/Marathi
+            phrasings of its symptoms), stored as additional rows of that
+            disease; the disease records are left unchanged
+
+    Returns:
+        The manifest that was written
+    """
+    embeddings = l2_normalize(embeddings)
+
+    # Row offset of each disease's symptoms in the KB-ordered embedding matrix
+    if phrasings is None:
+        phrasings = [[] for _ in diseases]
+    disease_texts = [d['symptoms'] + list(extra) for d, extra in zip(diseases, phrasings)]
+    offsets = np.cumsum([0] + [len(texts) for texts in disease_texts])
+    if offsets[-1] != embeddings.shape[0]:
+        raise ValueError(
+            f"Got {embeddings.shape[0]} embeddings for {offsets[-1]} symptoms"
+        )
+
+    crop_order = []
+    for disease in diseases:
+        crop = disease['crop_name'].lower()
+        if crop not in crop_order:
+            crop_order.append(crop)
+
+    order = []
+    row_disease = []
+    symptom_texts = []
+    crops = {}
+    for crop in crop_order:
+        start = len(order)
+        for disease_id, disease in enumerate(diseases):
+            if disease['crop_name'].lower() != crop:
+                continue
+            for i, symptom in enumerate(disease_texts[disease_id]):
+                order.append(offsets[disease_id] + i)
+                row_disease.append(disease_id)
+                symptom_texts.append(symptom)
+        crops[crop] = [start, len(order)]
+
+    embeddings = np.ascontiguousarray(embeddings[order])
+    source_dim = int(embeddings.shape[1])
+    codes, scales, projection, kept = compress_embeddings(embeddings, dtype, pca_dim)
+    # IVF lists are clustered on what queries are scored against
+    embeddings = as_matrix(codes, scales)
+
+    # IVF lists are local to each crop slice, stored under a short key per crop
+    ivf_crops = {}
+    ivf_arrays = {}
+    if ivf_min_rows is not None:
+        for i, (crop, (start, end)) in enumerate(crops.items()):
+            if end - start < max(ivf_min_rows, 1):
+                continue
+            ivf_index = IVFIndex.build(np.asarray(embeddings[start:end]), n_lists=ivf_lists)
+            key = f'c{i}'
+            ivf_crops[crop] = {'key': key, 'lists': len(ivf_index.centroids)}
+            for name, array in ivf_index.to_arrays().items():
+                ivf_arrays[f'{key}_{name}'] = array
+
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        # Tells readers whether every file they read came from the same build
+        'build_id': uuid.uuid4().hex,
+        'model': model_name,
+        'dim': int(codes.shape[1]),
+        'dtype': dtype,
+        'rows': len(order),
+        'crops': crops,
+        'created_at': datetime.now().isoformat(),
+    }
+    if projection is not None:
+        manifest['projection'] = {
+            'method': 'pca', 'source_dim': source_dim, 'energy_kept': round(kept, 4),
+        }
+    n_phrasings = sum(len(extra) for extra in phrasings)
+    if n_phrasings:
+        manifest['phrasings'] = n_phrasings
+    if ivf_crops:
+        manifest['ivf'] = ivf_crops
+
+    # Write to a sibling directory first so readers never see a partial artifact
+    tmp_dir, old_dir = swap_dirs(artifact_dir)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), codes)
+    if scales is not None:
+        np.save(os.path.join(tmp_dir, SCALES_FILE), scales)
+    if projection is not None:
+        np.save(os.path.join(tmp_dir, PROJECTION_FILE), projection)
+    np.save(os.path.join(tmp_dir, ROW_DISEASE_FILE), np.asarray(row_disease, dtype=np.int32))
+    with open(os.path.join(tmp_dir, DISEASES_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'diseases': diseases, 'symptom_texts': symptom_texts}, f, ensure_ascii=False)
+    if ivf_arrays:
+        np.savez(os.path.join(tmp_dir, IVF_FILE), **ivf_arrays)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Between these renames there is no manifest; loaders wait while old_dir exists
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(artifact_dir):
+        os.rename(artifact_dir, old_dir)
+    os.rename(tmp_dir, artifact_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return manifest
+
+
+def load_artifact(artifact_dir: str, vector_index: str = 'exact', nprobe: int = 8,
+                  attempts: int = 3) -> SymptomIndex:
+    """
+    SymptomIndex.from_artifact, read again if build_kb swaps the artifact mid-read
+
+    The manifest's build id is read before and after the other files, so a
+    read that spans a swap (manifest of one build, arrays of another) is
+    detected and retried instead of being served or mistaken for a broken
+    artifact. TransientLoadError is raised if it is still being replaced
+    after `attempts` reads.
+    """
+    for _ in range(attempts):
+        if not wait_for_swap(artifact_dir):
+            break
+        build_id = artifact_build_id(artifact_dir)
+        try:
+            index = SymptomIndex.from_artifact(artifact_dir, vector_index, nprobe)
+        except Exception:
+            # Unchanged build: the artifact itself is unusable
+            if artifact_build_id(artifact_dir) == build_id:
+                raise
+            continue
+        if artifact_build_id(artifact_dir) == build_id:
+            return index
+    raise TransientLoadError(f"{artifact_dir} is being replaced by build_kb; try again")
+
+
+def load_kb_and_embeddings(vector_index: str = 'exact', nprobe: int = 8,
+                           artifact_dir: str = KB_ARTIFACT_DIR,
+                           pickle_path: Optional[str] = EMBEDDINGS_PKL):
+    """
+    Load the disease KB and its symptom index
+
+    Args:
+        vector_index: 'exact' or 'ivf' (IVF lists only exist in the artifact)
+        nprobe: IVF lists searched per query
+        artifact_dir: KB artifact to load
+        pickle_path: Legacy pickle to fall back to (None: the artifact is required)
+
+    Returns:
+        Tuple of (disease records, SymptomIndex); raises TransientLoadError
+        while build_kb is replacing the artifact
+    """
+    index = None
+    _, old_dir = swap_dirs(artifact_dir)
+
+    # Prefer the memory-mapped artifact over the legacy pickle. A missing
+    # manifest mid-swap is not a missing artifact: never fall back to the pickle then
+    if (os.path.exists(os.path.join(artifact_dir, MANIFEST_FILE)) or os.path.exists(old_dir)
+            or pickle_path is None):
+        try:
+            index = load_artifact(artifact_dir, vector_index, nprobe)
+        except TransientLoadError:
+            # The caller (KBService, ModelRegistry) keeps its index and retries
+            raise
+        except Exception as e:
+            if pickle_path is None:
+                raise
+            print('Error loading KB artifact, falling back to pickle:', e)
+
+    if index is None:
+        with open(pickle_path, 'rb') as f:
+            embeddings_data = pickle.load(f)
+        # Partition and normalize once; requests only do a matrix-vector product
+        index = SymptomIndex.from_embeddings_data(embeddings_data)
+
+    # Disease records always come from the KB JSON, even if embeddings lag behind
+    with open(KB_JSON, 'r', encoding='utf-8') as f:
+        counts = index.merge_records(json.load(f))
+    if counts['added'] or counts['stale']:
+        print(f"⚠️ {counts['added']} new and {counts['stale']} changed diseases need "
+              f"`python manage.py build_kb` before they can be diagnosed")
+    index.localizations = load_localizations(KB_LOCALIZED_JSON)
+    return index.diseases, index
@@ -0,0 +1,133 @@
+"""
+Hot-reloadable disease knowledge base
+
+KBService holds the current SymptomIndex and watches the KB JSON and the
+embedding artifacts by mtime and size. When one changes, a replacement
+index is built on a background thread and swapped in with a single
+reference assignment: in-flight requests keep the snapshot they started
+with, and no request waits for the rebuild.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from .kb_index import SymptomIndex
+from .model_registry import TransientLoadError
+
+logger = logging.getLogger(__name__)
+
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+
+def file_signature(paths: Iterable[str]) -> Signature:
+    """(mtime_ns, size) of every path, None for missing files"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class KBService:
+    """
+    Current KB index plus change detection and atomic reload
+
+    Args:
+        loader: Zero-argument function returning a fresh SymptomIndex
+        watched_paths: Files whose changes trigger a reload
+        check_interval: Minimum seconds between file checks (None disables
+            hot reload)
+    """
+
+    def __init__(self, loader: Callable[[], SymptomIndex], watched_paths: Iterable[str],
+                 check_interval: Optional[float] = 5.0):
+        self.loader = loader
+        self.watched_paths = list(watched_paths)
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+
+        self._signature = file_signature(self.watched_paths)
+        self._index = loader()
+        self.loaded_at = time.time()
+
+    def current(self) -> SymptomIndex:
+        """
+        The index to use for one request
+
+        Callers should fetch it once per request so every lookup in that
+        request sees the same KB version.
+        """
+        if self.check_interval is not None:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                if file_signature(self.watched_paths) != self._signature:
+                    self._reload_in_background()
+        return self._index
+
+    def _reload_in_background(self):
+        if self._reload_lock.locked():
+            return
+        threading.Thread(target=self.reload, name='kb-reload', daemon=True).start()
+
+    def reload(self) -> bool:
+        """
+        Rebuild the index and swap it in (synchronously)
+
+        Returns:
+            True if a new index is live, False if another reload was running
+            or loading failed (the previous index stays live)
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            # Take the signature first so edits made during the rebuild trigger another one
+            signature = file_signature(self.watched_paths)
+            start = time.perf_counter()
+            try:
+                index = self.loader()
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = str(e)
+                # Don't retry the same broken files on every check, but do
+                # retry files that were mid-rebuild
+                if not isinstance(e, TransientLoadError):
+                    self._signature = signature
+                logger.error(f"KB reload failed, keeping the previous index: {e}")
+                return False
+
+            self._index = index
+            self._signature = signature
+            self.reloads += 1
+            self.loaded_at = time.time()
+            self.last_error = None
+            logger.info(
+                f"Reloaded KB: {len(index.diseases)} diseases, {len(index)} embeddings "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def stats(self) -> Dict:
+        return {
+            'diseases': len(self._index.diseases),
+            'embeddings': len(self._index),
+            'crops': self._index.crop_names,
+            'localized_languages': self._index.localizations.languages,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+            'last_error': self.last_error,
+            'hot_reload': self.check_interval is not None,
+        }
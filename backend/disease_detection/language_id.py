@@ -0,0 +1,220 @@
+"""
+Script-aware language identification for symptom text
+
+Most inputs are decided by their Unicode script alone:
+  - pure ASCII             -> 'en' without running any detector
+  - contains Devanagari    -> 'hi' or 'mr' from a compact character n-gram
+                              model (language_profiles.json, built by
+                              kb/build_language_profiles.py). Its general
+                              profiles misjudge two-word symptom reports
+                              ("पौधे मुरझा" looks Marathi), so short or
+                              barely separated texts are decided by words
+                              only one language uses (MARKER_WORDS); with
+                              none, the user's preferred language, else 'hi'
+  - anything else          -> seeded langdetect, if installed
+Detector results are cached, so repeated phrases cost one dict lookup.
+"""
+
+import json
+import math
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .caches import LRUCache, normalize_text
+
+PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'language_profiles.json')
+
+_DEVANAGARI_RUN = re.compile(r'[ऀ-ॿ]+')
+
+# Function words and everyday symptom words used by only one of the two
+# languages. Words both use (रोग, कीड, का, की, हो) are left out.
+MARKER_WORDS = {
+    'hi': frozenset({
+        'है', 'हैं', 'था', 'थे', 'थी', 'रहा', 'रही', 'रहे', 'गया', 'गई', 'गए', 'में', 'पर', 'के',
+        'को', 'से', 'और', 'नहीं', 'पौधा', 'पौधे', 'पौधों', 'पत्ता', 'पत्ते', 'पत्तों', 'पत्ती',
+        'पत्तियां', 'पत्तियाँ', 'पत्तियों', 'पीला', 'पीले', 'पीली', 'भूरा', 'भूरे', 'भूरी', 'धब्बा',
+        'धब्बे', 'धब्बों', 'मुरझा', 'मुरझाना', 'मुरझाए', 'मुरझाया', 'मुरझाई', 'मुरझाने', 'सूख',
+        'सूखना', 'सूखे', 'सूखा', 'तना', 'तने', 'फल', 'फलों', 'जड़', 'जड़ें', 'सड़', 'सड़ना', 'सड़े',
+    }),
+    'mr': frozenset({
+        'आहे', 'आहेत', 'होते', 'होता', 'होती', 'झाले', 'झाली', 'झाला', 'आणि', 'नाही', 'मध्ये',
+        'वर', 'पान', 'पाने', 'पानं', 'पिवळे', 'पिवळी', 'पिवळा', 'तपकिरी', 'ठिपके', 'ठिपका', 'डाग',
+        'रोप', 'रोपे', 'झाड', 'झाडे', 'खोड', 'फळ', 'फळे', 'मुळे', 'सुकले', 'सुकणे', 'सुकत',
+        'कुजले', 'कुजणे', 'कोमेजले', 'कोमेजणे', 'करपा', 'करपले', 'लागला', 'लागली', 'पडले', 'पडली',
+    }),
+}
+# Marathi postpositions written as suffixes ("पानावर", "पानांच्या")
+MARATHI_SUFFIXES = ('ावर', 'ांवर', 'ीवर', 'च्या')
+
+
+def marker_language(words: List[str]) -> Optional[str]:
+    """
+    Language of the marker words among `words`
+
+    Returns:
+        'hi' or 'mr' if only that language's markers occur, else None
+    """
+    found = set()
+    for word in words:
+        for lang, markers in MARKER_WORDS.items():
+            if word in markers:
+                found.add(lang)
+        if word.endswith(MARATHI_SUFFIXES):
+            found.add('mr')
+    return found.pop() if len(found) == 1 else None
+
+
+def script_histogram(text: str) -> Dict[str, int]:
+    """
+    Count characters per script
+
+    Returns:
+        Dict with 'devanagari', 'latin' (ASCII letters) and 'other' (any other
+        letter) counts; digits, spaces and punctuation are ignored
+    """
+    histogram = {'devanagari': 0, 'latin': 0, 'other': 0}
+    for ch in text:
+        if 'ऀ' <= ch <= 'ॿ':
+            histogram['devanagari'] += 1
+        elif ch.isascii():
+            if ch.isalpha():
+                histogram['latin'] += 1
+        elif ch.isalpha():
+            histogram['other'] += 1
+    return histogram
+
+
+class NgramLanguageModel:
+    """
+    Naive Bayes over character 1-3 grams of each word (padded with spaces)
+
+    Args:
+        profiles: {lang: {'n_words': [unigrams, bigrams, trigrams], 'freq': {gram: count}}}
+        alpha: Add-alpha smoothing for unseen n-grams
+    """
+
+    def __init__(self, profiles: Dict[str, Dict], alpha: float = 0.5):
+        self.languages = sorted(profiles)
+        self.log_probs = {}
+        self.unseen = {}
+        for lang in self.languages:
+            totals = profiles[lang]['n_words']
+            vocab = len(profiles[lang]['freq'])
+            self.log_probs[lang] = {
+                gram: math.log((count + alpha) / (totals[len(gram) - 1] + alpha * vocab))
+                for gram, count in profiles[lang]['freq'].items()
+            }
+            self.unseen[lang] = [math.log(alpha / (total + alpha * vocab)) for total in totals]
+
+    @classmethod
+    def load(cls, path: str = PROFILES_PATH) -> 'NgramLanguageModel':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Log-likelihood of text under each language"""
+        scores = dict.fromkeys(self.languages, 0.0)
+        for word in _DEVANAGARI_RUN.findall(text):
+            padded = f' {word} '
+            for n in (1, 2, 3):
+                for i in range(len(padded) - n + 1):
+                    gram = padded[i:i + n]
+                    if gram.isspace():
+                        continue
+                    for lang in self.languages:
+                        scores[lang] += self.log_probs[lang].get(gram, self.unseen[lang][n - 1])
+        return scores
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Most likely language and its log-likelihood margin over the runner-up"""
+        ranked = sorted(self.scores(text).items(), key=lambda item: -item[1])
+        margin = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else math.inf
+        return ranked[0][0], margin
+
+
+class LanguageIdentifier:
+    """
+    Script histogram first, detectors only when the script is ambiguous
+
+    Args:
+        model: Devanagari n-gram model (loaded from PROFILES_PATH on first use)
+        cache_size: Cached detector results
+        default: Language returned for empty or undetectable text
+        short_text_words: Devanagari texts of at most this many words are short
+        min_margin: Hindi/Marathi log-likelihood margin below which marker
+            words overrule the n-gram model (and a short text without
+            markers is undecided)
+    """
+
+    # Undecided Devanagari goes to the Hindi model (also the translation fallback)
+    DEVANAGARI_DEFAULT = 'hi'
+
+    def __init__(self, model: Optional[NgramLanguageModel] = None, cache_size: int = 4096,
+                 default: str = 'en', short_text_words: int = 3, min_margin: float = 20.0):
+        self._model = model
+        self.cache = LRUCache(maxsize=cache_size)
+        self.default = default
+        self.short_text_words = short_text_words
+        self.min_margin = min_margin
+        self._langdetect = None
+
+    @property
+    def model(self) -> NgramLanguageModel:
+        if self._model is None:
+            self._model = NgramLanguageModel.load()
+        return self._model
+
+    def detect(self, text: str, preferred: Optional[str] = None) -> str:
+        """
+        ISO 639-1 code of the text's language ('en', 'hi', 'mr', ...)
+
+        Args:
+            text: Input text
+            preferred: The user's language code, used for short Devanagari
+                text the n-gram model cannot tell apart as Hindi or Marathi
+        """
+        text = text.strip()
+        if not text or text.isascii():
+            return self.default
+        # None (undecided) is cached as-is: the preferred language differs per user
+        lang = self.cache.get_or_compute(normalize_text(text), lambda: self._detect_script(text))
+        if lang is None:
+            return preferred if preferred in ('hi', 'mr') else self.DEVANAGARI_DEFAULT
+        return lang
+
+    def _detect_script(self, text: str) -> Optional[str]:
+        histogram = script_histogram(text)
+        if histogram['devanagari']:
+            words = _DEVANAGARI_RUN.findall(text)
+            lang, margin = self.model.classify(text)
+            short = len(words) <= self.short_text_words
+            if short or margin < self.min_margin:
+                # Too few characters to trust the n-gram margin alone
+                marked = marker_language(words)
+                if marked is not None:
+                    return marked
+                if short and margin < self.min_margin:
+                    return None
+            return lang
+        return self._fallback(text)
+
+    def _fallback(self, text: str) -> str:
+        # Non-ASCII text in other scripts (accented Latin, Tamil, ...) goes to langdetect
+        if self._langdetect is None:
+            try:
+                from langdetect import detect, DetectorFactory
+            except ImportError:
+                self._langdetect = False
+            else:
+                DetectorFactory.seed = 0  # Deterministic results for the same text
+                self._langdetect = detect
+        if not self._langdetect:
+            return self.default
+        try:
+            return self._langdetect(text)
+        except Exception:
+            return self.default
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
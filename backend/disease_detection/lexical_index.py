@@ -0,0 +1,109 @@
+"""
+BM25 inverted index over symptom texts and disease names
+
+Built per crop when the KB is loaded. Keyword-style inputs ("blast",
+"late blight") that name one disease are answered without running the
+encoder; on large crops the lexical candidates also narrow the dense scan.
+"""
+
+import math
+import re
+from typing import Iterable, List
+
+import numpy as np
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have',
+    'in', 'is', 'it', 'my', 'of', 'on', 'or', 'the', 'there', 'to', 'with',
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens with stopwords removed and plurals folded
+
+    Args:
+        text: English text (symptom, disease name or translated query)
+
+    Returns:
+        List of terms, in order
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith('ies'):
+            token = token[:-3] + 'y'
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over pre-tokenized documents
+
+    Each posting stores its final BM25 weight, so scoring a query is one
+    scatter-add per query term.
+
+    Args:
+        documents: Terms of every document (row)
+        k1: Term frequency saturation
+        b: Length normalization
+    """
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.n_docs = len(documents)
+        lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.n_docs and lengths.sum() else 1.0
+
+        term_freqs = {}
+        for doc_id, doc in enumerate(documents):
+            for term in doc:
+                postings = term_freqs.setdefault(term, {})
+                postings[doc_id] = postings.get(doc_id, 0) + 1
+
+        self.postings = {}
+        for term, postings in term_freqs.items():
+            docs = np.fromiter(postings.keys(), dtype=np.intp, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1 - b + b * lengths[docs] / avg_length)
+            self.postings[term] = (docs, (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.postings
+
+    def score(self, terms: Iterable[str]) -> np.ndarray:
+        """BM25 score of every document for the query terms (0 where nothing matches)"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weights
+        return scores
+
+
+def fuse_scores(dense: np.ndarray, lexical: np.ndarray, weight: float) -> np.ndarray:
+    """
+    Weighted fusion of dense similarities and BM25 scores
+
+    BM25 is scaled to [0, 1] by its best row so the fused score stays on the
+    cosine scale that the confidence threshold expects.
+
+    Args:
+        dense: Cosine similarity per row
+        lexical: BM25 score per row
+        weight: Share of the lexical score (0 keeps dense scores unchanged)
+
+    Returns:
+        Fused score per row
+    """
+    top = float(lexical.max()) if len(lexical) else 0.0
+    if weight <= 0 or top <= 0:
+        return dense
+    return (1 - weight) * dense + weight * (lexical / top)
@@ -0,0 +1,238 @@
+"""
+Hindi/Marathi versions of KB answers, translated offline
+
+`python manage.py localize_kb` translates every English text of the
+answer fields below (treatment, prevention, causes, ...) once with the
+en→hi/en→mr MarianMT models and stores them in
+kb/crop_disease_kb_localized.json:
+
+    {"languages": ["hi", "mr"],
+     "translations": {"hi": {english text: hindi text, ...}, "mr": {...}}}
+
+Keyed by the English text, so editing a KB field only re-translates that
+text, and a text nobody has translated yet falls back to English. Action
+replies are then a dictionary lookup in the user's preferred language; the
+en→xx models never load in a web worker.
+"""
+
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LOCALIZED_LANGUAGES = ('hi', 'mr')
+
+# KB fields shown in replies; list fields are translated item by item
+LOCALIZED_FIELDS = (
+    'disease_name', 'causes', 'treatment', 'prevention', 'severity_level', 'risk_season',
+    'affected_parts', 'symptom_questions', 'contextual_followups',
+)
+
+# UserProfile.preferred_language choices (and plain language codes)
+LANGUAGE_CODES = {'english': 'en', 'hindi': 'hi', 'marathi': 'mr', 'en': 'en', 'hi': 'hi', 'mr': 'mr'}
+
+# Fixed reply text around the KB fields, translated by hand
+MESSAGES = {
+    'en': {
+        'treatment_title': '💊 Treatment for {disease}:',
+        'treatment_footer': 'Need more help?',
+        'prevention_title': '🛡️ Prevention Tips for {disease}:',
+        'prevention_footer': 'Stay proactive to keep your crops healthy!',
+        'about_title': '📚 About {disease}:',
+        'causes': '🔬 Causes:',
+        'risk_season': '🌡️ Risk Season:',
+        'affected_parts': '🎯 Affected Parts:',
+        'various_parts': 'Various parts',
+        'questions_title': '❓ Questions about {disease}:',
+        'symptom_check': 'Symptom Check:',
+        'context_questions': '🌾 Context Questions:',
+        'done': '✅ Great! Feel free to start a new diagnosis anytime.',
+        'done_tip': '💡 Tip: Regular monitoring helps catch diseases early!',
+        'prevention_tips': '🛡️ Prevention Tips',
+        'faqs': '❓ FAQs',
+        'got_it': '✅ Got it',
+        'show_treatment': '💊 Show Treatment',
+        'learn_more': '📚 Learn More',
+        'thanks': '✅ Thanks!',
+        'treatment': '💊 Treatment',
+        'prevention': '🛡️ Prevention',
+        'finished': '✅ Done',
+    },
+    'hi': {
+        'treatment_title': '💊 {disease} का उपचार:',
+        'treatment_footer': 'और मदद चाहिए?',
+        'prevention_title': '🛡️ {disease} से बचाव के उपाय:',
+        'prevention_footer': 'फसल को स्वस्थ रखने के लिए पहले से सावधानी रखें!',
+        'about_title': '📚 {disease} के बारे में:',
+        'causes': '🔬 कारण:',
+        'risk_season': '🌡️ जोखिम का मौसम:',
+        'affected_parts': '🎯 प्रभावित भाग:',
+        'various_parts': 'कई भाग',
+        'questions_title': '❓ {disease} के बारे में प्रश्न:',
+        'symptom_check': 'लक्षण जाँच:',
+        'context_questions': '🌾 खेत से जुड़े प्रश्न:',
+        'done': '✅ बढ़िया! आप कभी भी नई जाँच शुरू कर सकते हैं।',
+        'done_tip': '💡 सुझाव: नियमित निगरानी से रोग जल्दी पकड़ में आते हैं!',
+        'prevention_tips': '🛡️ बचाव के उपाय',
+        'faqs': '❓ सामान्य प्रश्न',
+        'got_it': '✅ समझ गया',
+        'show_treatment': '💊 उपचार दिखाएँ',
+        'learn_more': '📚 और जानें',
+        'thanks': '✅ धन्यवाद!',
+        'treatment': '💊 उपचार',
+        'prevention': '🛡️ बचाव',
+        'finished': '✅ हो गया',
+    },
+    'mr': {
+        'treatment_title': '💊 {disease} वरील उपचार:',
+        'treatment_footer': 'आणखी मदत हवी आहे का?',
+        'prevention_title': '🛡️ {disease} टाळण्यासाठी उपाय:',
+        'prevention_footer': 'पीक निरोगी ठेवण्यासाठी आधीपासून काळजी घ्या!',
+        'about_title': '📚 {disease} बद्दल माहिती:',
+        'causes': '🔬 कारणे:',
+        'risk_season': '🌡️ धोक्याचा हंगाम:',
+        'affected_parts': '🎯 प्रभावित भाग:',
+        'various_parts': 'विविध भाग',
+        'questions_title': '❓ {disease} बद्दल प्रश्न:',
+        'symptom_check': 'लक्षण तपासणी:',
+        'context_questions': '🌾 शेताशी संबंधित प्रश्न:',
+        'done': '✅ छान! तुम्ही कधीही नवीन तपासणी सुरू करू शकता.',
+        'done_tip': '💡 टीप: नियमित पाहणी केल्यास रोग लवकर लक्षात येतात!',
+        'prevention_tips': '🛡️ प्रतिबंधाचे उपाय',
+        'faqs': '❓ नेहमीचे प्रश्न',
+        'got_it': '✅ समजले',
+        'show_treatment': '💊 उपचार दाखवा',
+        'learn_more': '📚 अधिक माहिती',
+        'thanks': '✅ धन्यवाद!',
+        'treatment': '💊 उपचार',
+        'prevention': '🛡️ प्रतिबंध',
+        'finished': '✅ झाले',
+    },
+}
+
+
+def language_code(preferred_language: Optional[str]) -> str:
+    """'en', 'hi' or 'mr' for a preferred language name or code ('en' if unknown)"""
+    return LANGUAGE_CODES.get(str(preferred_language or '').strip().lower(), 'en')
+
+
+def field_texts(disease: Dict) -> List[str]:
+    """English texts of a disease's localized fields"""
+    texts = []
+    for field in LOCALIZED_FIELDS:
+        value = disease.get(field)
+        if isinstance(value, str):
+            texts.append(value)
+        elif isinstance(value, list):
+            texts.extend(item for item in value if isinstance(item, str))
+    return [text for text in texts if text.strip()]
+
+
+class Localizations:
+    """
+    Precomputed translations of KB answer texts
+
+    Args:
+        translations: {language: {english text: translated text}}
+    """
+
+    def __init__(self, translations: Optional[Dict[str, Dict[str, str]]] = None):
+        self.translations = translations or {}
+
+    @property
+    def languages(self) -> List[str]:
+        return list(self.translations)
+
+    def text(self, text: str, lang: str) -> str:
+        """Translation of one English text, or the text itself if there is none"""
+        return self.translations.get(lang, {}).get(text, text)
+
+    def localize(self, disease: Dict, lang: str) -> Dict:
+        """
+        A copy of a KB record with its answer fields in `lang`
+
+        English (or a language without translations) returns the record
+        itself; fields without a stored translation stay in English.
+        """
+        table = self.translations.get(lang)
+        if not table:
+            return disease
+        localized = dict(disease)
+        for field in LOCALIZED_FIELDS:
+            value = disease.get(field)
+            if isinstance(value, str):
+                localized[field] = table.get(value, value)
+            elif isinstance(value, list):
+                localized[field] = [table.get(item, item) if isinstance(item, str) else item for item in value]
+        return localized
+
+    def coverage(self, diseases: Iterable[Dict]) -> Dict[str, float]:
+        """Share of the KB's answer texts translated, per language"""
+        texts = {text for disease in diseases for text in field_texts(disease)}
+        return {
+            lang: round(sum(text in table for text in texts) / len(texts), 4) if texts else 1.0
+            for lang, table in self.translations.items()
+        }
+
+
+def load_localizations(path: str) -> Localizations:
+    """Read a localized KB file; a missing file gives English-only answers"""
+    if not os.path.exists(path):
+        return Localizations()
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return Localizations(data.get('translations', {}))
+
+
+def save_localizations(path: str, localizations: Localizations, models: Dict[str, str]):
+    """Write a localized KB file atomically"""
+    data = {
+        'languages': localizations.languages,
+        'models': models,
+        'translations': localizations.translations,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def build_localizations(diseases: List[Dict], translators: Dict[str, Callable[[List[str]], List[str]]],
+                        existing: Optional[Localizations] = None, batch_size: int = 32,
+                        progress: Optional[Callable[[str, int, int], None]] = None) -> Tuple[Localizations, Dict]:
+    """
+    Translate every KB answer text missing from `existing`
+
+    Args:
+        diseases: KB records from crop_disease_kb.json
+        translators: {language: function translating a batch of English texts}
+        existing: Previous translations to reuse (None re-translates everything)
+        batch_size: Texts per translator call
+        progress: Called with (language, translated, total to translate) after every batch
+
+    Returns:
+        (Localizations, {language: {'translated', 'reused', 'pruned'}})
+    """
+    existing = existing or Localizations()
+    texts = sorted({text for disease in diseases for text in field_texts(disease)})
+    translations = {}
+    stats = {}
+    for lang, translate_batch in translators.items():
+        previous = existing.translations.get(lang, {})
+        # Only texts the KB still uses are kept, so edited fields do not pile up
+        table = {text: previous[text] for text in texts if text in previous}
+        missing = [text for text in texts if text not in table]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            table.update(zip(batch, translate_batch(batch)))
+            if progress is not None:
+                progress(lang, min(start + batch_size, len(missing)), len(missing))
+        translations[lang] = table
+        stats[lang] = {
+            'translated': len(missing),
+            'reused': len(texts) - len(missing),
+            'pruned': len(previous) - (len(texts) - len(missing)),
+        }
+    # Languages not rebuilt this time keep their previous translations
+    for lang, table in existing.translations.items():
+        translations.setdefault(lang, table)
+    return Localizations(translations), stats
@@ -0,0 +1,123 @@
+"""
+Django management command to build the disease KB artifact
+
+Usage:
+    python manage.py build_kb                                  # after editing crop_disease_kb.json
+    python manage.py build_kb --full                           # re-encode every symptom
+    python manage.py build_kb --ivf-min-rows 5000              # + IVF lists for crops with >= 5000 symptoms
+    python manage.py build_kb --dtype int8 --pca-dim 128       # compact storage
+    python manage.py build_kb --multilingual                   # kb/artifact_multilingual for RETRIEVAL_MODE='multilingual'
+
+Writes kb/artifact (memory-mapped by the web workers, which hot-reload it):
+  manifest.json    - version, model, dtype, per-crop row ranges
+  embeddings.npy   - normalized matrix (float32 unless --dtype float16/int8)
+  row_disease.npy  - disease id for every embedding row
+  diseases.json    - deduplicated disease records and symptom texts
+  scales.npy       - per-row scales (only with --dtype int8)
+  projection.npy   - PCA projection applied to queries (only with --pca-dim)
+  ivf.npz          - IVF lists for large crops (only with --ivf-min-rows)
+
+--multilingual embeds the KB with the multilingual encoder into
+kb/artifact_multilingual, adding the curated Hindi/Marathi phrasings of
+kb/symptom_phrasings.json (if present) as extra rows of their disease.
+
+Only symptoms missing from the encoder's kb/embedding_cache.<model>.npz
+(keyed by model and text) are encoded. Check --dtype/--pca-dim against full
+precision with kb/benchmark_embedding_storage.py first.
+"""
+
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from disease_detection.kb_build import build_kb, load_phrasings
+from disease_detection.kb_index import KB_ARTIFACT_DIR, KB_JSON, KB_MULTILINGUAL_ARTIFACT_DIR, PHRASINGS_JSON
+from disease_detection.model_registry import ENCODER_MODEL_NAME, MULTILINGUAL_ENCODER_MODEL_NAME
+
+
+class Command(BaseCommand):
+    help = 'Embed new or changed KB symptoms and write the memory-mapped KB artifact'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kb', default=KB_JSON, help='Knowledge base JSON')
+        parser.add_argument('--artifact-dir', default=None,
+                            help='Output directory (defaults to kb/artifact or kb/artifact_multilingual)')
+        parser.add_argument('--multilingual', action='store_true',
+                            help=f'Embed with {MULTILINGUAL_ENCODER_MODEL_NAME} for translation-free retrieval')
+        parser.add_argument('--phrasings', default=None,
+                            help='Curated symptom phrasings JSON (defaults to kb/symptom_phrasings.json with --multilingual)')
+        parser.add_argument('--cache', default=None, help='Embedding cache file (defaults to one per model)')
+        parser.add_argument('--full', action='store_true', help='Ignore the cache and re-encode everything')
+        parser.add_argument('--batch-size', type=int, default=256, help='Symptoms per encode call')
+        parser.add_argument('--ivf-min-rows', type=int, default=None,
+                            help='Build IVF lists for crops with at least this many symptoms')
+        parser.add_argument('--ivf-lists', type=int, default=None,
+                            help='IVF lists per crop (default: about sqrt(rows))')
+        parser.add_argument('--dtype', choices=['float32', 'float16', 'int8'], default='float32',
+                            help='Stored embedding precision (int8 adds per-row scales)')
+        parser.add_argument('--pca-dim', type=int, default=None,
+                            help='Store PCA projections of this many dimensions (e.g. 128)')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['kb'], 'r', encoding='utf-8') as f:
+                diseases = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['kb']}: {e}")
+        self.stdout.write(f"Loaded {len(diseases)} disease entries")
+
+        if options['multilingual']:
+            model_name = MULTILINGUAL_ENCODER_MODEL_NAME
+            artifact_dir = options['artifact_dir'] or KB_MULTILINGUAL_ARTIFACT_DIR
+            phrasings_path = options['phrasings'] or (PHRASINGS_JSON if os.path.exists(PHRASINGS_JSON) else None)
+        else:
+            model_name = ENCODER_MODEL_NAME
+            artifact_dir = options['artifact_dir'] or KB_ARTIFACT_DIR
+            phrasings_path = options['phrasings']
+
+        phrasings = None
+        if phrasings_path:
+            try:
+                phrasings, unmatched = load_phrasings(phrasings_path, diseases)
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read {phrasings_path}: {e}")
+            for name in unmatched:
+                self.stdout.write(self.style.WARNING(f"   ⚠️ Phrasings for unknown disease {name} skipped"))
+
+        def load_encoder():
+            self.stdout.write(f"Loading {model_name}...")
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(model_name)
+
+        def progress(done, total):
+            self.stdout.write(f"  ✓ encoded {done}/{total} symptoms")
+
+        start = time.perf_counter()
+        try:
+            manifest, stats = build_kb(
+                diseases, artifact_dir, model_name, load_encoder,
+                cache_path=options['cache'], full=options['full'], batch_size=options['batch_size'],
+                progress=progress, phrasings=phrasings,
+                ivf_min_rows=options['ivf_min_rows'], ivf_lists=options['ivf_lists'],
+                dtype=options['dtype'], pca_dim=options['pca_dim'],
+            )
+        except (KeyError, ValueError) as e:
+            raise CommandError(f'KB build failed: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Built {artifact_dir} in {time.perf_counter() - start:.1f}s"
+        ))
+        self.stdout.write(
+            f"   {stats['texts']} texts ({stats['phrasings']} curated phrasings, {stats['unique']} unique): "
+            f"{stats['encoded']} encoded, "
+            f"{stats['reused']} from cache, {stats['pruned']} stale cache entries dropped"
+        )
+        self.stdout.write(
+            f"   {manifest['rows']} rows across {len(manifest['crops'])} crops, "
+            f"stored as {manifest['dtype']} x {manifest['dim']}"
+        )
+        if 'projection' in manifest:
+            self.stdout.write(f"   PCA keeps {manifest['projection']['energy_kept']:.1%} of the embedding energy")
+        for crop, entry in manifest.get('ivf', {}).items():
+            self.stdout.write(f"   IVF: {crop} ({entry['lists']} lists)")
@@ -0,0 +1,78 @@
+"""
+Django management command to translate the KB answers into Hindi and Marathi
+
+Usage:
+    python manage.py localize_kb                  # after editing crop_disease_kb.json
+    python manage.py localize_kb --languages mr   # only Marathi
+    python manage.py localize_kb --full           # re-translate every text
+
+Writes kb/crop_disease_kb_localized.json, which the web workers load (and
+hot-reload) with the KB to answer treatment/prevention/learn_more/FAQ
+actions in the user's preferred language. Only texts that are new or were
+edited since the last run are translated.
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from disease_detection.kb_index import KB_JSON, KB_LOCALIZED_JSON
+from disease_detection.localization import (
+    LOCALIZED_LANGUAGES, build_localizations, load_localizations, save_localizations,
+)
+from disease_detection.model_registry import LOCALIZATION_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Translate the KB answer fields into Hindi and Marathi for localized action replies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kb', default=KB_JSON, help='Knowledge base JSON')
+        parser.add_argument('--output', default=KB_LOCALIZED_JSON, help='Localized KB JSON')
+        parser.add_argument('--languages', nargs='+', choices=LOCALIZED_LANGUAGES,
+                            default=list(LOCALIZED_LANGUAGES))
+        parser.add_argument('--full', action='store_true', help='Ignore existing translations')
+        parser.add_argument('--batch-size', type=int, default=16, help='Texts per translation call')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['kb'], 'r', encoding='utf-8') as f:
+                diseases = json.load(f)
+            existing = None if options['full'] else load_localizations(options['output'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read the KB or its translations: {e}')
+        self.stdout.write(f"Loaded {len(diseases)} disease entries")
+
+        pipelines = {}
+
+        def translator(lang):
+            # Models load only if that language has something to translate
+            def translate_batch(texts):
+                if lang not in pipelines:
+                    self.stdout.write(f"Loading {LOCALIZATION_MODELS[lang]}...")
+                    from transformers import pipeline
+                    pipelines[lang] = pipeline('translation', model=LOCALIZATION_MODELS[lang])
+                return [r['translation_text'] for r in pipelines[lang](texts)]
+            return translate_batch
+
+        def progress(lang, done, total):
+            self.stdout.write(f"  ✓ {lang}: translated {done}/{total} texts")
+
+        start = time.perf_counter()
+        localizations, stats = build_localizations(
+            diseases, {lang: translator(lang) for lang in options['languages']}, existing,
+            batch_size=options['batch_size'], progress=progress,
+        )
+        save_localizations(options['output'], localizations, {
+            lang: LOCALIZATION_MODELS[lang] for lang in localizations.languages
+        })
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {options['output']} in {time.perf_counter() - start:.1f}s"
+        ))
+        coverage = localizations.coverage(diseases)
+        for lang, counts in stats.items():
+            self.stdout.write(
+                f"   {lang}: {counts['translated']} translated, {counts['reused']} reused, "
+                f"{counts['pruned']} stale dropped ({coverage[lang]:.0%} of KB texts)"
+            )
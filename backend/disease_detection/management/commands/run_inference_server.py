@@ -0,0 +1,62 @@
+"""
+Django management command to run the shared NLP inference server
+
+Usage:
+    python manage.py run_inference_server                           # listen on INFERENCE_SERVER_URL
+    python manage.py run_inference_server --url unix:///run/agri/inference.sock
+    python manage.py run_inference_server --url http://127.0.0.1:8765 --models encoder translator_hi_en
+
+Web workers with the same INFERENCE_SERVER_URL send encoder and translator
+calls here instead of loading the models themselves.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from disease_detection.conf import get_setting
+from disease_detection.inference_server import make_server
+from disease_detection.model_registry import build_registry
+
+
+class Command(BaseCommand):
+    help = 'Serve the symptom encoder and translators to all web workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help="unix:///path/to.sock or http://127.0.0.1:PORT (defaults to INFERENCE_SERVER_URL)",
+        )
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            help='Models to load before accepting requests (defaults to WARM_MODELS)',
+        )
+
+    def handle(self, *args, **options):
+        url = options['url'] or get_setting('INFERENCE_SERVER_URL')
+        if not url:
+            raise CommandError('Pass --url or set DISEASE_DETECTION["INFERENCE_SERVER_URL"]')
+
+        registry = build_registry(serving=True)
+        models = options['models'] or [m for m in get_setting('WARM_MODELS') if m in registry.names]
+        unknown = set(models) - set(registry.names)
+        if unknown:
+            raise CommandError(f"Unknown models: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(self.style.SUCCESS('🔥 Loading inference models...'))
+        for name, info in registry.warm(models).items():
+            if info['loaded']:
+                self.stdout.write(f"   ✓ {name}: loaded in {info['load_seconds']}s")
+            else:
+                self.stdout.write(self.style.ERROR(f"   ✗ {name}: {info['error']}"))
+
+        try:
+            server = make_server(url, registry)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot listen on {url}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Inference server listening on {url}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,46 @@
+"""
+Django management command to pre-load the disease detection models
+
+Usage:
+    python manage.py warm_models
+    python manage.py warm_models --models encoder translator_hi_en
+
+It loads the models in its own process, so it downloads them and checks
+they work (e.g. in a deploy step) but does not warm any web worker. To
+pre-load the models in every worker before it serves, enable
+WARM_MODELS_ON_STARTUP, which wsgi.py/asgi.py apply via warm_on_startup().
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from disease_detection.model_registry import registry
+
+
+class Command(BaseCommand):
+    help = 'Load the disease detection KB and NLP models and run a dummy inference'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            choices=registry.names,
+            help='Models to warm (defaults to the WARM_MODELS setting)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🔥 Warming disease detection models...'))
+        
+        report = registry.warm(options['models'])
+        
+        failed = []
+        for name, info in report.items():
+            if info['loaded']:
+                warmup = f", warmup {info['warmup_seconds']}s" if info['warmup_seconds'] is not None else ''
+                self.stdout.write(f"   ✓ {name}: loaded in {info['load_seconds']}s{warmup}")
+            else:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"   ✗ {name}: {info['error']}"))
+        
+        if failed:
+            raise CommandError(f"Failed to load: {', '.join(failed)}")
+        
+        self.stdout.write(self.style.SUCCESS('✅ All models warmed'))
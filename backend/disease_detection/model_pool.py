@@ -0,0 +1,150 @@
+"""
+Memory-budgeted pool of on-demand models
+
+The MarianMT translators are ~300 MB each, and most traffic never needs
+more than one of them. Pooled models (see ModelRegistry.register) are
+loaded on first use like any other resource, but the pool records how much
+memory each one takes. When the pooled models together exceed the budget,
+the least recently used ones are evicted: dropped from the registry (and
+their micro-batching thread stopped) so the memory is released once in-flight
+requests finish. An evicted model is simply loaded again by the next request
+that needs it.
+
+A model's size is its parameter and buffer bytes when it exposes a PyTorch
+module (`.model` on a transformers pipeline), otherwise the growth of the
+process RSS while it loaded.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def process_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (None where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def model_bytes(resource: Any) -> Optional[int]:
+    """Parameter and buffer bytes of a (wrapped) PyTorch model, None if it has none"""
+    # BatchedTranslator/BatchedEncoder wrap the pipeline or encoder
+    for attr in ('translator', 'encoder'):
+        resource = getattr(resource, attr, resource)
+    module = getattr(resource, 'model', resource)
+    if not hasattr(module, 'parameters'):
+        return None
+    tensors = list(module.parameters()) + list(getattr(module, 'buffers', lambda: [])())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelPool:
+    """
+    LRU accounting and eviction for pooled registry resources
+
+    Args:
+        budget_bytes: Memory the pooled models may hold together (None: unlimited)
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None):
+        self.budget_bytes = budget_bytes
+        self._sizes = OrderedDict()  # name -> bytes, least recently used first
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.hits = 0
+        self._model_stats = {}
+
+    def touch(self, name: str):
+        """Record a use of a resident model"""
+        with self._lock:
+            if name in self._sizes:
+                self._sizes.move_to_end(name)
+                self.hits += 1
+                self._entry(name)['hits'] += 1
+
+    def admit(self, name: str, resource: Any, rss_before: Optional[int] = None) -> List[str]:
+        """
+        Account for a freshly loaded model and pick models to evict
+
+        Args:
+            name: Registry name of the model
+            resource: The loaded model
+            rss_before: process_rss() taken just before loading (fallback size)
+
+        Returns:
+            Names of least recently used models to evict (never `name`
+            itself, even if it alone exceeds the budget)
+        """
+        size = model_bytes(resource)
+        if size is None:
+            rss_after = process_rss()
+            size = max(rss_after - rss_before, 0) if rss_before is not None and rss_after is not None else 0
+
+        with self._lock:
+            self._sizes[name] = size
+            self._sizes.move_to_end(name)
+            self.loads += 1
+            entry = self._entry(name)
+            entry['loads'] += 1
+            entry['bytes'] = size
+            entry['loaded_at'] = time.time()
+
+            victims = []
+            if self.budget_bytes is not None:
+                resident = sum(self._sizes.values())
+                for victim in list(self._sizes):
+                    if resident <= self.budget_bytes or victim == name:
+                        break
+                    resident -= self._sizes.pop(victim)
+                    victims.append(victim)
+                    self.evictions += 1
+                    self._entry(victim)['evictions'] += 1
+            return victims
+
+    @staticmethod
+    def release(resource: Any):
+        """Stop a model's background work so its memory can be reclaimed"""
+        close = getattr(resource, 'close', None)
+        if callable(close):
+            close()
+
+    @staticmethod
+    def collect():
+        """Free evicted models now rather than at the next GC cycle"""
+        gc.collect()
+
+    def _entry(self, name: str) -> Dict:
+        return self._model_stats.setdefault(
+            name, {'loads': 0, 'evictions': 0, 'hits': 0, 'bytes': None, 'loaded_at': None}
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            resident = sum(self._sizes.values())
+            models = {}
+            for name, entry in self._model_stats.items():
+                models[name] = {
+                    'resident': name in self._sizes,
+                    'mb': round(entry['bytes'] / 2**20, 1) if entry['bytes'] is not None else None,
+                    'loads': entry['loads'],
+                    'evictions': entry['evictions'],
+                    'hits': entry['hits'],
+                }
+            rss = process_rss()
+            return {
+                'budget_mb': round(self.budget_bytes / 2**20, 1) if self.budget_bytes is not None else None,
+                'resident_mb': round(resident / 2**20, 1),
+                'process_rss_mb': round(rss / 2**20, 1) if rss is not None else None,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'hits': self.hits,
+                'lru_order': list(self._sizes),
+                'models': models,
+            }
@@ -0,0 +1,361 @@
+"""
+Lazily loaded models and KB for disease detection
+
+Nothing heavy is imported or loaded until first use, so management commands
+and scripts that import the URLconf start in milliseconds. Web workers are
+pre-warmed by the WARM_MODELS_ON_STARTUP setting (warm_on_startup(), called
+from wsgi.py/asgi.py); `python manage.py warm_models` only downloads and
+checks the models in its own process.
+
+With INFERENCE_SERVER_URL set, the encoder and translators resolve to thin
+clients of the shared inference server instead (see inference_server.py).
+"""
+
+import logging
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .conf import get_setting
+from .model_pool import ModelPool, process_rss
+
+logger = logging.getLogger(__name__)
+
+ENCODER_MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+# Matches Hindi/Marathi text directly against the KB (RETRIEVAL_MODE='multilingual')
+MULTILINGUAL_ENCODER_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# Registry names
+KB = 'kb'
+KB_MULTILINGUAL = 'kb_multilingual'
+ENCODER = 'encoder'
+MULTILINGUAL_ENCODER = 'multilingual_encoder'
+TRANSLATOR_HI_EN = 'translator_hi_en'
+TRANSLATOR_MR_EN = 'translator_mr_en'
+
+
+class TransientLoadError(Exception):
+    """A loader failed for a reason that may pass, e.g. the inference server is not up yet"""
+
+
+class ModelRegistry:
+    """
+    Loads each registered resource on first use, behind a per-resource lock
+
+    A loader that fails is logged once and its resource reported as None,
+    matching the previous import-time behaviour where a missing translator
+    simply disabled translation. A loader raising TransientLoadError is
+    tried again once MODEL_LOAD_RETRY_SECONDS have passed instead.
+
+    Resources registered with pooled=True share the memory budget of
+    `pool` (see model_pool.py): the least recently used ones are evicted
+    when it is exceeded and reloaded on their next use.
+
+    Args:
+        pool: ModelPool for pooled resources (None: pooled resources are
+            never evicted)
+    """
+
+    def __init__(self, pool: Optional[ModelPool] = None):
+        self.pool = pool
+        self._pooled = set()
+        self._loaders = {}
+        self._warmups = {}
+        self._models = {}
+        self._errors = {}
+        self._retry_at = {}  # name -> time.monotonic() after which a transient failure is retried
+        self._locks = {}
+        self._load_times = {}
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 warmup: Optional[Callable[[Any], Any]] = None, pooled: bool = False):
+        """
+        Register a resource
+
+        Args:
+            name: Registry key
+            loader: Zero-argument function returning the loaded resource
+            warmup: Optional function running a dummy inference on the resource
+            pooled: Count the resource against the pool's memory budget
+        """
+        if pooled and self.pool is not None:
+            self._pooled.add(name)
+        self._loaders[name] = loader
+        self._warmups[name] = warmup
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """Return the resource, loading it on first use (None if loading failed)"""
+        # Pooled resources can be evicted by other threads, so read once
+        resource = self._models.get(name)
+        if resource is not None:
+            if name in self._pooled:
+                self.pool.touch(name)
+            return resource
+        if name in self._errors and not self._retry_due(name):
+            return None
+
+        with self._locks[name]:
+            resource = self._models.get(name)
+            if resource is None and (name not in self._errors or self._retry_due(name)):
+                rss_before = process_rss() if name in self._pooled else None
+                start = time.perf_counter()
+                try:
+                    resource = self._loaders[name]()
+                    self._models[name] = resource
+                    self._errors.pop(name, None)
+                    self._retry_at.pop(name, None)
+                except TransientLoadError as e:
+                    logger.warning(f"Cannot load {name} yet, retrying in {get_setting('MODEL_LOAD_RETRY_SECONDS')}s: {e}")
+                    self._errors[name] = str(e)
+                    self._retry_at[name] = time.monotonic() + get_setting('MODEL_LOAD_RETRY_SECONDS')
+                except Exception as e:
+                    print(f'Error loading {name}:', e)
+                    traceback.print_exc()
+                    self._errors[name] = str(e)
+                self._load_times[name] = round(time.perf_counter() - start, 3)
+                if resource is not None and name in self._pooled:
+                    self._evict(self.pool.admit(name, resource, rss_before))
+        return resource
+
+    def _retry_due(self, name: str) -> bool:
+        retry_at = self._retry_at.get(name)
+        return retry_at is not None and time.monotonic() >= retry_at
+
+    def _evict(self, names: Iterable[str]):
+        names = list(names)
+        for name in names:
+            resource = self._models.pop(name, None)
+            if resource is not None:
+                self.pool.release(resource)
+                logger.info(f"Evicted {name} to stay within the model memory budget")
+        if names:
+            self.pool.collect()
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        Load resources and run their dummy inference
+
+        Args:
+            names: Resources to warm (defaults to the WARM_MODELS setting)
+
+        Returns:
+            Mapping of name to load/warmup seconds and status
+        """
+        report = {}
+        for name in names or get_setting('WARM_MODELS'):
+            resource = self.get(name)
+            warmup_seconds = None
+            if resource is not None and self._warmups[name]:
+                start = time.perf_counter()
+                self._warmups[name](resource)
+                warmup_seconds = round(time.perf_counter() - start, 3)
+            report[name] = {
+                'loaded': resource is not None,
+                'load_seconds': self._load_times.get(name),
+                'warmup_seconds': warmup_seconds,
+                'error': self._errors.get(name),
+            }
+        return report
+
+    @property
+    def names(self):
+        return list(self._loaders)
+
+    def stats(self) -> Dict:
+        stats = {}
+        for name in self._loaders:
+            stats[name] = {
+                'loaded': name in self._models,
+                'load_seconds': self._load_times.get(name),
+                'error': self._errors.get(name),
+            }
+            batcher = getattr(self._models.get(name), 'batcher', None)
+            if batcher is not None:
+                stats[name]['micro_batching'] = batcher.stats()
+            if name in (KB, KB_MULTILINGUAL) and name in self._models:
+                stats[name].update(self._models[name].stats())
+        return stats
+
+
+def _kb_loader(multilingual: bool) -> Callable[[], Any]:
+    def load_kb():
+        from .kb_index import (
+            KB_JSON, KB_LOCALIZED_JSON, KB_ARTIFACT_DIR, KB_MULTILINGUAL_ARTIFACT_DIR, MANIFEST_FILE,
+            EMBEDDINGS_PKL, load_kb_and_embeddings,
+        )
+        from .kb_service import KBService
+
+        # The multilingual KB only exists as an artifact (`manage.py build_kb --multilingual`)
+        artifact_dir = KB_MULTILINGUAL_ARTIFACT_DIR if multilingual else KB_ARTIFACT_DIR
+        pickle_path = None if multilingual else EMBEDDINGS_PKL
+
+        def load():
+            _, index = load_kb_and_embeddings(
+                vector_index=get_setting('VECTOR_INDEX'), nprobe=get_setting('IVF_NPROBE'),
+                artifact_dir=artifact_dir, pickle_path=pickle_path,
+            )
+            return index
+
+        # The artifact directory is swapped atomically, so its manifest changes with every rebuild
+        kb = KBService(
+            load,
+            [path for path in (KB_JSON, KB_LOCALIZED_JSON, os.path.join(artifact_dir, MANIFEST_FILE), pickle_path)
+             if path],
+            check_interval=get_setting('KB_RELOAD_INTERVAL') if get_setting('KB_HOT_RELOAD') else None,
+        )
+        index = kb.current()
+        print(f"✅ Loaded {len(index.diseases)} diseases and {len(index)} embeddings")
+        return kb
+    return load_kb
+
+
+def _inference_client():
+    # Thin client for the shared inference server, if one is configured and reachable
+    url = get_setting('INFERENCE_SERVER_URL')
+    if not url:
+        return None
+    from .inference_server import InferenceClient
+    client = InferenceClient(url, timeout=get_setting('INFERENCE_SERVER_TIMEOUT'))
+    try:
+        client.health()
+    except Exception as e:
+        if not get_setting('INFERENCE_SERVER_FALLBACK'):
+            # Usually the server is still starting: let the registry retry
+            raise TransientLoadError(f"Inference server {url} unreachable: {e}") from e
+        logger.warning(f"Inference server {url} unreachable, loading models in-process: {e}")
+        return None
+    return client
+
+
+def _encoder_loader(name: str, serving: bool) -> Callable[[], Any]:
+    def load():
+        if not serving:
+            client = _inference_client()
+            if client is not None:
+                from .inference_server import RemoteEncoder
+                return RemoteEncoder(client, name)
+
+        if name == MULTILINGUAL_ENCODER:
+            from sentence_transformers import SentenceTransformer
+            encoder = SentenceTransformer(MULTILINGUAL_ENCODER_MODEL_NAME)
+        else:
+            encoder = _load_encoder_backend()
+        # The inference server always batches: its callers are many web workers
+        if serving or get_setting('MICRO_BATCHING'):
+            from .batching import BatchedEncoder
+            encoder = BatchedEncoder(
+                encoder,
+                max_batch_size=get_setting('MICRO_BATCH_MAX_SIZE'),
+                max_wait_ms=get_setting('MICRO_BATCH_WAIT_MS'),
+            )
+        return encoder
+    return load
+
+
+def _load_encoder_backend():
+    # ONNX Runtime backend when configured, PyTorch otherwise (or if ONNX fails)
+    if get_setting('ENCODER_BACKEND') == 'onnx':
+        try:
+            from .encoders import OnnxSentenceEncoder, DEFAULT_ONNX_DIR
+            encoder = OnnxSentenceEncoder(
+                get_setting('ONNX_ENCODER_DIR') or DEFAULT_ONNX_DIR,
+                quantized=get_setting('ONNX_ENCODER_QUANTIZED'),
+            )
+            logger.info(f"Using ONNX symptom encoder {encoder.model_path}")
+            return encoder
+        except Exception as e:
+            logger.warning(f"ONNX encoder unavailable, falling back to PyTorch: {e}")
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(ENCODER_MODEL_NAME)
+
+
+def _translation_loader(name: str, serving: bool) -> Callable[[], Any]:
+    model_name = TRANSLATION_MODELS[name]
+
+    def load():
+        if not serving:
+            client = _inference_client()
+            if client is not None:
+                from .inference_server import RemoteTranslator
+                return RemoteTranslator(client, name)
+
+        from transformers import pipeline
+        translator = pipeline('translation', model=model_name)
+        if serving or get_setting('MICRO_BATCHING'):
+            from .batching import BatchedTranslator
+            translator = BatchedTranslator(
+                translator, name=model_name.rsplit('/', 1)[-1],
+                max_batch_size=get_setting('MICRO_BATCH_MAX_SIZE'),
+                max_wait_ms=get_setting('MICRO_BATCH_WAIT_MS'),
+            )
+        return translator
+    return load
+
+
+TRANSLATION_MODELS = {
+    TRANSLATOR_HI_EN: 'Helsinki-NLP/opus-mt-hi-en',
+    TRANSLATOR_MR_EN: 'Helsinki-NLP/opus-mt-mr-en',
+}
+
+# en→xx models, only loaded offline by `manage.py localize_kb`
+LOCALIZATION_MODELS = {
+    'hi': 'Helsinki-NLP/opus-mt-en-hi',
+    'mr': 'Helsinki-NLP/opus-mt-en-mr',
+}
+
+ENCODER_MODELS = {
+    ENCODER: ENCODER_MODEL_NAME,
+    MULTILINGUAL_ENCODER: MULTILINGUAL_ENCODER_MODEL_NAME,
+}
+
+# Dummy inputs for warm-up inference
+WARMUP_TEXTS = {
+    ENCODER: 'leaves turning yellow',
+    MULTILINGUAL_ENCODER: 'पत्ते पीले हो रहे हैं',
+    TRANSLATOR_HI_EN: 'पत्ते पीले हो रहे हैं',
+    TRANSLATOR_MR_EN: 'पाने पिवळी पडत आहेत',
+}
+
+
+def build_registry(serving: bool = False) -> ModelRegistry:
+    """
+    Registry of the KB and NLP models
+
+    Args:
+        serving: True inside the inference server, which always loads models
+            in-process and micro-batches them; web workers (False) use the
+            server from INFERENCE_SERVER_URL when configured
+
+    Returns:
+        ModelRegistry with every resource registered but not loaded
+    """
+    budget_mb = get_setting('TRANSLATOR_MEMORY_BUDGET_MB')
+    models = ModelRegistry(ModelPool(int(budget_mb * 2**20) if budget_mb is not None else None))
+    if not serving:
+        models.register(KB, _kb_loader(multilingual=False))
+        models.register(KB_MULTILINGUAL, _kb_loader(multilingual=True))
+    for name in ENCODER_MODELS:
+        models.register(name, _encoder_loader(name, serving),
+                        warmup=lambda m, text=WARMUP_TEXTS[name]: m.encode([text]))
+    for name in TRANSLATION_MODELS:
+        models.register(name, _translation_loader(name, serving),
+                        warmup=lambda t, text=WARMUP_TEXTS[name]: t(text), pooled=True)
+    return models
+
+
+registry = build_registry()
+
+
+def warm_on_startup():
+    """Warm models from wsgi.py/asgi.py when WARM_MODELS_ON_STARTUP is enabled"""
+    if not get_setting('WARM_MODELS_ON_STARTUP'):
+        return
+    report = registry.warm()
+    logger.info(f"Warmed disease detection models: {report}")
@@ -0,0 +1,180 @@
+"""
+Reduced-precision and reduced-dimension storage for symptom embeddings
+
+The KB build (`manage.py build_kb --dtype/--pca-dim`) can shrink
+the embedding matrix that every similarity scan reads:
+  - PCA:     rows are projected onto the top `dim` principal directions of
+             the KB (uncentered and not re-normalized, so scores stay on the
+             scale of the 0.60 confidence threshold); normalized queries get
+             the same projection at runtime
+  - float16: half-size rows
+  - int8:    quarter-size rows with one float32 scale per row
+
+Reduced-precision rows are scanned in float32 blocks (NumPy has no int8 or
+float16 matrix kernels), so the page cache and memory bandwidth shrink with
+the storage while the arithmetic stays BLAS float32. See
+kb/benchmark_embedding_storage.py for agreement with full precision.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+STORAGE_DTYPES = ('float32', 'float16', 'int8')
+INT8_MAX = 127
+
+
+def fit_pca(embeddings: np.ndarray, dim: int, chunk_size: int = 65536) -> Tuple[np.ndarray, float]:
+    """
+    Principal directions of a set of unit vectors (uncentered)
+
+    Args:
+        embeddings: (n, source_dim) L2-normalized rows
+        dim: Number of directions to keep
+        chunk_size: Rows accumulated per matrix multiply (bounds memory)
+
+    Returns:
+        ((dim, source_dim) float32 projection, share of the energy it keeps)
+    """
+    source_dim = embeddings.shape[1]
+    if not 0 < dim < source_dim:
+        raise ValueError(f"PCA dimension must be between 1 and {source_dim - 1}, got {dim}")
+
+    gram = np.zeros((source_dim, source_dim), dtype=np.float64)
+    for start in range(0, embeddings.shape[0], chunk_size):
+        block = np.asarray(embeddings[start:start + chunk_size], dtype=np.float64)
+        gram += block.T @ block
+
+    eigenvalues, eigenvectors = np.linalg.eigh(gram)  # Ascending
+    top = np.argsort(-eigenvalues, kind='stable')[:dim]
+    kept = float(eigenvalues[top].sum() / max(eigenvalues.sum(), 1e-12))
+    return np.ascontiguousarray(eigenvectors[:, top].T, dtype=np.float32), kept
+
+
+def project(matrix: np.ndarray, projection: np.ndarray) -> np.ndarray:
+    """
+    Apply a PCA projection to unit rows (or a single unit vector)
+
+    Projections are deliberately not re-normalized: the dot product of two
+    projected unit vectors approximates their full cosine similarity, while
+    re-normalizing would inflate scores for text outside the KB's subspace.
+    """
+    return np.asarray(matrix, dtype=np.float32) @ projection.T
+
+
+def quantize(embeddings: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Encode float32 rows for storage
+
+    Args:
+        embeddings: (n, dim) float32 rows
+        dtype: 'float32', 'float16' or 'int8'
+
+    Returns:
+        (codes, scales): scales is one float32 per row for int8 (symmetric
+        per-row quantization), None otherwise
+    """
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype {dtype!r} (expected one of {STORAGE_DTYPES})")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype != 'int8':
+        return embeddings.astype(dtype), None
+
+    scales = np.abs(embeddings).max(axis=1) / INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(embeddings / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """
+    Read-only float16/int8 row matrix that behaves like a float32 one
+
+    Slicing rows (`m[a:b]`) returns another QuantizedMatrix sharing the same
+    storage, like a NumPy view; indexing with an array of rows returns the
+    dequantized float32 rows. `m @ x` is computed block by block.
+
+    Args:
+        codes: (n, dim) float16 or int8 rows (may be memory-mapped)
+        scales: (n,) float32 per-row scales for int8 codes
+        block_rows: Rows dequantized per block
+    """
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None, block_rows: int = 8192):
+        if codes.dtype == np.int8 and scales is None:
+            raise ValueError('int8 codes need per-row scales')
+        self.codes = codes
+        self.scales = scales
+        self.block_rows = block_rows
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.codes.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def _dequantize(self, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        rows = np.asarray(codes, dtype=np.float32)
+        if scales is not None:
+            rows *= scales[:, None]
+        return rows
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            scales = None if self.scales is None else self.scales[rows]
+            return QuantizedMatrix(self.codes[rows], scales, self.block_rows)
+        rows = np.asarray(rows)
+        return self._dequantize(self.codes[rows], None if self.scales is None else self.scales[rows])
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self._dequantize(self.codes, self.scales)
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        other = np.asarray(other, dtype=np.float32)
+        out = np.empty((len(self),) + other.shape[1:], dtype=np.float32)
+        for start in range(0, len(self), self.block_rows):
+            end = start + self.block_rows
+            # Scale the (block, ...) product rather than the (block, dim) rows
+            out[start:end] = np.asarray(self.codes[start:end], dtype=np.float32) @ other
+        if self.scales is not None:
+            out *= self.scales.reshape((-1,) + (1,) * (other.ndim - 1))
+        return out
+
+
+def compress_embeddings(embeddings: np.ndarray, dtype: str = 'float32',
+                        pca_dim: Optional[int] = None) -> Tuple:
+    """
+    Reduce normalized embeddings for storage
+
+    Args:
+        embeddings: (n, dim) L2-normalized float32 rows
+        dtype: Storage dtype ('float32', 'float16' or 'int8')
+        pca_dim: Project onto this many principal directions first (None keeps all)
+
+    Returns:
+        (codes, scales, projection, energy kept); projection and energy are
+        None without PCA, scales is None unless dtype is 'int8'
+    """
+    projection = kept = None
+    if pca_dim is not None:
+        projection, kept = fit_pca(embeddings, pca_dim)
+        embeddings = project(embeddings, projection)
+    codes, scales = quantize(embeddings, dtype)
+    return codes, scales, projection, kept
+
+
+def as_matrix(codes: np.ndarray, scales: Optional[np.ndarray] = None):
+    """Wrap stored codes for scoring: float32 stays a plain array"""
+    if codes.dtype == np.float32:
+        return codes
+    return QuantizedMatrix(codes, scales)
@@ -0,0 +1,180 @@
+"""
+Romanized Hindi/Marathi (Hinglish) normalization for symptom text
+
+Many farmers type Hindi or Marathi in Latin script ("patte pe bhure daag",
+"panavar pivle thipke"). The language identifier sees ASCII and says 'en',
+and MarianMT expects Devanagari anyway, so these queries used to reach the
+English encoder untranslated. RomanizedNormalizer rewrites them word by word
+from a curated agricultural lexicon (romanized_lexicon.json) before any
+model runs:
+
+  - tokens are reduced to a spelling key (ee->i, oo->u, w->v, doubled
+    consonants collapsed), so "patte"/"pate" and "peele"/"pile" share an entry
+  - a token-level trie matches the longest lexicon phrase at each position
+    ("pile pad rahe" -> "turning yellow" rather than "yellow pad rahe")
+  - function words ("pe", "aur", "hai") are mapped or dropped, but only once
+    the text has a content word that is not also English ("pile", "kale",
+    "pane" alone never trigger a rewrite)
+  - words the lexicon does not know are kept, so English in code-mixed text
+    ("patte pe brown spots") passes through
+  - Hindi/Marathi postpositions follow their noun phrase, so within each
+    clause the phrases are put in English order: "patte pe bhure daag"
+    ("leaves on brown spots") becomes "brown spots on leaves"
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'romanized_lexicon.json')
+
+_TOKEN = re.compile(r"[a-z]+|[^a-z\s]+")
+_DOUBLED_CONSONANT = re.compile(r'([b-df-hj-np-tv-z])\1+')
+
+# Trie node key of the lexicon value stored at the end of a phrase
+_VALUE = ''
+
+# English renderings of the lexicon's postpositions; Marathi suffixed forms
+# ("panavar" -> "on leaves") start with one of the first two
+POSTPOSITIONS = frozenset({'on', 'in', 'under', 'inside', 'in the middle', 'with', 'like'})
+_SUFFIX_POSTPOSITIONS = ('on', 'in')
+_CONJUNCTIONS = frozenset({'and'})
+
+
+def spelling_key(token: str) -> str:
+    """Collapse common romanization variants of a lowercase token"""
+    key = token.replace('ee', 'i').replace('oo', 'u').replace('w', 'v')
+    return _DOUBLED_CONSONANT.sub(r'\1', key)
+
+
+def english_order(words: List[Tuple[str, bool]]) -> List[str]:
+    """
+    Move postpositions in front of the phrase they follow
+
+    Within a clause, "X1 P1 X2 P2 X3" (X: phrases, P: postpositions) reads
+    "X3 P2 X2 P1 X1" in English, e.g. "field in plants on spots" ->
+    "spots on plants in field". Punctuation and "and" end a clause.
+
+    Args:
+        words: (English text, is postposition) in source order
+
+    Returns:
+        English texts in English order
+    """
+    ordered = []
+    segments = []  # (phrase, postposition) of the clause so far
+    phrase = []
+    for text, is_postposition in words + [('', False)]:
+        boundary = not text or text in _CONJUNCTIONS or not any(ch.isalnum() for ch in text)
+        if is_postposition and phrase:
+            segments.append((phrase, text))
+            phrase = []
+        elif boundary:
+            ordered.extend(phrase)
+            for words_before, postposition in reversed(segments):
+                ordered.append(postposition)
+                ordered.extend(words_before)
+            if text:
+                ordered.append(text)
+            segments, phrase = [], []
+        else:
+            phrase.append(text)
+    return ordered
+
+
+class Normalized(NamedTuple):
+    text: str            # English rewrite (the input itself when not romanized)
+    lang: Optional[str]  # 'hi' or 'mr' if the text was romanized Hindi/Marathi, else None
+    matched: int         # Input tokens covered by the lexicon
+    tokens: int          # Word tokens in the input
+
+
+class RomanizedNormalizer:
+    """
+    Longest-match lexicon rewriter for romanized Hindi/Marathi
+
+    Args:
+        lexicon: {'content': {lang: {phrase: english}}, 'function': {phrase:
+            english or ''}, 'ambiguous': [content words that are also English]}
+    """
+
+    def __init__(self, lexicon: Dict):
+        self.trie = {}
+        self.ambiguous = {spelling_key(word) for word in lexicon.get('ambiguous', [])}
+        for lang, entries in lexicon['content'].items():
+            for phrase, english in entries.items():
+                self._add(phrase, english, lang)
+        for phrase, english in lexicon.get('function', {}).items():
+            self._add(phrase, english, None)
+
+    @classmethod
+    def load(cls, path: str = LEXICON_PATH) -> 'RomanizedNormalizer':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _add(self, phrase: str, english: str, lang: Optional[str]):
+        keys = [spelling_key(token) for token in phrase.lower().split()]
+        node = self.trie
+        for key in keys:
+            node = node.setdefault(key, {})
+        entry = node.get(_VALUE)
+        if entry is None:
+            # (english, languages it belongs to; empty for function words, ambiguous?)
+            node[_VALUE] = (english, {lang} if lang else set(), len(keys) == 1 and keys[0] in self.ambiguous)
+        elif lang:
+            # The same word in both languages ("kida", "rog") keeps the first meaning
+            entry[1].add(lang)
+
+    def normalize(self, text: str) -> Normalized:
+        """
+        Rewrite romanized Hindi/Marathi symptom text in English
+
+        Text that is not ASCII, or has no unambiguous romanized content word,
+        is returned unchanged with lang None.
+        """
+        if not text.isascii():
+            return Normalized(text, None, 0, 0)
+        tokens = _TOKEN.findall(text.lower())
+        keys = [spelling_key(token) if token.isalpha() else None for token in tokens]
+        words = sum(key is not None for key in keys)
+
+        out = []
+        votes = {}
+        evidence = matched = 0
+        i = 0
+        while i < len(tokens):
+            # Longest lexicon phrase starting at token i
+            node = self.trie
+            match = None
+            j = i
+            while j < len(tokens) and keys[j] is not None and keys[j] in node:
+                node = node[keys[j]]
+                j += 1
+                if _VALUE in node:
+                    match = (j, node[_VALUE])
+            if match is None:
+                out.append((tokens[i], False))
+                i += 1
+                continue
+            end, (english, langs, ambiguous) = match
+            head, _, rest = english.partition(' ')
+            if langs and rest and head in _SUFFIX_POSTPOSITIONS:
+                # Marathi noun with its postposition attached ("panavar")
+                out.extend([(rest, False), (head, True)])
+            elif english:
+                out.append((english, not langs and english in POSTPOSITIONS))
+            if langs and not ambiguous:
+                evidence += 1
+            for lang in langs:
+                votes[lang] = votes.get(lang, 0) + 1
+            matched += end - i
+            i = end
+
+        if not evidence:
+            return Normalized(text, None, 0, words)
+        # Words in both lexicons do not decide; Hindi wins ties
+        lang = 'mr' if votes.get('mr', 0) > votes.get('hi', 0) else 'hi'
+        rewritten = ' '.join(english_order(out))
+        rewritten = re.sub(r'\s+([^\w\s])', r'\1', rewritten)  # "spots ," -> "spots,"
+        return Normalized(rewritten, lang, matched, words)
@@ -1,3 +1,1083 @@
-from django.test import TestCase
+import io
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import kb_index, views
+from .batching import MicroBatcher
+from .caches import EncodingCache, LRUCache, TranslationCache
+from .clauses import split_clauses
+from .encoders import mean_pool
+from .kb_build import build_kb, load_embedding_cache, load_phrasings
+from .kb_index import SymptomIndex, load_kb_and_embeddings, save_artifact, swap_dirs, wait_for_swap
+from .kb_service import KBService
+from .language_id import LanguageIdentifier
+from .lexical_index import tokenize
+from .localization import (
+    Localizations, build_localizations, language_code, load_localizations, save_localizations,
+)
+from .model_pool import ModelPool
+from .inference_server import InferenceClient, InferenceServerError, RemoteEncoder, RemoteTranslator, make_server
+from .model_registry import (
+    ENCODER, KB, KB_MULTILINGUAL, MULTILINGUAL_ENCODER, TRANSLATOR_HI_EN, TRANSLATOR_MR_EN, ModelRegistry, TransientLoadError,
+)
+from .quantization import QuantizedMatrix, compress_embeddings, project, quantize
+from .romanized import RomanizedNormalizer
+from .timing import LatencyStats, StageTimer
+from .vector_index import UNSEARCHED_SCORE, ExactIndex, IVFIndex, assign_lists, spherical_kmeans
+
+# Three tomato diseases whose symptoms lie along their own axis, so tests
+# control similarities exactly: a query between two axes matches both
+DISEASES = [
+    {
+        'crop_name': 'Tomato', 'disease_name': 'Tomato Early Blight', 'severity_level': 'Medium',
+        'symptoms': ['dark concentric rings on older leaves', 'yellow halo around leaf spots'],
+    },
+    {
+        'crop_name': 'Tomato', 'disease_name': 'Tomato Late Blight', 'severity_level': 'High',
+        'symptoms': ['water soaked lesions on leaves', 'white mold under the leaves'],
+    },
+    {
+        'crop_name': 'Tomato', 'disease_name': 'Tomato Bacterial Wilt', 'severity_level': 'High',
+        'symptoms': ['sudden wilting of the whole plant', 'brown vascular tissue in the stem'],
+    },
+]
+
+# A second crop for cross-crop requests
+POTATO_BLACK_SCURF = {
+    'crop_name': 'Potato', 'disease_name': 'Potato Black Scurf', 'severity_level': 'Low',
+    'symptoms': ['black scurf on tubers'], 'treatment': 'Treat seed tubers before planting',
+}
+
+AXES = np.eye(4, dtype=np.float32)
+VECTORS = {
+    'dark concentric rings on older leaves': AXES[0],
+    'yellow halo around leaf spots': AXES[0] + 0.5 * AXES[3],
+    'water soaked lesions on leaves': AXES[1],
+    'white mold under the leaves': AXES[1] + 0.5 * AXES[3],
+    'sudden wilting of the whole plant': AXES[2],
+    'brown vascular tissue in the stem': AXES[2] + 0.5 * AXES[3],
+    'black scurf on tubers': AXES[3],
+    # Queries
+    'rings or lesions on leaves': AXES[0] + AXES[1],
+    'plant wilting suddenly': AXES[2],
+    'पौधा अचानक मुरझा गया': AXES[2],
+    'scurf on tubers': AXES[3],
+}
+
+
+class FakeEncoder:
+    """SentenceTransformer stand-in that knows the vectors above"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+        self.calls.append(list(texts))
+        return np.stack([VECTORS.get(text, np.zeros(4, dtype=np.float32)) for text in texts])
+
+
+def embeddings_data(diseases=DISEASES):
+    """Rows in the legacy pickle format"""
+    return [
+        {
+            'crop_name': disease['crop_name'], 'disease_name': disease['disease_name'],
+            'symptom_text': symptom, 'embedding': VECTORS[symptom], 'full_data': disease,
+        }
+        for disease in diseases for symptom in disease['symptoms']
+    ]
+
+
+def build_index(diseases=DISEASES):
+    return SymptomIndex.from_embeddings_data(embeddings_data(diseases))
+
+
+class CropIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.crop_index = build_index().get('tomato')
+
+    def test_aggregate_reduces_rows_per_disease(self):
+        sims = np.array([0.9, 0.5, 0.2, 0.4, 0.1, 0.3], dtype=np.float32)
+        scores = self.crop_index.aggregate(sims, top_k=2)
+
+        np.testing.assert_allclose(scores.max_scores, [0.9, 0.4, 0.3])
+        np.testing.assert_allclose(scores.mean_scores, [0.7, 0.3, 0.2])
+        self.assertEqual(scores.top_rows.tolist(), [[0, 1], [3, 2], [5, 4]])
+        self.assertEqual(scores.ranking.tolist(), [0, 1, 2])
+        self.assertEqual(scores.best_rows.tolist(), [0, 3, 5])
+
+    def test_aggregate_ranks_by_given_disease_scores(self):
+        sims = np.array([0.9, 0.5, 0.2, 0.4, 0.1, 0.3], dtype=np.float32)
+        scores = self.crop_index.aggregate(sims, group_scores=np.array([0.1, 0.8, 0.5]))
+
+        self.assertEqual(scores.ranking.tolist(), [1, 2, 0])
+        self.assertEqual(scores.top_rows[0].tolist(), [0, 1])  # Rows still ranked by similarity
+
+    def test_fuse_clauses_prefers_the_disease_explaining_every_clause(self):
+        # Clause 1 matches diseases 0 and 1 equally; clause 2 only disease 1
+        clause_sims = np.array([
+            [0.8, 0.0, 0.8, 0.0, 0.0, 0.0],
+            [0.0, 0.0, 0.0, 0.7, 0.0, 0.0],
+        ], dtype=np.float32)
+        sims, group_scores = self.crop_index.fuse_clauses(clause_sims, coverage_weight=0.5)
+
+        np.testing.assert_allclose(sims, [0.8, 0.0, 0.8, 0.7, 0.0, 0.0])
+        np.testing.assert_allclose(group_scores, [0.6, 0.775, 0.0])
+
+    def test_fuse_clauses_without_coverage_keeps_the_best_clause(self):
+        clause_sims = np.array([[0.8, 0.0, 0.8, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.7, 0.0, 0.0]])
+        _, group_scores = self.crop_index.fuse_clauses(clause_sims, coverage_weight=0.0)
+        np.testing.assert_allclose(group_scores, [0.8, 0.8, 0.0])
+
+    def test_lexical_candidates_returns_every_row_of_matching_diseases(self):
+        scores = self.crop_index.lexical.score(tokenize('wilt'))
+        self.assertEqual(self.crop_index.lexical_candidates(scores, 5).tolist(), [4, 5])
+
+        scores = self.crop_index.lexical.score(tokenize('blight'))
+        self.assertIn(self.crop_index.lexical_candidates(scores, 1).tolist(), ([0, 1], [2, 3]))
+        self.assertEqual(sorted(self.crop_index.lexical_candidates(scores, 5).tolist()), [0, 1, 2, 3])
+
+    def test_lexical_candidates_without_matches(self):
+        scores = self.crop_index.lexical.score(tokenize('grasshopper'))
+        self.assertIsNone(self.crop_index.lexical_candidates(scores, 5))
+
+    def lexical_match(self, query):
+        terms = tokenize(query)
+        return self.crop_index.lexical_match(terms, self.crop_index.lexical.score(terms), margin=2.0)
+
+    def test_lexical_match_on_a_full_disease_name(self):
+        match = self.lexical_match('tomato early blight')
+        self.assertEqual((match.group, match.exact), (0, True))
+        self.assertEqual(self.lexical_match('bacterial wilt').exact, True)
+
+    def test_lexical_match_on_part_of_a_disease_name_is_not_exact(self):
+        for query in ('wilt', 'tomato early'):
+            match = self.lexical_match(query)
+            self.assertIsNotNone(match, query)
+            self.assertFalse(match.exact, query)
+
+    def test_lexical_match_needs_a_clear_winner(self):
+        self.assertIsNone(self.lexical_match('blight'))       # Early and Late Blight
+        self.assertIsNone(self.lexical_match('tomato'))       # Only the crop name
+        self.assertIsNone(self.lexical_match('wilt leaves'))  # Not all terms in the name
+
+
+class CacheTests(SimpleTestCase):
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([key for key, _ in cache.items()], ['a', 'c'])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+
+    def test_lru_cache_expires_entries(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        with mock.patch('disease_detection.caches.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_get_or_compute_computes_once(self):
+        cache = LRUCache()
+        compute = mock.Mock(return_value=42)
+        self.assertEqual(cache.get_or_compute('k', compute), 42)
+        self.assertEqual(cache.get_or_compute('k', compute), 42)
+        compute.assert_called_once_with()
+
+    def test_encoding_cache_shares_normalized_texts(self):
+        cache = EncodingCache()
+        encoder = FakeEncoder()
+        first = cache.encode(encoder, 'plant wilting suddenly')
+        second = cache.encode(encoder, '  Plant   WILTING suddenly ')
+
+        self.assertIs(first, second)
+        self.assertEqual(len(encoder.calls), 1)
+        self.assertFalse(first.flags.writeable)
+
+    def test_encoding_cache_encode_many_encodes_misses_once(self):
+        cache = EncodingCache()
+        encoder = FakeEncoder()
+        cache.encode(encoder, 'plant wilting suddenly')
+        embeddings = cache.encode_many(encoder, [
+            'plant wilting suddenly', 'rings or lesions on leaves', 'Rings or lesions on leaves',
+        ])
+
+        self.assertEqual(encoder.calls[1:], [['rings or lesions on leaves']])
+        np.testing.assert_array_equal(embeddings[1], embeddings[2])
+        np.testing.assert_array_equal(embeddings[0], AXES[2])
+
+    def test_translation_cache_translates_only_misses(self):
+        cache = TranslationCache()
+        cache.set('hi', 'पत्ते पीले', 'yellow leaves')
+        translate_batch = mock.Mock(side_effect=lambda texts: [f'EN {text}' for text in texts])
+
+        result = cache.translate_many('hi', ['पत्ते पीले', 'तना सूखा', 'तना सूखा'], translate_batch)
+
+        self.assertEqual(result, ['yellow leaves', 'EN तना सूखा', 'EN तना सूखा'])
+        translate_batch.assert_called_once_with(['तना सूखा'])
+
+    def test_translation_cache_persists_and_reloads(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'translations.json')
+        with mock.patch('disease_detection.caches.atexit.register'):
+            cache = TranslationCache(path=path, persist_every=2)
+            cache.set('mr', 'पाने पिवळी', 'yellow leaves')
+            self.assertFalse(os.path.exists(path))
+            cache.set('mr', 'खोड कुजले', 'rotten stem')
+
+            reloaded = TranslationCache(path=path)
+        self.assertEqual(reloaded.get('mr', 'पाने पिवळी'), 'yellow leaves')
+
+    def test_translation_cache_saves_once_per_persist_every_under_concurrency(self):
+        with mock.patch('disease_detection.caches.atexit.register'), \
+                mock.patch.object(TranslationCache, 'load'):
+            cache = TranslationCache(path='unused.json', persist_every=10)
+        saves = []
+        cache.save = lambda: saves.append(1)
+
+        def add(worker):
+            for n in range(100):
+                cache.set('hi', f'{worker} {n}', 'x')
+
+        threads = [threading.Thread(target=add, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(saves), 80)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_calls_are_batched(self):
+        batch_sizes = []
+
+        def double(items):
+            batch_sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50)
+        self.addCleanup(batcher.close)
+        results = {}
+        threads = [
+            threading.Thread(target=lambda n=n: results.__setitem__(n, batcher.submit(n)))
+            for n in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {n: n * 2 for n in range(8)})
+        self.assertEqual(sum(batch_sizes), 8)
+        self.assertLess(len(batch_sizes), 8)
+
+    def test_close_stops_the_worker_and_later_calls_run_directly(self):
+        batcher = MicroBatcher(lambda items: [item + 1 for item in items], name='test')
+        self.assertEqual(batcher.submit(1), 2)
+        worker = batcher._worker
+
+        batcher.close()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(batcher.submit(2), 3)
+        self.assertIs(batcher._worker, worker)  # No new thread after close
+
+    def test_close_before_first_call_starts_no_thread(self):
+        batcher = MicroBatcher(lambda items: items)
+        batcher.close()
+        self.assertEqual(batcher.submit('x'), 'x')
+        self.assertIsNone(batcher._worker)
+
+
+class FakeModel:
+    """Module exposing parameters() so ModelPool can size it"""
+
+    def __init__(self, n_bytes):
+        self.tensor = mock.Mock(numel=mock.Mock(return_value=n_bytes), element_size=mock.Mock(return_value=1))
+        self.closed = False
+
+    def parameters(self):
+        return [self.tensor]
+
+    def close(self):
+        self.closed = True
+
+
+class ModelPoolTests(SimpleTestCase):
+    def test_admit_evicts_least_recently_used(self):
+        pool = ModelPool(budget_bytes=250)
+        self.assertEqual(pool.admit('a', FakeModel(100)), [])
+        self.assertEqual(pool.admit('b', FakeModel(100)), [])
+        pool.touch('a')
+
+        self.assertEqual(pool.admit('c', FakeModel(100)), ['b'])
+        self.assertEqual(pool.stats()['lru_order'], ['a', 'c'])
+
+    def test_admit_never_evicts_the_new_model(self):
+        pool = ModelPool(budget_bytes=150)
+        pool.admit('a', FakeModel(100))
+        self.assertEqual(pool.admit('big', FakeModel(500)), ['a'])
+        self.assertEqual(pool.stats()['lru_order'], ['big'])
+
+    def test_registry_reloads_evicted_models(self):
+        pool = ModelPool(budget_bytes=150)
+        registry = ModelRegistry(pool)
+        loads = []
+        for name in ('a', 'b'):
+            registry.register(name, lambda name=name: loads.append(name) or FakeModel(100), pooled=True)
+
+        first = registry.get('a')
+        registry.get('b')
+        self.assertTrue(first.closed)
+        self.assertFalse(registry.is_loaded('a'))
+        registry.get('a')
+        self.assertEqual(loads, ['a', 'b', 'a'])
+
+
+class RomanizedNormalizerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.normalizer = RomanizedNormalizer.load()
+
+    def test_hindi_postpositions_move_before_their_noun(self):
+        result = self.normalizer.normalize('patte pe bhure daag')
+        self.assertEqual((result.text, result.lang), ('brown spots on leaves', 'hi'))
+
+    def test_clauses_are_reordered_separately(self):
+        result = self.normalizer.normalize('patte pe bhure daag aur tane par kaale dhabbe')
+        self.assertEqual(result.text, 'brown spots on leaves and black spots on stem')
+
+    def test_marathi_suffixed_postposition(self):
+        result = self.normalizer.normalize('panavar pivle thipke')
+        self.assertEqual((result.text, result.lang), ('yellow spots on leaves', 'mr'))
+
+    def test_multiword_phrases_and_spelling_variants(self):
+        self.assertEqual(self.normalizer.normalize('pate pile pad rahe hain').text, 'leaves turning yellow')
+
+    def test_code_mixed_english_is_kept(self):
+        self.assertEqual(self.normalizer.normalize('patte pe brown spots').text, 'brown spots on leaves')
+
+    def test_english_and_ambiguous_words_are_left_alone(self):
+        for text in ('yellow spots on leaves', 'pile of leaves', 'पत्ते पीले'):
+            result = self.normalizer.normalize(text)
+            self.assertEqual((result.text, result.lang), (text, None))
+
+
+class LanguageIdentifierTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.identifier = LanguageIdentifier()
+
+    def test_ascii_is_english(self):
+        self.assertEqual(self.identifier.detect('yellow leaves'), 'en')
+        self.assertEqual(self.identifier.detect(''), 'en')
+
+    def test_clear_hindi_and_marathi(self):
+        self.assertEqual(self.identifier.detect('पत्ते पीले हो रहे हैं'), 'hi')
+        self.assertEqual(self.identifier.detect('पानांवर तपकिरी ठिपके आहेत'), 'mr')
+        self.assertEqual(self.identifier.detect('पानांवर तपकिरी ठिपके आहेत', preferred='hi'), 'mr')
+
+    def test_short_text_is_decided_by_marker_words(self):
+        # The n-gram model alone says Marathi by a wide margin
+        self.assertEqual(self.identifier.detect('पौधे मुरझा'), 'hi')
+        self.assertEqual(self.identifier.detect('पौधे मुरझा', preferred='mr'), 'hi')
+        # ... and barely prefers Marathi here
+        self.assertEqual(self.identifier.detect('पानावर डाग'), 'mr')
+        self.assertEqual(self.identifier.detect('पानावर डाग', preferred='hi'), 'mr')
+        self.assertEqual(self.identifier.detect('पत्ते पीले'), 'hi')
+
+    def test_short_undecided_text_uses_the_preferred_language(self):
+        self.assertEqual(self.identifier.detect('रोग'), 'hi')
+        self.assertEqual(self.identifier.detect('रोग', preferred='mr'), 'mr')
+        self.assertEqual(self.identifier.detect('रोग', preferred='en'), 'hi')
+
+
+class InferenceServerTests(SimpleTestCase):
+    def setUp(self):
+        self.encoder = FakeEncoder()
+        registry = ModelRegistry(ModelPool())
+        registry.register(ENCODER, lambda: self.encoder)
+        registry.register(TRANSLATOR_HI_EN, lambda: lambda texts: [
+            {'translation_text': text.upper()} for text in ([texts] if isinstance(texts, str) else texts)
+        ])
+        registry.register(TRANSLATOR_MR_EN, mock.Mock(side_effect=OSError('Model files are missing')))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        url = f'unix://{directory}/inference.sock'
+        server = make_server(url, registry)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = InferenceClient(url, timeout=5.0)
+
+    def test_encode_and_translate_round_trip(self):
+        encoder = RemoteEncoder(self.client)
+        embeddings = encoder.encode(['sudden wilting of the whole plant', 'water soaked lesions on leaves'])
+        np.testing.assert_array_equal(embeddings, AXES[[2, 1]])
+        np.testing.assert_array_equal(encoder.encode('sudden wilting of the whole plant'), AXES[2])
+
+        translator = RemoteTranslator(self.client, TRANSLATOR_HI_EN)
+        self.assertEqual(translator(['a', 'b']), [{'translation_text': 'A'}, {'translation_text': 'B'}])
+        self.assertIn(ENCODER, self.client.health()['models'])
+
+    def test_errors_become_inference_server_errors(self):
+        with self.assertRaisesRegex(InferenceServerError, 'Unknown encoder'):
+            self.client.encode(['spots'], 'nonexistent')
+        with self.assertRaisesRegex(InferenceServerError, 'Unknown translation model'):
+            self.client.translate('nonexistent', ['spots'])
+        with self.assertRaisesRegex(InferenceServerError, 'failed to load'):
+            self.client.translate(TRANSLATOR_MR_EN, ['spots'])
+
+
+class SplitClausesTests(SimpleTestCase):
+    def test_splits_on_punctuation_and_connectives(self):
+        self.assertEqual(
+            split_clauses('leaves yellow, stem has brown spots and fruit is rotting'),
+            ['leaves yellow', 'stem has brown spots', 'fruit is rotting'],
+        )
+
+    def test_short_fragments_join_the_previous_clause(self):
+        self.assertEqual(split_clauses('brown spots on leaves, yellow'),
+                         ['brown spots on leaves yellow'])
+
+    def test_limits(self):
+        self.assertEqual(split_clauses(''), [])
+        self.assertEqual(len(split_clauses('a b. c d. e f. g h', max_clauses=2)), 2)
+
+
+class ArtifactTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.artifact_dir = os.path.join(self.directory, 'artifact')
+        self.pickle_path = os.path.join(self.directory, 'embeddings.pkl')
+        kb_json = os.path.join(self.directory, 'kb.json')
+        with open(kb_json, 'w', encoding='utf-8') as f:
+            json.dump(DISEASES, f)
+        with open(self.pickle_path, 'wb') as f:
+            # The pickle only knows the first two diseases
+            pickle.dump(embeddings_data(DISEASES[:2]), f)
+        for name, value in (('KB_JSON', kb_json), ('KB_LOCALIZED_JSON', os.path.join(self.directory, 'none.json'))):
+            patcher = mock.patch.object(kb_index, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def save(self, **kwargs):
+        embeddings = np.stack([VECTORS[symptom] for disease in DISEASES for symptom in disease['symptoms']])
+        return save_artifact(self.artifact_dir, DISEASES, embeddings, 'fake-model', **kwargs)
+
+    def load(self, **kwargs):
+        _, index = load_kb_and_embeddings(artifact_dir=self.artifact_dir, pickle_path=self.pickle_path, **kwargs)
+        return index
+
+    def test_saved_artifact_round_trips(self):
+        self.save()
+        index = self.load()
+        self.assertEqual(len(index), 6)
+        np.testing.assert_allclose(index.get('tomato').score(AXES[2])[4], 1.0, rtol=1e-6)
+        self.assertEqual(os.listdir(self.directory).count('artifact.tmp'), 0)
+
+    def test_ivf_lists_are_loaded_only_when_selected(self):
+        manifest = self.save(ivf_min_rows=1, ivf_lists=2)
+        self.assertEqual(manifest['ivf']['tomato']['lists'], 2)
+
+        self.assertEqual(self.load().get('tomato').vector_index.kind, 'exact')
+        crop_index = self.load(vector_index='ivf', nprobe=2).get('tomato')
+        self.assertEqual(crop_index.vector_index.kind, 'ivf')
+        np.testing.assert_allclose(crop_index.score(AXES[2])[4], 1.0, rtol=1e-6)
+
+    def test_reduced_artifact_scores_like_the_full_one(self):
+        manifest = self.save(dtype='int8')
+        self.assertEqual(manifest['dtype'], 'int8')
+        crop_index = self.load().get('tomato')
+        self.assertIsInstance(crop_index.embeddings, QuantizedMatrix)
+        scores = crop_index.score(AXES[2])
+        self.assertEqual(int(np.argmax(scores)), 4)
+        np.testing.assert_allclose(scores[4], 1.0, atol=0.01)
+
+    def test_falls_back_to_the_pickle_without_a_usable_artifact(self):
+        self.assertEqual(len(self.load()), 4)
+        self.save()
+        os.remove(os.path.join(self.artifact_dir, kb_index.EMBEDDINGS_FILE))
+        self.assertEqual(len(self.load()), 4)
+
+    def test_artifact_is_required_without_a_pickle(self):
+        with self.assertRaises(Exception):
+            load_kb_and_embeddings(artifact_dir=self.artifact_dir, pickle_path=None)
+
+    def test_waits_for_an_artifact_being_swapped_in(self):
+        self.save()
+        _, old_dir = swap_dirs(self.artifact_dir)
+        os.rename(self.artifact_dir, old_dir)
+        self.assertFalse(wait_for_swap(self.artifact_dir, timeout=0.1))
+
+        finish = threading.Timer(0.2, os.rename, (old_dir, self.artifact_dir))
+        finish.start()
+        self.addCleanup(finish.join)
+        self.assertEqual(len(self.load()), 6)  # The artifact, not the pickle
+
+    def test_swap_that_never_finishes_is_transient(self):
+        self.save()
+        _, old_dir = swap_dirs(self.artifact_dir)
+        os.rename(self.artifact_dir, old_dir)
+        with mock.patch.object(kb_index, 'wait_for_swap', return_value=False):
+            with self.assertRaises(TransientLoadError):
+                self.load()
+
+    def test_read_spanning_a_rebuild_is_retried(self):
+        self.save()
+        from_artifact = SymptomIndex.from_artifact
+        reads = []
+
+        def rebuild_during_first_read(*args):
+            index = from_artifact(*args)
+            reads.append(index)
+            if len(reads) == 1:
+                self.save()
+            return index
+
+        with mock.patch.object(SymptomIndex, 'from_artifact', side_effect=rebuild_during_first_read):
+            index = self.load()
+        self.assertEqual(len(reads), 2)
+        self.assertIs(index, reads[1])
+
+    def test_artifact_that_keeps_changing_is_transient_not_the_pickle(self):
+        self.save()
+        with mock.patch.object(kb_index, 'artifact_build_id', side_effect=lambda _: object()):
+            with self.assertRaises(TransientLoadError):
+                self.load()
+
+
+class BuildKBTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.artifact_dir = os.path.join(self.directory, 'artifact')
+        self.cache_path = os.path.join(self.directory, 'cache.npz')
+        self.encoder = FakeEncoder()
+        self.load_encoder = mock.Mock(return_value=self.encoder)
+
+    def build(self, diseases, **kwargs):
+        return build_kb(diseases, self.artifact_dir, 'fake-model', self.load_encoder,
+                        cache_path=self.cache_path, batch_size=4, **kwargs)
+
+    def test_only_new_symptoms_are_encoded(self):
+        _, stats = self.build(DISEASES)
+        self.assertEqual((stats['encoded'], stats['reused']), (6, 0))
+        self.assertEqual([len(batch) for batch in self.encoder.calls], [4, 2])
+
+        # Only treatments changed: the encoder is not even loaded
+        self.load_encoder.reset_mock()
+        _, stats = self.build([dict(d, treatment='Spray') for d in DISEASES])
+        self.assertEqual((stats['encoded'], stats['reused']), (0, 6))
+        self.load_encoder.assert_not_called()
+
+        # One symptom replaced: one encode, and its old entry leaves the cache
+        edited = DISEASES[:2] + [dict(DISEASES[2], symptoms=['plant wilting suddenly', DISEASES[2]['symptoms'][1]])]
+        _, stats = self.build(edited)
+        self.assertEqual((stats['encoded'], stats['reused'], stats['pruned']), (1, 5, 1))
+        self.assertEqual(self.encoder.calls[-1], ['plant wilting suddenly'])
+        self.assertEqual(len(load_embedding_cache(self.cache_path)), 6)
+
+    def test_full_rebuild_ignores_the_cache(self):
+        self.build(DISEASES)
+        _, stats = self.build(DISEASES, full=True)
+        self.assertEqual(stats['encoded'], 6)
+
+    def test_artifact_matches_the_kb(self):
+        manifest, _ = self.build(DISEASES, dtype='float16')
+        self.assertEqual((manifest['rows'], manifest['dtype'], manifest['model']), (6, 'float16', 'fake-model'))
+        index = SymptomIndex.from_artifact(self.artifact_dir)
+        self.assertEqual(index.get('tomato').symptom_texts[4], 'sudden wilting of the whole plant')
+
+
+class PhrasingTests(SimpleTestCase):
+    def test_phrasings_become_rows_of_their_disease(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'phrasings.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'crop_name': 'tomato', 'disease_name': 'TOMATO BACTERIAL WILT', 'hi': ['पौधा अचानक मुरझा गया', ' ']},
+                {'crop_name': 'Tomato', 'disease_name': 'Tomato Mosaic', 'mr': ['पाने आकसतात']},
+            ], f, ensure_ascii=False)
+
+        phrasings, unmatched = load_phrasings(path, DISEASES)
+        self.assertEqual(phrasings, [[], [], ['पौधा अचानक मुरझा गया']])
+        self.assertEqual(unmatched, ['Tomato / Tomato Mosaic'])
+
+        manifest, stats = build_kb(DISEASES, os.path.join(directory, 'artifact'), 'fake-model',
+                                   FakeEncoder, cache_path=os.path.join(directory, 'cache.npz'),
+                                   phrasings=phrasings)
+        self.assertEqual((manifest['rows'], manifest['phrasings'], stats['phrasings']), (7, 1, 1))
+        crop_index = SymptomIndex.from_artifact(os.path.join(directory, 'artifact')).get('tomato')
+        self.assertEqual(crop_index.symptom_texts[-1], 'पौधा अचानक मुरझा गया')
+        self.assertEqual(crop_index.disease_ids[-1], 2)
+
+
+class LocalizationTests(SimpleTestCase):
+    def setUp(self):
+        self.disease = dict(
+            DISEASES[2], treatment='Remove wilted plants', prevention='Rotate crops',
+            causes=['Soil bacteria', 'Infected seedlings'],
+        )
+        self.hindi = {'Remove wilted plants': 'मुरझाए पौधे हटाएँ', 'Soil bacteria': 'मिट्टी के जीवाणु'}
+
+    def test_localize_falls_back_to_english_per_text(self):
+        localized = Localizations({'hi': self.hindi}).localize(self.disease, 'hi')
+        self.assertEqual(localized['treatment'], 'मुरझाए पौधे हटाएँ')
+        self.assertEqual(localized['prevention'], 'Rotate crops')
+        self.assertEqual(localized['causes'], ['मिट्टी के जीवाणु', 'Infected seedlings'])
+        self.assertEqual(self.disease['treatment'], 'Remove wilted plants')  # A copy
+        self.assertIs(Localizations({'hi': self.hindi}).localize(self.disease, 'mr'), self.disease)
+
+    def test_language_code(self):
+        self.assertEqual(language_code('Marathi'), 'mr')
+        self.assertEqual(language_code('hi'), 'hi')
+        self.assertEqual(language_code(None), 'en')
+        self.assertEqual(language_code('tamil'), 'en')
+
+    def test_build_translates_only_new_texts(self):
+        translate = mock.Mock(side_effect=lambda texts: [f'hi:{text}' for text in texts])
+        localizations, stats = build_localizations([self.disease], {'hi': translate}, batch_size=2)
+        texts = sorted({'Remove wilted plants', 'Rotate crops', 'Soil bacteria', 'Infected seedlings',
+                        'Tomato Bacterial Wilt', 'High'})
+        self.assertEqual(stats['hi'], {'translated': 6, 'reused': 0, 'pruned': 0})
+        self.assertEqual(translate.call_count, 3)
+        self.assertEqual(localizations.coverage([self.disease]), {'hi': 1.0})
+        self.assertEqual(sorted(localizations.translations['hi']), texts)
+
+        translate.reset_mock()
+        edited = dict(self.disease, prevention='Rotate crops every season')
+        existing = Localizations({'hi': localizations.translations['hi'], 'mr': {'High': 'जास्त'}})
+        localizations, stats = build_localizations([edited], {'hi': translate}, existing)
+        translate.assert_called_once_with(['Rotate crops every season'])
+        self.assertEqual(stats['hi'], {'translated': 1, 'reused': 5, 'pruned': 1})
+        self.assertEqual(localizations.translations['mr'], {'High': 'जास्त'})  # Not rebuilt, kept
+
+    def test_save_and_load_round_trip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'localized.json')
+        self.assertEqual(load_localizations(path).languages, [])
+        save_localizations(path, Localizations({'hi': self.hindi}), {'hi': 'fake-model'})
+        self.assertEqual(load_localizations(path).translations, {'hi': self.hindi})
+
+    def test_localize_kb_command_reuses_existing_translations(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        kb_json = os.path.join(directory, 'kb.json')
+        output = os.path.join(directory, 'localized.json')
+        with open(kb_json, 'w', encoding='utf-8') as f:
+            json.dump([self.disease], f)
+        complete, _ = build_localizations([self.disease], {'hi': lambda texts: [f'hi:{t}' for t in texts]})
+        save_localizations(output, complete, {'hi': 'fake-model'})
+
+        # Everything is already translated, so no translation model is loaded
+        out = io.StringIO()
+        call_command('localize_kb', kb=kb_json, output=output, languages=['hi'], stdout=out)
+        self.assertIn('hi: 0 translated, 6 reused', out.getvalue())
+        self.assertEqual(load_localizations(output).translations, complete.translations)
+
+
+class KBServiceTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.kb_json = os.path.join(directory, 'kb.json')
+        self.write(DISEASES[:1])
+
+    def write(self, diseases):
+        with open(self.kb_json, 'w', encoding='utf-8') as f:
+            json.dump(diseases, f)
+
+    def load(self):
+        with open(self.kb_json, 'r', encoding='utf-8') as f:
+            return build_index(json.load(f))
+
+    def wait_for_reloads(self, kb, reloads):
+        deadline = time.monotonic() + 5
+        while kb.reloads + kb.failed_reloads < reloads and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_reloads_in_the_background_when_a_watched_file_changes(self):
+        kb = KBService(self.load, [self.kb_json], check_interval=0)
+        before = kb.current()
+        self.assertIs(kb.current(), before)  # Unchanged files: no reload
+
+        self.write(DISEASES)
+        kb.current()
+        self.wait_for_reloads(kb, 1)
+        self.assertEqual(kb.reloads, 1)
+        self.assertEqual(len(kb.current().diseases), 3)
+
+    def test_failed_reload_keeps_the_previous_index(self):
+        kb = KBService(self.load, [self.kb_json], check_interval=0)
+        before = kb.current()
+        with open(self.kb_json, 'w', encoding='utf-8') as f:
+            f.write('not json')
+        kb.current()
+        self.wait_for_reloads(kb, 1)
+        self.assertEqual(kb.failed_reloads, 1)
+        self.assertIs(kb.current(), before)
+        self.assertIsNotNone(kb.stats()['last_error'])
+
+
+class ModelRegistryTests(SimpleTestCase):
+    @override_settings(DISEASE_DETECTION={'MODEL_LOAD_RETRY_SECONDS': 0.0})
+    def test_transient_load_errors_are_retried(self):
+        loader = mock.Mock(side_effect=[TransientLoadError('rebuilding'), 'kb'])
+        registry = ModelRegistry()
+        registry.register(KB, loader)
+        self.assertIsNone(registry.get(KB))
+        self.assertEqual(registry.get(KB), 'kb')
+
+    def test_other_load_errors_are_not_retried(self):
+        loader = mock.Mock(side_effect=[OSError('missing'), 'kb'])
+        registry = ModelRegistry()
+        registry.register(KB, loader)
+        self.assertIsNone(registry.get(KB))
+        self.assertIsNone(registry.get(KB))
+        self.assertEqual(loader.call_count, 1)
+
+
+def clustered_rows(n_per_cluster=20, dim=8, seed=0):
+    """Unit rows in three tight clusters around the first three axes"""
+    rng = np.random.default_rng(seed)
+    rows = np.concatenate([
+        np.eye(dim, dtype=np.float32)[axis] + 0.05 * rng.standard_normal((n_per_cluster, dim))
+        for axis in range(3)
+    ]).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+class VectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = clustered_rows()
+        self.query = self.rows[5] + 0.01
+        self.query /= np.linalg.norm(self.query)
+
+    def test_spherical_kmeans_finds_the_clusters(self):
+        centroids = spherical_kmeans(self.rows, 3)
+        np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+        labels = assign_lists(self.rows, centroids)
+        for cluster in range(3):
+            self.assertEqual(len(set(labels[cluster * 20:(cluster + 1) * 20])), 1)
+        self.assertEqual(len(set(labels)), 3)
+
+    def test_ivf_only_scores_probed_lists(self):
+        ivf = IVFIndex.build(self.rows, n_lists=3, nprobe=1)
+        scores = ivf.scores(self.query)
+        self.assertEqual(sorted(np.flatnonzero(scores != UNSEARCHED_SCORE)), list(range(20)))
+
+        rows, best = ivf.search(self.query, 5)
+        exact_rows, exact_best = ExactIndex(self.rows).search(self.query, 5)
+        self.assertEqual(rows.tolist(), exact_rows.tolist())
+        np.testing.assert_allclose(best, exact_best, rtol=1e-6)
+
+    def test_probing_every_list_is_exact(self):
+        ivf = IVFIndex.build(self.rows, n_lists=3, nprobe=3)
+        np.testing.assert_allclose(ivf.scores(self.query), ExactIndex(self.rows).scores(self.query), rtol=1e-6)
+
+    def test_lists_round_trip_through_arrays(self):
+        ivf = IVFIndex.build(self.rows, n_lists=3, nprobe=1)
+        restored = IVFIndex(self.rows, nprobe=1, **ivf.to_arrays())
+        np.testing.assert_array_equal(restored.scores(self.query), ivf.scores(self.query))
+
+
+class QuantizationTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = clustered_rows()
+        self.query = self.rows[25]
+
+    def test_int8_matrix_scores_like_float32(self):
+        codes, scales = quantize(self.rows, 'int8')
+        self.assertEqual(codes.dtype, np.int8)
+        matrix = QuantizedMatrix(codes, scales, block_rows=7)  # Several blocks
+        np.testing.assert_allclose(matrix @ self.query, self.rows @ self.query, atol=0.01)
+        np.testing.assert_allclose(matrix @ self.rows[:3].T, self.rows @ self.rows[:3].T, atol=0.01)
+        self.assertEqual(matrix.nbytes, codes.nbytes + scales.nbytes)
+
+    def test_slices_share_storage_and_row_lists_dequantize(self):
+        matrix = QuantizedMatrix(*quantize(self.rows, 'int8'))
+        view = matrix[20:40]
+        self.assertIsInstance(view, QuantizedMatrix)
+        self.assertTrue(np.shares_memory(view.codes, matrix.codes))
+        np.testing.assert_allclose(view @ self.query, (matrix @ self.query)[20:40])
+
+        rows = matrix[[0, 25]]
+        self.assertEqual(rows.dtype, np.float32)
+        np.testing.assert_allclose(rows, self.rows[[0, 25]], atol=0.01)
+
+    def test_int8_codes_need_scales(self):
+        with self.assertRaises(ValueError):
+            QuantizedMatrix(np.zeros((2, 2), dtype=np.int8))
+
+    def test_pca_keeps_scores_of_a_low_rank_kb(self):
+        # The rows span three directions, so three components keep almost everything
+        codes, scales, projection, kept = compress_embeddings(self.rows, 'float16', pca_dim=3)
+        self.assertEqual(codes.shape, (60, 3))
+        self.assertIsNone(scales)
+        self.assertGreater(kept, 0.95)
+        scores = QuantizedMatrix(codes) @ project(self.query, projection)
+        np.testing.assert_allclose(scores, self.rows @ self.query, atol=0.05)
+
+
+class TimingTests(SimpleTestCase):
+    def test_stage_timer_accumulates_repeated_stages(self):
+        clock = iter([0.0, 0.0, 0.002, 0.005, 0.006, 0.010])
+        with mock.patch('time.perf_counter', lambda: next(clock)):
+            timer = StageTimer()
+            timer.start('encode')      # 0.000
+            timer.start('similarity')  # 0.002
+            timer.start('encode')      # 0.005
+            total = timer.stop()       # 0.006
+            fields = timer.fields()
+        self.assertAlmostEqual(total, 0.006)
+        self.assertEqual(fields, {'encode': 3.0, 'similarity': 3.0, 'total': 6.0})
+        self.assertEqual(timer.server_timing(), 'encode;dur=3.0, similarity;dur=3.0, total;dur=6.0')
+
+    def test_latency_stats_keep_a_rolling_window(self):
+        stats = LatencyStats(window=3)
+        for ms in (100.0, 1.0, 2.0, 3.0):
+            stats.add({'encode': ms})
+        percentiles = stats.percentiles('encode')['encode']
+        self.assertEqual(percentiles['count'], 4)
+        self.assertEqual((percentiles['p50'], percentiles['max']), (2.0, 3.0))
+        self.assertEqual(stats.percentiles('missing'), {})
+
+
+class MeanPoolTests(SimpleTestCase):
+    def test_padding_positions_are_ignored(self):
+        tokens = np.array([
+            [[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]],
+            [[5.0, 6.0], [100.0, 100.0], [100.0, 100.0]],
+        ], dtype=np.float32)
+        mask = np.array([[1, 1, 0], [1, 0, 0]], dtype=np.int64)
+        np.testing.assert_allclose(mean_pool(tokens, mask), [[2.0, 3.0], [5.0, 6.0]])
+
+    def test_fully_padded_row_is_zero_not_nan(self):
+        tokens = np.ones((1, 2, 3), dtype=np.float32)
+        pooled = mean_pool(tokens, np.zeros((1, 2), dtype=np.int64))
+        np.testing.assert_array_equal(pooled, np.zeros((1, 3)))
+
+
+class ViewTests(SimpleTestCase):
+    def setUp(self):
+        self.kb = KBService(build_index, [], check_interval=None)
+        self.encoder = FakeEncoder()
+        registry = ModelRegistry()
+        registry.register(KB, lambda: self.kb)
+        registry.register(ENCODER, lambda: self.encoder)
+        for patcher in (mock.patch.object(views, 'registry', registry),
+                        mock.patch.object(views, 'encoding_cache', EncodingCache())):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.factory = APIRequestFactory()
+
+    def post(self, view, data, user=None):
+        request = self.factory.post('/', data, format='json')
+        if user is not None:
+            force_authenticate(request, user=user)
+        return view.as_view()(request)
+
+    def test_clarification_follow_up_uses_the_token(self):
+        response = self.post(views.DetectDiseaseView, {
+            'crop': 'tomato', 'symptom_text': 'rings or lesions on leaves',
+        })
+        self.assertEqual(response.data['type'], 'clarification_needed')
+        self.assertEqual([c['disease_name'] for c in response.data['candidates']],
+                         ['Tomato Early Blight', 'Tomato Late Blight'])
+        late_blight = next(n for n, option in enumerate(response.data['followup_questions'])
+                           if option == 'water soaked lesions on leaves')
+        encodes = len(self.encoder.calls)
+
+        followup = self.post(views.DetectDiseaseView, {
+            'crop': 'tomato', 'symptom_text': 'rings or lesions on leaves',
+            'followup_token': response.data['followup_token'], 'followup_answer': late_blight,
+        })
+        self.assertEqual(followup.data['type'], 'diagnosis')
+        self.assertEqual(followup.data['disease_identified']['disease_name'], 'Tomato Late Blight')
+        self.assertEqual(followup.data['disease_identified']['match_type'], 'followup')
+        self.assertEqual(len(self.encoder.calls), encodes)  # No model work
+
+    def test_follow_up_token_survives_a_kb_reload(self):
+        response = self.post(views.DetectDiseaseView, {
+            'crop': 'tomato', 'symptom_text': 'rings or lesions on leaves',
+        })
+        answer = response.data['followup_questions'].index('water soaked lesions on leaves')
+        data = {
+            'crop': 'tomato', 'symptom_text': 'rings or lesions on leaves',
+            'followup_token': response.data['followup_token'], 'followup_answer': answer,
+        }
+
+        # Disease ids shift: Late Blight moves from id 1 to id 0
+        self.kb.loader = lambda: build_index(DISEASES[1:])
+        self.kb.reload()
+        followup = self.post(views.DetectDiseaseView, data)
+        self.assertEqual(followup.data['disease_identified']['disease_name'], 'Tomato Late Blight')
+
+        # Late Blight gone: the token is stale and the text is diagnosed again
+        self.kb.loader = lambda: build_index([DISEASES[0], DISEASES[2]])
+        self.kb.reload()
+        followup = self.post(views.DetectDiseaseView, data)
+        self.assertEqual(followup.data['type'], 'diagnosis')
+        self.assertEqual(followup.data['disease_identified']['disease_name'], 'Tomato Early Blight')
+
+    def test_partial_disease_name_is_not_a_confident_diagnosis(self):
+        response = self.post(views.DetectDiseaseView, {'crop': 'tomato', 'symptom_text': 'wilt'})
+        self.assertEqual(response.data['type'], 'clarification_needed')
+
+        response = self.post(views.DetectDiseaseView, {'crop': 'tomato', 'symptom_text': 'bacterial wilt'})
+        self.assertEqual(response.data['type'], 'diagnosis')
+        self.assertEqual(response.data['disease_identified']['confidence'], 1.0)
+        self.assertEqual(response.data['disease_identified']['match_type'], 'lexical_exact')
+        self.assertNotIn('Confidence', response.data['message'])
+
+    def test_failing_remote_translator_still_diagnoses(self):
+        # Nothing listens on the discard port, so every translation raises InferenceServerError
+        client = InferenceClient('http://127.0.0.1:9', timeout=1.0)
+        for name in (TRANSLATOR_HI_EN, TRANSLATOR_MR_EN):
+            views.registry.register(name, lambda: RemoteTranslator(client, 'hi_en'))
+        patcher = mock.patch.object(views, 'translation_cache', TranslationCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        data = {'crop': 'tomato', 'symptom_text': 'पौधा अचानक मुरझा गया'}
+
+        response = self.post(views.DetectDiseaseView, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['type'], 'diagnosis')
+        self.assertEqual(response.data['disease_identified']['disease_name'], 'Tomato Bacterial Wilt')
+
+        response = self.post(views.DetectDiseaseStreamView, data)
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('event: diagnosis', body)
+        self.assertIn('Tomato Bacterial Wilt', body)
+
+    def test_cross_crop_diagnosis_and_follow_up_action(self):
+        self.kb.loader = lambda: build_index(DISEASES + [POTATO_BLACK_SCURF])
+        self.kb.reload()
+
+        response = self.post(views.DetectDiseaseView, {'symptom_text': 'scurf on tubers'})
+        self.assertEqual(response.data['type'], 'diagnosis')
+        identified = response.data['disease_identified']
+        self.assertEqual((identified['crop'], identified['disease_name']), ('Potato', 'Potato Black Scurf'))
+
+        # The client may leave the crop out of the follow-up too
+        response = self.post(views.DetectDiseaseView, {
+            'action': 'treatment', 'disease_name': identified['disease_name'],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Treat seed tubers', response.data['message'])
+
+    def test_action_without_a_crop_needs_an_unambiguous_disease(self):
+        blight = dict(DISEASES[0], crop_name='Potato')
+        self.kb.loader = lambda: build_index(DISEASES + [blight])
+        self.kb.reload()
+        self.assertIsNone(self.kb.current().crop_of('tomato early blight'))
+        response = self.post(views.DetectDiseaseView, {'action': 'treatment', 'disease_name': 'Tomato Early Blight'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(DISEASE_DETECTION={'RETRIEVAL_MODE': 'multilingual'})
+    def test_multilingual_mode_matches_without_translating(self):
+        # Hindi phrasing stored as a row of Bacterial Wilt in the multilingual KB
+        phrased = [dict(DISEASES[2], symptoms=DISEASES[2]['symptoms'] + ['पौधा अचानक मुरझा गया'])]
+        multilingual_encoder = FakeEncoder()
+        translator = mock.Mock(side_effect=AssertionError('translated'))
+        views.registry.register(KB_MULTILINGUAL, lambda: KBService(
+            lambda: build_index(DISEASES[:2] + phrased), [], check_interval=None))
+        views.registry.register(MULTILINGUAL_ENCODER, lambda: multilingual_encoder)
+        views.registry.register(TRANSLATOR_HI_EN, translator)
+        views.registry.register(TRANSLATOR_MR_EN, translator)
+
+        response = self.post(views.DetectDiseaseView, {'crop': 'tomato', 'symptom_text': 'पौधा अचानक मुरझा गया'})
+        self.assertEqual(response.data['type'], 'diagnosis')
+        self.assertEqual(response.data['disease_identified']['disease_name'], 'Tomato Bacterial Wilt')
+        self.assertEqual(response.data['input_language'], 'hi')
+        self.assertFalse(response.data['translated'])
+        self.assertEqual(multilingual_encoder.calls, [['पौधा अचानक मुरझा गया']])
+        self.assertEqual(self.encoder.calls, [])
+        translator.assert_not_called()
+
+    def test_actions_reply_in_the_preferred_language(self):
+        disease = dict(DISEASES[2], treatment='Remove wilted plants')
+        index = build_index(DISEASES[:2] + [disease])
+        index.localizations = Localizations({'hi': {
+            'Remove wilted plants': 'मुरझाए पौधे हटाएँ', 'Tomato Bacterial Wilt': 'टमाटर का जीवाणु म्लानि',
+        }})
+        self.kb.loader = lambda: index
+        self.kb.reload()
+        data = {'crop': 'tomato', 'action': 'treatment', 'disease_name': 'Tomato Bacterial Wilt'}
+
+        response = self.post(views.DetectDiseaseView, dict(data, preferred_language='hindi'))
+        self.assertIn('💊 टमाटर का जीवाणु म्लानि का उपचार:', response.data['message'])
+        self.assertIn('मुरझाए पौधे हटाएँ', response.data['message'])
+
+        # The signed-in user's profile applies when the request does not say
+        user = mock.Mock(is_authenticated=True, profile=mock.Mock(preferred_language='Hindi'))
+        response = self.post(views.DetectDiseaseView, data, user=user)
+        self.assertIn('मुरझाए पौधे हटाएँ', response.data['message'])
+
+        response = self.post(views.DetectDiseaseView, data)
+        self.assertIn('Treatment for Tomato Bacterial Wilt', response.data['message'])
+        self.assertIn('Remove wilted plants', response.data['message'])
+
+    def test_server_timing_header(self):
+        data = {'crop': 'tomato', 'symptom_text': 'plant wilting suddenly'}
+        self.assertNotIn('Server-Timing', self.post(views.DetectDiseaseView, data))
+
+        with override_settings(DISEASE_DETECTION={'SERVER_TIMING_HEADER': True}):
+            response = self.post(views.DetectDiseaseView, data)
+        stages = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertIn('encode', stages)
+        self.assertEqual(stages[-1], 'total')
+
+    def test_stream_emits_events_in_pipeline_order(self):
+        response = self.post(views.DetectDiseaseStreamView, {
+            'crop': 'tomato', 'symptom_text': 'rings or lesions on leaves',
+        })
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        events = [line[len('event: '):] for line in body.splitlines() if line.startswith('event: ')]
+        self.assertEqual(events, ['language', 'candidates', 'clarification'])
+
+    def test_stream_validation_errors_keep_their_status(self):
+        response = self.post(views.DetectDiseaseStreamView, {'crop': 'mango', 'symptom_text': 'spots'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_reports_errors_per_item(self):
+        user = mock.Mock(is_authenticated=True, profile=None)
+        response = self.post(views.BatchDetectDiseaseView, {'items': [
+            {'crop': 'tomato', 'symptom_text': 'plant wilting suddenly'},
+            {'crop': 'mango', 'symptom_text': 'plant wilting suddenly'},
+            {'crop': 'tomato', 'symptom_text': ''},
+            'not an object',
+        ]}, user=user)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(results[0]['diseases'][0]['disease_name'], 'Tomato Bacterial Wilt')
+        self.assertEqual(results[1]['error'], 'Please select a valid crop')
+        self.assertEqual(results[2]['error'], 'No symptom text provided')
+        self.assertEqual(results[3]['error'], 'Item must be an object')
+        self.assertEqual(len(self.encoder.calls), 1)
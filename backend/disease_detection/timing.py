@@ -0,0 +1,101 @@
+"""
+Per-stage latency instrumentation for the diagnosis pipeline
+
+A StageTimer records consecutive stages of one request (detect_language,
+translate, encode, similarity, aggregate, respond). Finished timers are
+logged as structured fields, optionally returned as a Server-Timing header
+and folded into process-wide rolling percentiles (see pipeline_stats).
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class StageTimer:
+    """
+    Consecutive stage timer: starting a stage ends the previous one
+
+    Stages that run more than once in a request accumulate.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}
+        self._current = None
+        self._current_start = None
+
+    def start(self, name: str):
+        """End the running stage (if any) and start `name`"""
+        now = time.perf_counter()
+        self._end(now)
+        self._current = name
+        self._current_start = now
+
+    def stop(self) -> float:
+        """End the running stage and return total elapsed seconds"""
+        now = time.perf_counter()
+        self._end(now)
+        self.finished = now
+        return now - self.started
+
+    def _end(self, now: float):
+        if self._current is not None:
+            self.stages[self._current] = self.stages.get(self._current, 0.0) + now - self._current_start
+            self._current = None
+
+    def fields(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, plus the total"""
+        fields = {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+        end = self.finished if self.finished is not None else time.perf_counter()
+        fields['total'] = round((end - self.started) * 1000, 3)
+        return fields
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. 'encode;dur=4.2, total;dur=6.0'"""
+        return ', '.join(f'{name};dur={ms}' for name, ms in self.fields().items())
+
+
+class LatencyStats:
+    """
+    Rolling per-stage latency samples for in-process percentiles
+
+    Args:
+        window: Samples kept per stage (oldest are dropped)
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, fields: Dict[str, float]):
+        """Record one request's stage durations (milliseconds)"""
+        with self._lock:
+            for name, ms in fields.items():
+                if name not in self._samples:
+                    self._samples[name] = deque(maxlen=self.window)
+                    self._counts[name] = 0
+                self._samples[name].append(ms)
+                self._counts[name] += 1
+
+    def percentiles(self, name: Optional[str] = None) -> Dict:
+        """p50/p90/p99/max in milliseconds per stage over the window"""
+        with self._lock:
+            samples = {n: np.array(s) for n, s in self._samples.items() if name in (None, n)}
+            counts = dict(self._counts)
+        return {
+            n: {
+                'count': counts[n],
+                'p50': round(float(np.percentile(s, 50)), 3),
+                'p90': round(float(np.percentile(s, 90)), 3),
+                'p99': round(float(np.percentile(s, 99)), 3),
+                'max': round(float(s.max()), 3),
+            }
+            for n, s in samples.items()
+        }
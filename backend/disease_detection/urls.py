@@ -4,8 +4,11 @@ from . import image_views
 
 urlpatterns = [
     path('detect_disease/', views.DetectDiseaseView.as_view(), name='detect_disease'),
+    path('detect_disease/stream/', views.DetectDiseaseStreamView.as_view(), name='detect_disease_stream'),
+    path('detect_disease/batch/', views.BatchDetectDiseaseView.as_view(), name='detect_disease_batch'),
     path('transcribe_audio/', views.TranscribeAudioView.as_view(), name='transcribe_audio'),
     path('translate/', views.TranslateTextView.as_view(), name='translate_text'),
+    path('stats/', views.pipeline_stats, name='pipeline_stats'),
     
     # Image-based diagnosis
     path('diagnose_image/', image_views.diagnose_image, name='diagnose_image'),
@@ -0,0 +1,162 @@
+"""
+Vector indexes over a crop's normalized symptom embeddings
+
+Select the backend with DISEASE_DETECTION['VECTOR_INDEX']:
+  - 'exact': brute-force cosine over every row (default; best for small KBs)
+  - 'ivf':   inverted file index built offline by `manage.py build_kb`;
+             rows are clustered with spherical k-means and a query only scores
+             the rows of its `nprobe` closest clusters
+
+Both expose `scores(query)`, a full-length similarity vector in which rows
+that were not searched are filled with -1, so disease aggregation works the
+same on top of either backend.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+UNSEARCHED_SCORE = -1.0
+
+
+def spherical_kmeans(embeddings: np.ndarray, n_lists: int, n_iter: int = 20,
+                     seed: int = 0, chunk_size: int = 65536) -> np.ndarray:
+    """
+    Cluster unit vectors by cosine similarity
+
+    Args:
+        embeddings: (n, dim) L2-normalized rows
+        n_lists: Number of clusters
+        n_iter: Lloyd iterations
+        seed: Random seed for the initial centroids
+        chunk_size: Rows assigned per matrix multiply (bounds memory)
+
+    Returns:
+        (n_lists, dim) L2-normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    n_rows, dim = embeddings.shape
+    centroids = np.array(embeddings[rng.choice(n_rows, size=n_lists, replace=False)], dtype=np.float32)
+
+    for _ in range(n_iter):
+        labels = assign_lists(embeddings, centroids, chunk_size)
+        sums = np.zeros((n_lists, dim), dtype=np.float32)
+        np.add.at(sums, labels, embeddings)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty clusters with random rows so every list stays usable
+        if np.any(empty):
+            sums[empty] = embeddings[rng.choice(n_rows, size=int(empty.sum()), replace=False)]
+            norms[empty] = 1.0
+        centroids = sums / norms
+
+    return centroids
+
+
+def assign_lists(embeddings: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the closest centroid for every row"""
+    labels = np.empty(embeddings.shape[0], dtype=np.int32)
+    for start in range(0, embeddings.shape[0], chunk_size):
+        block = np.asarray(embeddings[start:start + chunk_size], dtype=np.float32)
+        labels[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+class ExactIndex:
+    """Brute-force cosine similarity against every row"""
+
+    kind = 'exact'
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Similarity of a normalized query to every row"""
+        return self.embeddings @ query
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, scores), best first"""
+        return top_k(self.scores(query), k)
+
+
+class IVFIndex:
+    """
+    Inverted file index (IVF-Flat) with exact re-scoring of probed lists
+
+    Rows of list i are list_rows[list_offsets[i]:list_offsets[i + 1]].
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, embeddings: np.ndarray, centroids: np.ndarray, list_offsets: np.ndarray,
+                 list_rows: np.ndarray, nprobe: int = 8):
+        self.embeddings = embeddings
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.list_rows = np.asarray(list_rows, dtype=np.int64)
+        self.nprobe = min(nprobe, len(self.centroids))
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, n_lists: Optional[int] = None,
+              nprobe: int = 8, seed: int = 0) -> 'IVFIndex':
+        """
+        Cluster the rows and build the inverted lists
+
+        Args:
+            embeddings: (n, dim) L2-normalized rows
+            n_lists: Number of lists (defaults to about sqrt(n))
+            nprobe: Lists searched per query
+            seed: Random seed for k-means
+
+        Returns:
+            IVFIndex over embeddings
+        """
+        n_rows = embeddings.shape[0]
+        n_lists = n_lists or max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        centroids = spherical_kmeans(embeddings, n_lists, seed=seed)
+        labels = assign_lists(embeddings, centroids)
+        list_rows = np.argsort(labels, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        return cls(embeddings, centroids, list_offsets, list_rows, nprobe=nprobe)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'list_rows': self.list_rows,
+        }
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Rows of the nprobe lists whose centroids are closest to the query"""
+        centroid_scores = self.centroids @ query
+        if self.nprobe < len(centroid_scores):
+            probe = np.argpartition(-centroid_scores, self.nprobe - 1)[:self.nprobe]
+        else:
+            probe = np.arange(len(centroid_scores))
+        return np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probe
+        ])
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Similarity to probed rows; every other row gets UNSEARCHED_SCORE"""
+        rows = self.candidates(query)
+        scores = np.full(self.embeddings.shape[0], UNSEARCHED_SCORE, dtype=np.float32)
+        scores[rows] = self.embeddings[rows] @ query
+        return scores
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k (rows, scores), best first"""
+        rows = self.candidates(query)
+        best, best_scores = top_k(self.embeddings[rows] @ query, k)
+        return rows[best], best_scores
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and values of the k largest scores, best first"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    part = np.argpartition(-scores, k - 1)[:k]
+    order = part[np.argsort(-scores[part], kind='stable')]
+    return order, scores[order]
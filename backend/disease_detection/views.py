@@ -1,91 +1,96 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.decorators import api_view, permission_classes
-import os
-import pandas as pd
+import json
+import logging
 import numpy as np
-import pickle
-from sentence_transformers import SentenceTransformer
-from langdetect import detect, DetectorFactory
-from transformers import pipeline
 import re
-import traceback
-import tempfile
 from rest_framework.parsers import MultiPartParser, FormParser
 import requests
 from .models import ChatSession, ChatMessage
+from .caches import EncodingCache, TranslationCache
+from .clauses import split_clauses
+from .conf import get_setting
+from .conversation import save_clarification, load_clarification
+from .inference_server import InferenceServerError
+from .language_id import LanguageIdentifier
+from .lexical_index import tokenize, fuse_scores
+from .localization import MESSAGES, language_code
+from .romanized import RomanizedNormalizer
+from .timing import StageTimer, LatencyStats
+from .model_registry import (
+    registry, KB, KB_MULTILINGUAL, ENCODER, MULTILINGUAL_ENCODER, TRANSLATOR_HI_EN, TRANSLATOR_MR_EN,
+)
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
+logger = logging.getLogger(__name__)
+# Per-request stage timings at INFO; silence this logger to drop them
+timing_logger = logging.getLogger('disease_detection.timing')
+
 COLAB_API_URL = "https://26954b8d4135.ngrok-free.app"  # UPDATE with your own Colab ngrok URL (no /api/transcribe suffix)
 
-# Paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-KB_DIR = os.path.join(BASE_DIR, 'kb')
-KB_JSON = os.path.join(KB_DIR, 'crop_disease_kb.json')
-EMBEDDINGS_PKL = os.path.join(KB_DIR, 'symptom_embeddings_new.pkl')
-
-# Load KB and embeddings once
-if not os.path.exists(KB_DIR):
-    os.makedirs(KB_DIR)
-
-def load_kb_and_embeddings():
-    import json
-    with open(KB_JSON, 'r', encoding='utf-8') as f:
-        diseases = json.load(f)
-    with open(EMBEDDINGS_PKL, 'rb') as f:
-        embeddings_data = pickle.load(f)
-    return diseases, embeddings_data
-
-diseases_kb, embeddings_data = None, None
-model = None
-translator_hi_en = None
-translator_mr_en = None
-translator_en_hi = None
-translator_en_mr = None
-
-# Load everything on first import
-try:
-    diseases_kb, embeddings_data = load_kb_and_embeddings()
-    model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-    print(f"✅ Loaded {len(diseases_kb)} diseases and {len(embeddings_data)} embeddings")
-except Exception as e:
-    print('Error loading KB or embedding model:', e)
-    traceback.print_exc()
-
-# Load translation pipelines individually
-try:
-    translator_hi_en = pipeline('translation', model='Helsinki-NLP/opus-mt-hi-en')
-except Exception as e:
-    print('Error loading translator_hi_en:', e)
-    traceback.print_exc()
-    translator_hi_en = None
-
-try:
-    translator_mr_en = pipeline('translation', model='Helsinki-NLP/opus-mt-mr-en')
-except Exception as e:
-    print('Error loading translator_mr_en:', e)
-    traceback.print_exc()
-    translator_mr_en = None
-
-try:
-    translator_en_hi = pipeline('translation', model='Helsinki-NLP/opus-mt-en-hi')
-except Exception as e:
-    print('Error loading translator_en_hi:', e)
-    traceback.print_exc()
-    translator_en_hi = None
-
-try:
-    translator_en_mr = pipeline('translation', model='Helsinki-NLP/opus-mt-en-mr')
-except Exception as e:
-    print('Error loading translator_en_mr:', e)
-    traceback.print_exc()
-    translator_en_mr = None
-
-def cosine_sim_vectorized(matrix, vector):
-    norm_matrix = np.linalg.norm(matrix, axis=1)
-    norm_vector = np.linalg.norm(vector)
-    return np.dot(matrix, vector) / (norm_matrix * norm_vector)
+# KB, encoder and translators are loaded on first use by the model registry
+# (set WARM_MODELS_ON_STARTUP to pre-load them in each web worker)
+
+# Repeated phrases ("leaves turning yellow") skip the transformer on a hit
+encoding_cache = EncodingCache(
+    maxsize=get_setting('ENCODING_CACHE_SIZE'),
+    ttl=get_setting('ENCODING_CACHE_TTL'),
+)
+
+# One translation cache for the MarianMT path and the Colab /api/translate path
+translation_cache = TranslationCache(
+    maxsize=get_setting('TRANSLATION_CACHE_SIZE'),
+    path=get_setting('TRANSLATION_CACHE_PATH'),
+)
+
+# Script histogram first; detectors only for Devanagari (hi vs mr) and other scripts
+language_identifier = LanguageIdentifier(
+    cache_size=get_setting('LANGUAGE_CACHE_SIZE'),
+    short_text_words=get_setting('LANGUAGE_SHORT_TEXT_WORDS'),
+    min_margin=get_setting('LANGUAGE_MIN_MARGIN'),
+)
+
+# Latin-script Hindi/Marathi ("patte pe bhure daag") rewritten from a lexicon, no model
+romanized_normalizer = RomanizedNormalizer.load()
+
+# Rolling per-stage latency percentiles, reported by pipeline_stats
+stage_latency = LatencyStats(window=get_setting('STAGE_TIMING_WINDOW'))
+
+def _get_translator(source_lang):
+    """MarianMT pipeline to English for a source language (Marathi falls back to hi-en)"""
+    translator = registry.get(TRANSLATOR_MR_EN) if source_lang == 'mr' else None
+    if translator is None:
+        translator = registry.get(TRANSLATOR_HI_EN)
+    if translator is None:
+        raise LookupError('No translation model available')
+    return translator
+
+def translate_to_english(text, user_lang):
+    """Translate Hindi/Marathi/code-mixed text with MarianMT, consulting the cache first"""
+    source_lang = 'mr' if user_lang == 'mr' else 'hi'
+    try:
+        # Translators load on first cache miss
+        return translation_cache.translate(
+            source_lang, text, lambda t: _get_translator(source_lang)(t)[0]['translation_text']
+        )
+    except LookupError:
+        return None
+    except InferenceServerError as e:
+        # Same as no translator: the English encoder gets the original text
+        logger.warning(f"Translation failed on the inference server: {e}")
+        return None
+
+def translate_many_to_english(texts, source_lang):
+    """Translate texts of one source language, sending all cache misses in one pipeline call"""
+    def translate_batch(batch):
+        return [r['translation_text'] for r in _get_translator(source_lang)(batch)]
+    return translation_cache.translate_many(source_lang, texts, translate_batch)
+
+def detect_language(text, preferred=None):
+    return language_identifier.detect(text, preferred)
 
 # Add a helper to check for code-mixing
 def is_code_mixed(text):
@@ -94,84 +99,267 @@ def is_code_mixed(text):
     latin = re.search(r'[A-Za-z]', text)
     return bool(devanagari and latin)
 
+def multilingual_retrieval():
+    """True when queries in any language are matched without translation (RETRIEVAL_MODE)"""
+    return get_setting('RETRIEVAL_MODE') == 'multilingual'
+
+def retrieval_models():
+    """Registry names of the (KB, encoder) pair for the configured RETRIEVAL_MODE"""
+    if multilingual_retrieval():
+        return KB_MULTILINGUAL, MULTILINGUAL_ENCODER
+    return KB, ENCODER
+
+def normalize_romanized(text, user_lang):
+    """Lexicon rewrite of romanized Hindi/Marathi text detected as 'en', or None"""
+    if user_lang != 'en' or not get_setting('ROMANIZED_NORMALIZER'):
+        return None
+    result = romanized_normalizer.normalize(text)
+    return result if result.lang else None
+
+def needs_translation(text, user_lang):
+    if multilingual_retrieval():
+        return False
+    return user_lang in ['hi', 'mr'] or is_code_mixed(text)
+
+def preferred_language(request):
+    """
+    Language code for replies: the request's preferred_language, else the
+    signed-in user's profile setting, else English
+    """
+    preferred = request.data.get('preferred_language')
+    if not preferred and getattr(request.user, 'is_authenticated', False):
+        profile = getattr(request.user, 'profile', None)
+        preferred = getattr(profile, 'preferred_language', None)
+    return language_code(preferred)
+
+def run_to_completion(steps):
+    """Exhaust a pipeline generator and return its final value"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    payload = json.dumps(data, ensure_ascii=False, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+    return f"event: {event}\ndata: {payload}\n\n"
+
 class DetectDiseaseView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        global diseases_kb, embeddings_data, model
+        timer = StageTimer()
+        response = run_to_completion(self._diagnose(request, timer))
+        return self._finish(response, timer)
+
+    def _finish(self, response, timer):
+        """Record stage timings for a finished diagnosis response"""
+        timer.stop()
+        stages = timer.fields()
+        stage_latency.add(stages)
+        if timing_logger.isEnabledFor(logging.INFO):
+            outcome = response.data.get('type') if isinstance(response.data, dict) else None
+            timing_logger.info(
+                'detect_disease %s',
+                ' '.join(f'{name}={ms}ms' for name, ms in stages.items()),
+                extra={'stages_ms': stages, 'status': response.status_code, 'outcome': outcome},
+            )
+        if get_setting('SERVER_TIMING_HEADER'):
+            response['Server-Timing'] = timer.server_timing()
+        return response
+
+    def _diagnose(self, request, timer):
+        """
+        Diagnosis pipeline as a generator
+
+        Yields (event, data) as stages complete (language, translation,
+        candidates) and returns the final Response; post() drains it,
+        DetectDiseaseStreamView forwards the events as Server-Sent Events.
+        """
         data = request.data
         input_text = data.get('symptom_text', '')
         crop = data.get('crop', '').lower()
         action = data.get('action', None)  # For conversational actions (Stage 2)
         disease_name = data.get('disease_name', None)  # For action-based requests
         followup_answer = data.get('followup_answer', None)  # User's symptom selection
+        followup_token = data.get('followup_token', None)  # Returned with clarification_needed
         
-        # Filter embeddings by selected crop
-        if not crop or crop not in ['rice', 'wheat', 'apple', 'tomato', 'potato']:
+        # No crop yet: diagnose against every crop at once. Actions after a
+        # cross-crop diagnosis take the crop of the disease it returned
+        cross_crop = not crop and not action and get_setting('CROSS_CROP_DIAGNOSIS')
+        if not crop and not cross_crop and not (action and disease_name):
             return Response({'error': 'Please select a valid crop'}, status=400)
-        
-        crop_embeddings_list = [e for e in embeddings_data if e['crop_name'].lower() == crop]
-        if not crop_embeddings_list:
-            return Response({'error': f'No disease data available for {crop}'}, status=400)
+
+        kb_name, encoder_name = retrieval_models()
+        timer.start('kb')
+        kb = registry.get(kb_name)
+        if kb is None:
+            return Response({'error': 'Disease knowledge base is unavailable'}, status=503)
+        symptom_index = kb.current()  # One KB snapshot for the whole request
+        if not crop and not cross_crop:
+            # Ambiguous names (same disease on several crops) still need the crop
+            crop = symptom_index.crop_of(disease_name) or ''
+
+        # Supported crops are whatever the KB index contains
+        crop_index = symptom_index.all_crops if cross_crop else symptom_index.get(crop)
+        if crop_index is None:
+            return Response({
+                'error': 'Please select a valid crop',
+                'available_crops': symptom_index.crop_names,
+            }, status=400)
         
         # STAGE 2: Handle action-based requests (ONLY after disease confirmed)
         if action and disease_name:
-            return self._handle_action(action, disease_name, crop)
+            return self._handle_action(
+                action, disease_name, crop, symptom_index, preferred_language(request)
+            )
         
         # STAGE 1: Disease Detection & Confirmation
         
+        # Follow-up on a clarification: resolve from server-side state, no model work
+        if followup_answer is not None and followup_token:
+            state = load_clarification(followup_token)
+            if state is not None and state['crop'] == crop:
+                try:
+                    selected_idx = int(followup_answer)
+                except (TypeError, ValueError):
+                    selected_idx = -1
+                
+                if 0 <= selected_idx < len(state['option_diseases']):
+                    best_disease_data = self._option_disease(
+                        symptom_index, state['option_diseases'][selected_idx], crop
+                    )
+                    # None: the disease left the KB since the token was issued, treat it as expired
+                    if best_disease_data is not None:
+                        logger.debug(f"User selected symptom #{selected_idx}: confirmed {best_disease_data['disease_name']}")
+                        timer.start('respond')
+                        return self._return_final_diagnosis(
+                            best_disease_data, 0.95, state['user_lang'], state['translated'],
+                            state['options'][selected_idx], match_type='followup'
+                        )
+            # Expired or stale token: the answer indexes options the KB may no
+            # longer produce, so diagnose the text afresh instead of guessing
+            followup_answer = None
+        
         # Language detection and translation
+        timer.start('detect_language')
         user_lang = 'en'
         translated = False
         translated_text = input_text
         
-        try:
-            user_lang = detect(input_text)
-        except Exception:
-            user_lang = 'en'
+        user_lang = detect_language(input_text, preferred_language(request))
+        romanized = normalize_romanized(input_text, user_lang)
+        if romanized is not None:
+            # Romanized Hindi/Marathi: already English from the lexicon, skip MarianMT
+            user_lang = romanized.lang
+            translated_text = romanized.text
+            translated = True
+        translate = romanized is None and needs_translation(input_text, user_lang)
+        yield 'language', {'input_language': user_lang, 'needs_translation': translate}
         
-        if user_lang in ['hi', 'mr'] or is_code_mixed(input_text):
-            if user_lang == 'mr' and translator_mr_en:
-                translated_text = translator_mr_en(input_text)[0]['translation_text']
-                translated = True
-            elif translator_hi_en:
-                translated_text = translator_hi_en(input_text)[0]['translation_text']
+        if romanized is not None:
+            yield 'translation', {'translated': translated, 'translated_text': translated_text}
+        elif translate:
+            timer.start('translate')
+            english_text = translate_to_english(input_text, user_lang)
+            if english_text is not None:
+                translated_text = english_text
                 translated = True
+            yield 'translation', {'translated': translated, 'translated_text': translated_text}
+        
+        # Lexical pass: keyword inputs that name one disease ("blast") skip the encoder
+        lexical_scores = None
+        candidate_rows = None
+        if get_setting('LEXICAL_INDEX'):
+            timer.start('lexical')
+            query_terms = tokenize(translated_text)
+            lexical_scores = crop_index.lexical.score(query_terms)
+            if followup_answer is None and len(query_terms) <= get_setting('LEXICAL_SHORTCUT_MAX_TERMS'):
+                match = crop_index.lexical_match(
+                    query_terms, lexical_scores, get_setting('LEXICAL_SHORTCUT_MARGIN'),
+                    get_setting('LEXICAL_SHORTCUT_MIN_COVERAGE'),
+                )
+                if match is not None and match.exact:
+                    timer.start('respond')
+                    return self._return_final_diagnosis(
+                        symptom_index.disease(crop_index.group_disease_ids[match.group]),
+                        1.0, user_lang, translated, crop_index.symptom_texts[match.row],
+                        match_type='lexical_exact'
+                    )
+                if match is not None:
+                    # Part of a disease name ("wilt", "tomato early"): dense-score
+                    # only the diseases it occurs in and apply the usual threshold
+                    candidate_rows = crop_index.lexical_candidates(
+                        lexical_scores, get_setting('LEXICAL_PREFILTER_DISEASES')
+                    )
+
+        # On large crops only dense-score the diseases the lexical pass found
+        if candidate_rows is None and lexical_scores is not None \
+                and len(crop_index) >= get_setting('LEXICAL_PREFILTER_MIN_ROWS'):
+            candidate_rows = crop_index.lexical_candidates(
+                lexical_scores, get_setting('LEXICAL_PREFILTER_DISEASES')
+            )
+
+        # Multi-symptom messages ("leaves yellow, stem has brown spots") are also scored clause by clause
+        clauses = []
+        if get_setting('CLAUSE_SPLITTING'):
+            clauses = split_clauses(translated_text, max_clauses=get_setting('CLAUSE_MAX'))
+        
+        # Calculate similarities with the symptoms for selected crop (shared by followup path)
+        timer.start('encode')
+        model = registry.get(encoder_name)
+        if model is None:
+            return Response({'error': 'Symptom encoder is unavailable'}, status=503)
+        try:
+            if len(clauses) > 1:
+                # Whole message plus every clause in one batched encode, one matmul
+                query_embs = encoding_cache.encode_many(model, [translated_text] + clauses)
+            else:
+                input_emb = encoding_cache.encode(model, translated_text)
+        except InferenceServerError as e:
+            logger.warning(f"Encoding failed on the inference server: {e}")
+            return Response({'error': 'Symptom encoder is unavailable'}, status=503)
+        timer.start('similarity')
+        if len(clauses) > 1:
+            sims = crop_index.score_many(query_embs, rows=candidate_rows)
+        else:
+            sims = crop_index.score(input_emb, rows=candidate_rows)
+        if lexical_scores is not None:
+            sims = fuse_scores(sims, lexical_scores, get_setting('LEXICAL_FUSION_WEIGHT'))
+        
+        # Aggregate scores by disease (since we have multiple symptoms per disease)
+        timer.start('aggregate')
+        group_scores = None
+        if len(clauses) > 1:
+            sims, group_scores = crop_index.fuse_clauses(sims, get_setting('CLAUSE_COVERAGE_WEIGHT'))
+        scores = crop_index.aggregate(sims, top_k=2, group_scores=group_scores)
+        yield 'candidates', {'candidates': [
+            {
+                'disease_name': symptom_index.disease(scores.disease_ids[group])['disease_name'],
+                'crop': symptom_index.disease(scores.disease_ids[group])['crop_name'],
+                'confidence': float(scores.max_scores[group]),
+            }
+            for group in scores.ranking[:3]
+        ]}
+        timer.start('respond')
         
-        # If user provided followup answer (selected a symptom from clarification)
+        # Legacy followup answer without a token (older clients): recompute the options
         if followup_answer is not None and input_text:
             try:
                 selected_idx = int(followup_answer)
                 
-                # Re-run the similarity to get top 3 diseases
-                input_emb = model.encode([translated_text if translated else input_text])[0]
-                crop_embeddings_matrix = np.array([e['embedding'] for e in crop_embeddings_list])
-                sims = cosine_sim_vectorized(crop_embeddings_matrix, input_emb)
-                
-                # Aggregate by disease
-                disease_scores = {}
-                for idx, score in enumerate(sims):
-                    disease_name = crop_embeddings_list[idx]['disease_name']
-                    if disease_name not in disease_scores:
-                        disease_scores[disease_name] = {
-                            'max_score': float(score),
-                            'data': crop_embeddings_list[idx]['full_data']
-                        }
-                    if float(score) > disease_scores[disease_name]['max_score']:
-                        disease_scores[disease_name]['max_score'] = float(score)
-                
-                ranked_diseases = sorted(
-                    disease_scores.items(),
-                    key=lambda x: x[1]['max_score'],
-                    reverse=True
-                )
-                top_3_diseases = ranked_diseases[:3]
+                # Top 3 diseases by best symptom match
+                top_3_diseases = [
+                    (disease_id, {'data': symptom_index.disease(disease_id)})
+                    for disease_id in scores.disease_ids[scores.ranking[:3]]
+                ]
                 
                 # Collect symptoms shown to user (same logic as clarification)
                 followup_options = []
                 disease_for_symptom = []
                 
-                for disease_name, info in top_3_diseases:
+                for disease_id, info in top_3_diseases:
                     symptoms = info['data'].get('symptoms', [])[:2]
                     for symptom in symptoms:
                         if symptom not in followup_options:
@@ -183,66 +371,30 @@ class DetectDiseaseView(APIView):
                     best_disease_data = disease_for_symptom[selected_idx]
                     best_score = 0.95  # User confirmed, high confidence
                     
-                    print(f"✅ User selected symptom #{selected_idx}: Confirmed {best_disease_data['disease_name']}")
+                    logger.debug(f"User selected symptom #{selected_idx}: confirmed {best_disease_data['disease_name']}")
                     
                     # Return FINAL diagnosis with conversational actions
                     return self._return_final_diagnosis(best_disease_data, best_score, user_lang, translated)
             except Exception as e:
-                print(f"Error processing followup answer: {e}")
-        
-        # Calculate similarities with ALL symptoms for selected crop
-        input_emb = model.encode([translated_text])[0]
-        crop_embeddings_matrix = np.array([e['embedding'] for e in crop_embeddings_list])
-        sims = cosine_sim_vectorized(crop_embeddings_matrix, input_emb)
-        
-        # Aggregate scores by disease (since we have multiple symptoms per disease)
-        disease_scores = {}
-        for idx, score in enumerate(sims):
-            disease_name = crop_embeddings_list[idx]['disease_name']
-            
-            if disease_name not in disease_scores:
-                disease_scores[disease_name] = {
-                    'scores': [],
-                    'max_score': float(score),
-                    'data': crop_embeddings_list[idx]['full_data'],
-                    'best_symptom_idx': idx
-                }
-            
-            disease_scores[disease_name]['scores'].append(float(score))
-            if float(score) > disease_scores[disease_name]['max_score']:
-                disease_scores[disease_name]['max_score'] = float(score)
-                disease_scores[disease_name]['best_symptom_idx'] = idx
-        
-        # Calculate average score for each disease
-        for disease_name in disease_scores:
-            scores = disease_scores[disease_name]['scores']
-            disease_scores[disease_name]['avg_score'] = float(np.mean(scores))
-        
-        # Rank diseases by max score (best symptom match)
-        ranked_diseases = sorted(
-            disease_scores.items(), 
-            key=lambda x: x[1]['max_score'],  # Sort by best symptom match
-            reverse=True
-        )
+                logger.warning(f"Error processing followup answer: {e}")
         
-        # Get top 3 diseases
-        top_3_diseases = ranked_diseases[:3]
+        # Rank diseases by max score (best symptom match) and get top 3
+        top_3_diseases = []
+        for group in scores.ranking[:3]:
+            disease_data = symptom_index.disease(scores.disease_ids[group])
+            top_3_diseases.append((disease_data['disease_name'], {
+                'max_score': float(scores.max_scores[group]),
+                'avg_score': float(scores.mean_scores[group]),
+                'data': disease_data,
+                'disease_id': int(scores.disease_ids[group]),
+                'top_rows': scores.top_rows[group],
+                'best_symptom_idx': int(scores.best_rows[group])
+            }))
         best_disease_name = top_3_diseases[0][0]
         best_score = top_3_diseases[0][1]['max_score']
         best_disease_data = top_3_diseases[0][1]['data']
         best_symptom_idx = top_3_diseases[0][1]['best_symptom_idx']
-        matched_symptom = crop_embeddings_list[best_symptom_idx]['symptom_text']
-        
-        print(f"\n🔍 DIAGNOSIS ANALYSIS:")
-        print(f"User input: '{input_text}' (translated: '{translated_text}')")
-        print(f"Crop: {crop}")
-        print(f"\nTop 3 Diseases:")
-        for i, (disease_name, info) in enumerate(top_3_diseases, 1):
-            symptom_match = crop_embeddings_list[info['best_symptom_idx']]['symptom_text']
-            print(f"  {i}. {disease_name}: {info['max_score']:.3f} (avg: {info['avg_score']:.3f})")
-            print(f"      Best matching symptom: '{symptom_match}'")
-        print(f"\nBest match: {best_disease_name} with {best_score:.2%} confidence")
-        print(f"Matched symptom: '{matched_symptom}'\n")
+        matched_symptom = crop_index.symptom_texts[best_symptom_idx]
         
         # Confidence threshold
         confidence_threshold = 0.60
@@ -253,14 +405,24 @@ class DetectDiseaseView(APIView):
             if info['max_score'] >= confidence_threshold
         ]
         
-        print(f"Diseases above {confidence_threshold:.0%} threshold: {len(diseases_above_threshold)}")
-        for name, info in diseases_above_threshold:
-            print(f"  - {name}: {info['max_score']:.2%}")
+        # Diagnosis analysis only when debugging; formatting it costs time under load
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Diagnosis for {crop or 'all crops'}: input '{input_text}' (translated: '{translated_text}'; "
+                f"clauses: {clauses}); "
+                + '; '.join(
+                    f"{disease_name} {info['max_score']:.3f} (avg {info['avg_score']:.3f}, "
+                    f"best symptom '{crop_index.symptom_texts[info['best_symptom_idx']]}')"
+                    for disease_name, info in top_3_diseases
+                )
+                + f"; best {best_disease_name}, {len(diseases_above_threshold)} above {confidence_threshold:.0%}"
+            )
         
         # AMBIGUOUS: Multiple diseases above threshold - need clarification
         if len(diseases_above_threshold) > 1:
-            print("⚠️ Multiple diseases above threshold - asking follow-up questions\n")
+            logger.debug("Multiple diseases above threshold - asking follow-up questions")
             followup_options = []
+            option_diseases = []
             diseases_considered = []
             
             # Collect highly matched symptoms ONLY from diseases above threshold
@@ -268,31 +430,31 @@ class DetectDiseaseView(APIView):
                 if disease_name not in diseases_considered:
                     diseases_considered.append(disease_name)
                     
-                    # Get the TOP matching symptoms for this disease (the ones that scored high)
-                    # Find all symptoms for this disease with their scores
-                    disease_symptom_scores = []
-                    for idx, score in enumerate(sims):
-                        if crop_embeddings_list[idx]['disease_name'] == disease_name:
-                            disease_symptom_scores.append({
-                                'symptom': crop_embeddings_list[idx]['symptom_text'],
-                                'score': float(score),
-                                'idx': idx
-                            })
-                    
-                    # Sort by score and take top 2-3 symptoms
-                    disease_symptom_scores.sort(key=lambda x: x['score'], reverse=True)
-                    top_symptoms = disease_symptom_scores[:2]  # Top 2 symptoms per disease
+                    # Get the TOP matching symptoms for this disease (precomputed per group)
+                    top_symptoms = [
+                        {
+                            'symptom': crop_index.symptom_texts[idx],
+                            'score': float(sims[idx]),
+                            'idx': int(idx)
+                        }
+                        for idx in info['top_rows'] if idx >= 0
+                    ]
                     
-                    print(f"  Showing top symptoms for {disease_name}:")
                     for s in top_symptoms:
-                        print(f"    - {s['symptom']} ({s['score']:.2%})")
                         if s['symptom'] not in followup_options:
                             followup_options.append(s['symptom'])
+                            option_diseases.append({
+                                'disease_id': info['disease_id'],
+                                'disease_name': disease_name,
+                                'crop': info['data']['crop_name'],
+                            })
             
             # Limit to 6 options max for better UX
             followup_options = followup_options[:6]
+            option_diseases = option_diseases[:6]
+            followup_token = save_clarification(crop, followup_options, option_diseases, user_lang, translated)
             
-            message = f"🤔 I found {len(diseases_considered)} possible diseases for your {crop}:\n\n"
+            message = f"🤔 I found {len(diseases_considered)} possible diseases for your {crop or 'crop'}:\n\n"
             message += f"Top matches: {', '.join(diseases_considered)}\n\n"
             message += f"To give you accurate diagnosis, which of these symptoms BEST matches what you see?"
             
@@ -300,10 +462,12 @@ class DetectDiseaseView(APIView):
                 'type': 'clarification_needed',
                 'message': message,
                 'followup_questions': followup_options,
+                'followup_token': followup_token,
                 'need_followup': True,
                 'candidates': [
                     {
                         'disease_name': disease_name,
+                        'crop': info['data']['crop_name'],
                         'confidence': float(info['max_score'])
                     }
                     for disease_name, info in diseases_above_threshold
@@ -314,8 +478,9 @@ class DetectDiseaseView(APIView):
         
         # LOW CONFIDENCE: All diseases below threshold - ask follow-up from all top 3
         if best_score < confidence_threshold:
-            print("⚠️ Low confidence - asking follow-up questions from all top 3\n")
+            logger.debug("Low confidence - asking follow-up questions from all top 3")
             followup_options = []
+            option_diseases = []
             diseases_considered = []
             
             for disease_name, info in top_3_diseases:
@@ -325,8 +490,15 @@ class DetectDiseaseView(APIView):
                     for symptom in symptoms:
                         if symptom not in followup_options:
                             followup_options.append(symptom)
+                            option_diseases.append({
+                                'disease_id': info['disease_id'],
+                                'disease_name': disease_name,
+                                'crop': info['data']['crop_name'],
+                            })
             
             followup_options = followup_options[:6]
+            option_diseases = option_diseases[:6]
+            followup_token = save_clarification(crop, followup_options, option_diseases, user_lang, translated)
             
             message = f"🤔 I'm not very confident about the diagnosis.\n\n"
             message += f"Possible diseases: {', '.join(diseases_considered)}\n\n"
@@ -336,10 +508,12 @@ class DetectDiseaseView(APIView):
                 'type': 'clarification_needed',
                 'message': message,
                 'followup_questions': followup_options,
+                'followup_token': followup_token,
                 'need_followup': True,
                 'candidates': [
                     {
                         'disease_name': disease_name,
+                        'crop': info['data']['crop_name'],
                         'confidence': float(info['max_score'])
                     }
                     for disease_name, info in top_3_diseases
@@ -351,14 +525,39 @@ class DetectDiseaseView(APIView):
         # HIGH CONFIDENCE: Return final diagnosis with conversational actions
         return self._return_final_diagnosis(best_disease_data, best_score, user_lang, translated, matched_symptom)
     
-    def _return_final_diagnosis(self, disease_data, confidence, user_lang, translated, matched_symptom=None):
-        """Return confirmed diagnosis with conversational action buttons"""
+    @staticmethod
+    def _option_disease(symptom_index, option, crop):
+        """KB record of a clarification option, or None if the KB no longer has that disease
+
+        Disease ids shift when the KB is hot-reloaded, so the id stored in the
+        token is only trusted while it still names the same disease.
+        """
+        disease_id = option['disease_id']
+        if 0 <= disease_id < len(symptom_index.diseases):
+            disease_data = symptom_index.disease(disease_id)
+            if disease_data['disease_name'] == option['disease_name']:
+                return disease_data
+        return symptom_index.find(option.get('crop') or crop, option['disease_name'])
+
+    def _return_final_diagnosis(self, disease_data, confidence, user_lang, translated, matched_symptom=None,
+                                match_type='semantic'):
+        """
+        Return confirmed diagnosis with conversational action buttons
+
+        match_type says how the disease was picked: 'semantic' (symptom
+        similarity), 'lexical_exact' (the text names the disease) or
+        'followup' (the user chose a clarification option).
+        """
         severity = disease_data.get('severity_level', 'Medium')
         
         # Build diagnosis message
         diagnosis_msg = f"🔍 Diagnosis Confirmed!\n\n"
         diagnosis_msg += f"🦠 Disease: {disease_data['disease_name']}\n"
-        diagnosis_msg += f"📊 Confidence: {int(confidence * 100)}%\n"
+        if match_type == 'lexical_exact':
+            # Named by the user ("blast"), not scored against symptoms
+            diagnosis_msg += "📊 Matched by disease name\n"
+        else:
+            diagnosis_msg += f"📊 Confidence: {int(confidence * 100)}%\n"
         diagnosis_msg += f"⚠️ Severity: {severity}\n"
         
         if matched_symptom:
@@ -381,6 +580,7 @@ class DetectDiseaseView(APIView):
                 'disease_name': disease_data['disease_name'],
                 'crop': disease_data['crop_name'],
                 'confidence': confidence,
+                'match_type': match_type,
                 'severity': severity,
                 'risk_season': disease_data.get('risk_season', 'Unknown'),
                 'matched_symptom': matched_symptom,
@@ -391,113 +591,295 @@ class DetectDiseaseView(APIView):
             'translated': translated
         })
     
-    def _handle_action(self, action, disease_name, crop):
-        """Handle conversational action requests"""
+    def _handle_action(self, action, disease_name, crop, symptom_index, lang='en'):
+        """Handle conversational action requests in the user's language (precomputed, no model calls)"""
         # Find the disease data
-        disease_data = None
-        for disease in diseases_kb:
-            if (disease['disease_name'].lower() == disease_name.lower() and 
-                disease['crop_name'].lower() == crop.lower()):
-                disease_data = disease
-                break
+        disease_data = symptom_index.find(crop, disease_name)
         
         if not disease_data:
             return Response({'error': 'Disease not found'}, status=404)
         
+        text = MESSAGES.get(lang, MESSAGES['en'])
+        disease_data = symptom_index.localizations.localize(disease_data, lang)
+        disease = disease_data['disease_name']
+        
         if action == 'treatment':
-            msg = f"💊 Treatment for {disease_data['disease_name']}:\n\n"
+            msg = text['treatment_title'].format(disease=disease) + "\n\n"
             msg += f"{disease_data['treatment']}\n\n"
-            msg += "Need more help?"
+            msg += text['treatment_footer']
             
             actions = [
-                {'label': '🛡️ Prevention Tips', 'action': 'prevention'},
-                {'label': '❓ FAQs', 'action': 'ask_questions'},
-                {'label': '✅ Got it', 'action': 'done'}
+                {'label': text['prevention_tips'], 'action': 'prevention'},
+                {'label': text['faqs'], 'action': 'ask_questions'},
+                {'label': text['got_it'], 'action': 'done'}
             ]
             
             return Response({
                 'type': 'action_response',
                 'message': msg,
                 'quick_actions': actions,
-                'conversation_state': 'treatment_shown'
+                'conversation_state': 'treatment_shown',
+                'language': lang
             })
         
         elif action == 'prevention':
-            msg = f"🛡️ Prevention Tips for {disease_data['disease_name']}:\n\n"
+            msg = text['prevention_title'].format(disease=disease) + "\n\n"
             msg += f"{disease_data['prevention']}\n\n"
-            msg += "Stay proactive to keep your crops healthy!"
+            msg += text['prevention_footer']
             
             actions = [
-                {'label': '💊 Show Treatment', 'action': 'treatment'},
-                {'label': '📚 Learn More', 'action': 'learn_more'},
-                {'label': '✅ Thanks!', 'action': 'done'}
+                {'label': text['show_treatment'], 'action': 'treatment'},
+                {'label': text['learn_more'], 'action': 'learn_more'},
+                {'label': text['thanks'], 'action': 'done'}
             ]
             
             return Response({
                 'type': 'action_response',
                 'message': msg,
                 'quick_actions': actions,
-                'conversation_state': 'prevention_shown'
+                'conversation_state': 'prevention_shown',
+                'language': lang
             })
         
         elif action == 'learn_more':
-            msg = f"📚 About {disease_data['disease_name']}:\n\n"
-            msg += f"🔬 Causes:\n{disease_data['causes']}\n\n"
-            msg += f"🌡️ Risk Season:\n{disease_data['risk_season']}\n\n"
-            msg += f"🎯 Affected Parts:\n{', '.join(disease_data.get('affected_parts', ['Various parts']))}"
+            msg = text['about_title'].format(disease=disease) + "\n\n"
+            msg += f"{text['causes']}\n{disease_data['causes']}\n\n"
+            msg += f"{text['risk_season']}\n{disease_data['risk_season']}\n\n"
+            msg += f"{text['affected_parts']}\n{', '.join(disease_data.get('affected_parts', [text['various_parts']]))}"
             
             actions = [
-                {'label': '💊 Treatment', 'action': 'treatment'},
-                {'label': '🛡️ Prevention', 'action': 'prevention'},
-                {'label': '✅ Got it', 'action': 'done'}
+                {'label': text['treatment'], 'action': 'treatment'},
+                {'label': text['prevention'], 'action': 'prevention'},
+                {'label': text['got_it'], 'action': 'done'}
             ]
             
             return Response({
                 'type': 'action_response',
                 'message': msg,
                 'quick_actions': actions,
-                'conversation_state': 'details_shown'
+                'conversation_state': 'details_shown',
+                'language': lang
             })
         
         elif action == 'ask_questions':
             questions = disease_data.get('symptom_questions', [])
             followups = disease_data.get('contextual_followups', [])
             
-            msg = f"❓ Questions about {disease_data['disease_name']}:\n\n"
-            msg += "Symptom Check:\n"
+            msg = text['questions_title'].format(disease=disease) + "\n\n"
+            msg += f"{text['symptom_check']}\n"
             for i, q in enumerate(questions[:3], 1):
                 msg += f"{i}. {q}\n"
             
             if followups:
-                msg += "\n🌾 Context Questions:\n"
+                msg += f"\n{text['context_questions']}\n"
                 for i, q in enumerate(followups[:2], 1):
                     msg += f"{i}. {q}\n"
             
             actions = [
-                {'label': '💊 Treatment', 'action': 'treatment'},
-                {'label': '🛡️ Prevention', 'action': 'prevention'},
-                {'label': '✅ Done', 'action': 'done'}
+                {'label': text['treatment'], 'action': 'treatment'},
+                {'label': text['prevention'], 'action': 'prevention'},
+                {'label': text['finished'], 'action': 'done'}
             ]
             
             return Response({
                 'type': 'action_response',
                 'message': msg,
                 'quick_actions': actions,
-                'conversation_state': 'questions_shown'
+                'conversation_state': 'questions_shown',
+                'language': lang
             })
         
         elif action == 'done':
-            msg = "✅ Great! Feel free to start a new diagnosis anytime.\n\n"
-            msg += "💡 Tip: Regular monitoring helps catch diseases early!"
+            msg = f"{text['done']}\n\n"
+            msg += text['done_tip']
             
             return Response({
                 'type': 'conversation_end',
                 'message': msg,
-                'conversation_state': 'completed'
+                'conversation_state': 'completed',
+                'language': lang
             })
         
         return Response({'error': 'Unknown action'}, status=400)
 
+class DetectDiseaseStreamView(DetectDiseaseView):
+    """
+    detect_disease as Server-Sent Events, one per completed stage
+
+    Same request body as detect_disease. Events, in order:
+        language     {"input_language", "needs_translation"}
+        translation  {"translated", "translated_text"}      (non-English input only)
+        candidates   {"candidates": [{"disease_name", "crop", "confidence"}]}
+        diagnosis | clarification | result   the detect_disease JSON response
+    Fast paths (follow-up answers, actions, keyword matches) skip straight to
+    the final event; requests that fail validation get a plain JSON error.
+    """
+
+    def post(self, request):
+        timer = StageTimer()
+        request.data  # Parse the body now, not after the response has started
+        steps = self._diagnose(request, timer)
+
+        # Run up to the first event so validation errors keep their HTTP status
+        first, final = None, None
+        try:
+            first = next(steps)
+        except StopIteration as done:
+            final = done.value
+            if final.status_code != 200:
+                return self._finish(final, timer)
+
+        def events():
+            response = final
+            try:
+                if first is not None:
+                    yield sse_event(*first)
+                while response is None:
+                    try:
+                        yield sse_event(*next(steps))
+                    except StopIteration as done:
+                        response = done.value
+            except Exception as e:
+                logger.exception('Streaming diagnosis failed')
+                timer.stop()
+                yield sse_event('error', {'error': str(e)})
+                return
+
+            self._finish(response, timer)
+            kind = response.data.get('type') if isinstance(response.data, dict) else None
+            if response.status_code != 200:
+                event = 'error'
+            else:
+                event = {'diagnosis': 'diagnosis', 'clarification_needed': 'clarification'}.get(kind, 'result')
+            yield sse_event(event, response.data)
+
+        stream = StreamingHttpResponse(events(), content_type='text/event-stream')
+        stream['Cache-Control'] = 'no-cache'
+        stream['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return stream
+
+
+class BatchDetectDiseaseView(APIView):
+    """
+    Rank diseases for many symptom reports in one call (field-officer triage)
+    
+    POST {"items": [{"crop": "rice", "symptom_text": "..."}, ...], "top_k": 3}
+    Translation is batched per language, all items share one encode call and
+    each crop is scored with a single matrix multiply. Items without a crop
+    are ranked across all crops (CROSS_CROP_DIAGNOSIS).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'items must be a non-empty list'}, status=400)
+        
+        max_items = get_setting('BATCH_MAX_ITEMS')
+        if len(items) > max_items:
+            return Response({'error': f'At most {max_items} items per batch'}, status=400)
+        
+        try:
+            top_k = max(1, min(int(request.data.get('top_k', 3)), 10))
+        except (TypeError, ValueError):
+            return Response({'error': 'top_k must be an integer'}, status=400)
+        
+        kb_name, encoder_name = retrieval_models()
+        kb = registry.get(kb_name)
+        model = registry.get(encoder_name)
+        if kb is None or model is None:
+            return Response({'error': 'Disease detection models are unavailable'}, status=503)
+        symptom_index = kb.current()
+        
+        # Validate items and detect languages; invalid items get a per-item error
+        preferred = preferred_language(request)
+        results = []
+        pending = []  # (result, crop_index, text)
+        for i, item in enumerate(items):
+            result = {'index': i}
+            results.append(result)
+            if not isinstance(item, dict):
+                result['error'] = 'Item must be an object'
+                continue
+            
+            crop = str(item.get('crop', '')).lower()
+            text = str(item.get('symptom_text', '')).strip()
+            if crop:
+                crop_index = symptom_index.get(crop)
+            else:
+                crop_index = symptom_index.all_crops if get_setting('CROSS_CROP_DIAGNOSIS') else None
+            if crop_index is None or not len(crop_index):
+                result['error'] = 'Please select a valid crop'
+                continue
+            if not text:
+                result['error'] = 'No symptom text provided'
+                continue
+            
+            user_lang = detect_language(text, preferred)
+            result.update({'crop': crop, 'input_language': user_lang, 'translated': False})
+            romanized = normalize_romanized(text, user_lang)
+            if romanized is not None:
+                result.update({'input_language': romanized.lang, 'translated': True,
+                               'translated_text': romanized.text})
+                text = romanized.text
+            pending.append((result, crop_index, text))
+        
+        # Batched translation, one pipeline call per source language
+        english_texts = [text for _, _, text in pending]
+        positions_by_lang = {}
+        for n, (result, _, text) in enumerate(pending):
+            if not result['translated'] and needs_translation(text, result['input_language']):
+                source_lang = 'mr' if result['input_language'] == 'mr' else 'hi'
+                positions_by_lang.setdefault(source_lang, []).append(n)
+        
+        for source_lang, positions in positions_by_lang.items():
+            try:
+                translations = translate_many_to_english([pending[n][2] for n in positions], source_lang)
+            except LookupError:
+                continue
+            except InferenceServerError as e:
+                logger.warning(f"Translation failed on the inference server: {e}")
+                continue
+            for n, translation in zip(positions, translations):
+                english_texts[n] = translation
+                pending[n][0]['translated'] = True
+                pending[n][0]['translated_text'] = translation
+        
+        if not pending:
+            return Response({'results': results})
+        
+        # One batched encode for every item
+        try:
+            embeddings = encoding_cache.encode_many(model, english_texts)
+        except InferenceServerError as e:
+            logger.warning(f"Encoding failed on the inference server: {e}")
+            return Response({'error': 'Symptom encoder is unavailable'}, status=503)
+        
+        # One matrix multiply per crop, then per-disease max via segment reduction
+        positions_by_crop = {}
+        for n, (_, crop_index, _) in enumerate(pending):
+            positions_by_crop.setdefault(crop_index.crop, []).append(n)
+        
+        for positions in positions_by_crop.values():
+            crop_index = pending[positions[0]][1]
+            sims = crop_index.score_many(embeddings[positions])
+            max_scores = crop_index.max_by_disease(sims)
+            ranking = np.argsort(-max_scores, axis=1, kind='stable')[:, :top_k]
+            
+            for row, n in enumerate(positions):
+                pending[n][0]['diseases'] = [
+                    {
+                        'disease_name': symptom_index.disease(crop_index.group_disease_ids[group])['disease_name'],
+                        'crop': symptom_index.disease(crop_index.group_disease_ids[group])['crop_name'],
+                        'confidence': float(max_scores[row, group]),
+                        'matched_symptom': crop_index.symptom_texts[crop_index.best_row(sims[row], group)],
+                    }
+                    for group in ranking[row]
+                ]
+        
+        return Response({'results': results})
+
+
 class TranscribeAudioView(APIView):
     """
     Transcribe audio using Colab (Whisper + Ollama combined pipeline)
@@ -573,6 +955,13 @@ class TranslateTextView(APIView):
         if not text:
             return Response({"error": "No text provided."}, status=400)
         
+        # Shared with DetectDiseaseView, so either path can serve the other's work
+        source_lang = detect_language(text, preferred_language(request))
+        
+        cached = translation_cache.get(source_lang, text)
+        if cached is not None:
+            return Response({"translated": cached, "original": text})
+        
         try:
             # Send text to Colab's Ollama translation endpoint
             resp = requests.post(
@@ -583,6 +972,7 @@ class TranslateTextView(APIView):
             
             if resp.status_code == 200:
                 data = resp.json()
+                translation_cache.set(source_lang, text, data.get('translated', text))
                 return Response({
                     "translated": data.get('translated', text),
                     "original": data.get('original', text)
@@ -607,6 +997,20 @@ class TranslateTextView(APIView):
             }, status=500)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def pipeline_stats(request):
+    """Cache, model and stage latency counters for the diagnosis pipeline (staff only)"""
+    return Response({
+        'encoding_cache': encoding_cache.stats(),
+        'translation_cache': translation_cache.stats(),
+        'language_cache': language_identifier.stats(),
+        'models': registry.stats(),
+        'model_pool': registry.pool.stats(),
+        'stage_latency_ms': stage_latency.percentiles(),
+    })
+
+
 # ============== Chat Session Management APIs ==============
 
 @api_view(['GET', 'POST'])
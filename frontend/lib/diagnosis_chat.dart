@@ -22,6 +22,7 @@ class _DiagnosisChatScreenState extends State<DiagnosisChatScreen> {
   final ScrollController _scrollController = ScrollController();
   String? _lastSymptomText;
   List<String>? _pendingFollowupQuestions;
+  String? _followupToken;  // Server-side clarification state for the pending questions
   String? _selectedCrop;
   List<String> _userCrops = [];
   bool _cropsLoaded = false;
@@ -261,6 +262,7 @@ class _DiagnosisChatScreenState extends State<DiagnosisChatScreen> {
         'symptom_text': _lastSymptomText ?? '',
         'crop': _selectedCrop,
         'followup_answer': followupChoice,  // Send the selected index
+        if (_followupToken != null) 'followup_token': _followupToken,
       };
       
       final response = await http.post(
@@ -477,6 +479,7 @@ class _DiagnosisChatScreenState extends State<DiagnosisChatScreen> {
           setState(() {
             _messages.add(_ChatMessage(aiMsg, false, metadata: data));
             _pendingFollowupQuestions = symptoms?.cast<String>() ?? [];
+            _followupToken = data['followup_token'] as String?;
             _isInClarificationMode = true;  // Enable clarification mode
             _currentQuickActions = null;  // Clear action buttons
           });